@@ -0,0 +1,251 @@
+import math
+import threading
+import time
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from store import Row, Table
+
+
+class AccessIndex:
+    """
+    Content entitlements as per-creator bitsets.
+    Each of a creator's tiers and one-time purchase items owns a bit. A tier's
+    ladder is its own bit plus those of every cheaper tier, since a subscriber
+    sees content gated on lower tiers too; an item's ladder is just its bit.
+    A user's mask for a creator is the OR of the ladders they hold, so
+    authorizing an item (or a gallery page of them) is one AND per item.
+    Subscribes and purchases touch one mask; tier edits re-derive only that
+    creator's ladders and subscriber masks. Reads take no lock.
+    A user's subscriptions and purchases are read from the tables the first
+    time they are needed, so the index costs nothing per user until then;
+    writers must load() the user before the tables change so the new row isn't
+    counted twice.
+    With a ttl (other processes write the same tables) the index is only a
+    cache: each user's grants are re-read once they are ttl seconds old or
+    after any write of theirs, and tiers and items are re-synced from their
+    tables every ttl seconds, as ResponseCache bounds its entries.
+    """
+
+    def __init__(self, subscriptions: Optional[Table] = None, purchases: Optional[Table] = None,
+                 tiers: Optional[Table] = None, items: Optional[Table] = None, ttl: Optional[float] = None):
+        self._gates: Dict[str, Tuple[str, int]] = {}  # tier/item id -> (creator_id, bit)
+        self._ladders: Dict[str, int] = {}  # tier/item id -> mask it grants
+        self._prices: Dict[str, Dict[str, float]] = {}  # creator_id -> {tier_id: price}
+        self._held: Dict[Tuple[str, str], Counter] = {}  # (user_id, creator_id) -> ids held
+        self._masks: Dict[Tuple[str, str], int] = {}  # (user_id, creator_id) -> entitled bits
+        self._users: Dict[str, set] = {}  # creator_id -> users holding anything of theirs
+        self._creators: Dict[str, set] = {}  # user_id -> creators they hold anything of
+        self._used: Dict[str, int] = {}  # creator_id -> bits in use
+        self._subscriptions = subscriptions
+        self._purchases = purchases
+        self._tiers = tiers
+        self._items = items
+        self.ttl = ttl
+        self._loaded: Dict[str, float] = {}  # user_id -> when their grants, read from the tables, go stale
+        self._synced = 0.0 if ttl is not None else math.inf  # when tiers and items are next re-read
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+
+    @classmethod
+    def from_tables(cls, tiers: Table, items: Table, subscriptions: Table, purchases: Optional[Table] = None,
+                    ttl: Optional[float] = None) -> "AccessIndex":
+        index = cls(subscriptions, purchases, tiers, items, ttl)
+        index.sync()
+        return index
+
+    def sync(self) -> None:
+        """Bring tiers and items in line with their tables, keeping the bits of those that didn't change."""
+        tiers = {t["id"]: t for t in (self._tiers if self._tiers is not None else ())}
+        items = {p["id"]: p for p in (self._items if self._items is not None else ())}
+        with self._lock:
+            known = {tier_id: {"id": tier_id, "creator_id": creator_id, "price": price}
+                     for creator_id, prices in self._prices.items() for tier_id, price in prices.items()}
+            known_items = {gate_id: {"id": gate_id, "creator_id": creator_id}
+                           for gate_id, (creator_id, _) in self._gates.items() if gate_id not in known}
+        for tier_id, before in known.items():
+            self.tier_changed(before, tiers.get(tier_id))
+        for tier_id, after in tiers.items():
+            if tier_id not in known:
+                self.tier_changed(None, after)
+        for item_id, before in known_items.items():
+            self.item_changed(before, items.get(item_id))
+        for item_id, after in items.items():
+            if item_id not in known_items:
+                self.item_changed(None, after)
+
+    def _refresh(self) -> None:
+        if self._synced > time.monotonic():
+            return
+        with self._sync_lock:
+            if self._synced > time.monotonic():
+                return
+            self.sync()
+            self._synced = time.monotonic() + self.ttl
+
+    def load(self, user_id: Optional[str]) -> None:
+        """Read the user's subscriptions and purchases in, once (or again once stale)."""
+        if not user_id or self._subscriptions is None:
+            return
+        self._refresh()
+        if self._loaded.get(user_id, 0.0) > time.monotonic():
+            return
+        with self._lock:
+            if self._loaded.get(user_id, 0.0) > time.monotonic():
+                return
+            self._forget(user_id)
+            for sub in self._subscriptions.find("user_id", user_id):
+                self._grant(user_id, sub["tier_id"])
+            for purchase in self._purchases.find("user_id", user_id) if self._purchases is not None else ():
+                self._grant(user_id, purchase["purchase_id"])
+            self._loaded[user_id] = math.inf if self.ttl is None else time.monotonic() + self.ttl
+
+    def _forget(self, user_id: str) -> None:
+        for creator_id in self._creators.pop(user_id, ()):
+            self._held.pop((user_id, creator_id), None)
+            self._masks.pop((user_id, creator_id), None)
+            self._users[creator_id].discard(user_id)
+
+    def _add_gate(self, gate_id: str, creator_id: str) -> None:
+        if gate_id in self._gates:
+            return
+        used = self._used.get(creator_id, 0)
+        bit = (~used & (used + 1)).bit_length() - 1  # lowest free bit
+        self._used[creator_id] = used | 1 << bit
+        self._gates[gate_id] = (creator_id, bit)
+        self._ladders[gate_id] = 1 << bit
+
+    def _remove_gate(self, gate_id: str) -> None:
+        gate = self._gates.pop(gate_id, None)
+        self._ladders.pop(gate_id, None)
+        if gate is not None:
+            self._used[gate[0]] &= ~(1 << gate[1])
+
+    def tier_changed(self, before: Optional[Row], after: Optional[Row]) -> None:
+        if before is not None and after is not None and before.get("price") == after.get("price") \
+                and before.get("creator_id") == after.get("creator_id"):
+            return  # counters and copy edits don't move the ladder
+        with self._lock:
+            creators = set()
+            if before is not None:
+                creator_id = before.get("creator_id")
+                self._prices.get(creator_id, {}).pop(before["id"], None)
+                if after is None or after.get("creator_id") != creator_id:
+                    self._remove_gate(before["id"])
+                creators.add(creator_id)
+            if after is not None:
+                creator_id = after.get("creator_id")
+                self._add_gate(after["id"], creator_id)
+                self._prices.setdefault(creator_id, {})[after["id"]] = after.get("price") or 0
+                creators.add(creator_id)
+            for creator_id in creators:
+                self._relink(creator_id)
+
+    def item_changed(self, before: Optional[Row], after: Optional[Row]) -> None:
+        with self._lock:
+            # Price and copy edits leave the item's bit alone; a move to another creator takes a new one
+            if before is not None and (after is None or after.get("creator_id") != before.get("creator_id")):
+                self._remove_gate(before["id"])
+                self._relink(before.get("creator_id"))
+            if after is not None:
+                self._add_gate(after["id"], after.get("creator_id"))
+
+    def _relink(self, creator_id: str) -> None:
+        # Rebuild the creator's tier ladders by price, then the masks that use them
+        prices = self._prices.get(creator_id, {})
+        running = 0
+        for tier_id in sorted(prices, key=lambda t: (prices[t], t)):
+            running |= 1 << self._gates[tier_id][1]
+            self._ladders[tier_id] = running
+        for user_id in self._users.get(creator_id, ()):
+            self._remask(user_id, creator_id)
+
+    def _remask(self, user_id: str, creator_id: str) -> None:
+        held = self._held.get((user_id, creator_id))
+        mask = 0
+        for gate_id in held or ():
+            mask |= self._ladders.get(gate_id, 0)
+        if mask:
+            self._masks[(user_id, creator_id)] = mask
+        else:
+            self._masks.pop((user_id, creator_id), None)
+
+    def granted(self, user_id: str, gate_id: str) -> None:
+        """A user subscribed to a tier or bought an item."""
+        with self._lock:
+            if self.ttl is not None:
+                # The row is in the tables already; the next read takes it from there
+                self._loaded.pop(user_id, None)
+                return
+            self._grant(user_id, gate_id)
+
+    def _grant(self, user_id: str, gate_id: str) -> None:
+        gate = self._gates.get(gate_id)
+        if gate is None:
+            return
+        creator_id = gate[0]
+        self._held.setdefault((user_id, creator_id), Counter())[gate_id] += 1
+        self._users.setdefault(creator_id, set()).add(user_id)
+        self._creators.setdefault(user_id, set()).add(creator_id)
+        self._masks[(user_id, creator_id)] = self._masks.get((user_id, creator_id), 0) | self._ladders[gate_id]
+
+    def revoked(self, user_id: str, gate_id: str) -> None:
+        """A user dropped one subscription to a tier."""
+        with self._lock:
+            if self.ttl is not None:
+                self._loaded.pop(user_id, None)
+                return
+            gate = self._gates.get(gate_id)
+            if gate is None:
+                return
+            creator_id = gate[0]
+            held = self._held.get((user_id, creator_id))
+            if not held or not held[gate_id]:
+                return
+            held[gate_id] -= 1
+            if not held[gate_id]:
+                del held[gate_id]
+                if not held:
+                    del self._held[(user_id, creator_id)]
+                    self._users[creator_id].discard(user_id)
+                    self._creators[user_id].discard(creator_id)
+                self._remask(user_id, creator_id)
+
+    def required(self, min_tier: Optional[str]) -> Optional[Tuple[str, int]]:
+        """(creator_id, bit) a minTier value gates on; accepts the frontend's tier_/purchase_ prefixed ids."""
+        gate = self._gates.get(min_tier)
+        if gate is None and min_tier:
+            for prefix in ("tier_", "purchase_"):
+                if min_tier.startswith(prefix):
+                    gate = self._gates.get(min_tier[len(prefix):])
+                    break
+        return gate
+
+    def allowed(self, user_id: Optional[str], video: Row) -> bool:
+        return self.visible(user_id, (video,))[0]
+
+    def visible(self, user_id: Optional[str], videos: Iterable[Row]) -> List[bool]:
+        """Whether the user may view each video; a page looks each creator's mask up once."""
+        self.load(user_id)
+        masks: Dict[str, int] = {}
+        result = []
+        for video in videos:
+            min_tier = video.get("minTier")
+            if not min_tier or (user_id and user_id == video.get("creator_id")):
+                result.append(True)
+                continue
+            gate = self.required(min_tier)
+            if gate is None or not user_id:
+                # Gated on a tier or item that no longer exists: only the creator sees it
+                result.append(False)
+                continue
+            creator_id, bit = gate
+            mask = masks.get(creator_id)
+            if mask is None:
+                mask = masks[creator_id] = self._masks.get((user_id, creator_id), 0)
+            result.append(bool(mask >> bit & 1))
+        return result
+
+    def mask(self, user_id: str, creator_id: str) -> int:
+        self.load(user_id)
+        return self._masks.get((user_id, creator_id), 0)
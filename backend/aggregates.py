@@ -0,0 +1,82 @@
+import threading
+from typing import Any, Dict, Iterable, Optional
+
+from store import Row
+
+
+_EMPTY = {"total_subscribers": 0, "total_tiers": 0, "revenue_cents": 0, "one_time_revenue_cents": 0}
+
+
+def _cents(price: Any) -> int:
+    return int(round((price or 0) * 100))
+
+
+class CreatorAggregates:
+    """
+    Running per-creator dashboard totals.
+    Every write passes the record before and after the change, so the totals
+    are maintained with O(1) deltas; money is summed in integer cents so the
+    running values never drift from a full recompute. Deltas commute, so
+    concurrent writers only need the lock around applying them.
+    """
+
+    def __init__(self):
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_tables(cls, tiers: Iterable[Row], purchases: Iterable[Row]) -> "CreatorAggregates":
+        aggregates = cls()
+        for tier in tiers:
+            aggregates.tier_changed(None, tier)
+        for item in purchases:
+            aggregates.purchase_changed(None, item)
+        return aggregates
+
+    def _bucket(self, creator_id: Any) -> Dict[str, int]:
+        stats = self._stats.get(creator_id)
+        if stats is None:
+            stats = self._stats[creator_id] = dict(_EMPTY)
+        return stats
+
+    def tier_changed(self, before: Optional[Row], after: Optional[Row]) -> None:
+        with self._lock:
+            for tier, sign in ((before, -1), (after, 1)):
+                if tier is None:
+                    continue
+                subscribers = tier.get("subscriberCount", 0) or 0
+                stats = self._bucket(tier.get("creator_id"))
+                stats["total_tiers"] += sign
+                stats["total_subscribers"] += sign * subscribers
+                stats["revenue_cents"] += sign * _cents(tier.get("price")) * subscribers
+
+    def purchase_changed(self, before: Optional[Row], after: Optional[Row]) -> None:
+        with self._lock:
+            for item, sign in ((before, -1), (after, 1)):
+                if item is None:
+                    continue
+                stats = self._bucket(item.get("creator_id"))
+                stats["one_time_revenue_cents"] += sign * _cents(item.get("price")) * (item.get("purchaseCount", 0) or 0)
+
+    def dashboard(self, creator_id: str) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats.get(creator_id, _EMPTY))
+        return self._format(stats)
+
+    @staticmethod
+    def recompute(creator_id: str, tiers: Iterable[Row], purchases: Iterable[Row]) -> Dict[str, Any]:
+        """Full recompute over the creator's tiers and purchase items, for verification."""
+        fresh = CreatorAggregates.from_tables(tiers, purchases)
+        return fresh.dashboard(creator_id)
+
+    @staticmethod
+    def _format(stats: Dict[str, int]) -> Dict[str, Any]:
+        revenue = stats["revenue_cents"] / 100
+        one_time_revenue = stats["one_time_revenue_cents"] / 100
+        return {
+            "total_subscribers": stats["total_subscribers"],
+            "total_tiers": stats["total_tiers"],
+            "revenue": revenue,
+            "one_time_revenue": one_time_revenue,
+            "total_revenue": (stats["revenue_cents"] + stats["one_time_revenue_cents"]) / 100,
+        }
@@ -0,0 +1,209 @@
+import math
+import threading
+import time
+from array import array
+from collections import deque
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+# Sliding window the rules look at, split into buckets that expire whole
+WINDOW_SECONDS = 60
+BUCKETS = 6
+
+# Rule thresholds, per window
+VELOCITY_LIMIT = 20  # events by one user
+AMOUNT_LIMIT_CENTS = 50_000  # spend by one user
+FAN_IN_LIMIT = 50  # distinct new accounts paying one creator
+NEW_ACCOUNT_EVENTS = 3  # a user with fewer lifetime events than this counts as new
+
+# Windowed sketches are sized for ~1M events per window: a cell averages well
+# under the limits, so false alerts need every row to collide at once.
+SKETCH_WIDTH = 1 << 16
+SKETCH_DEPTH = 4
+# Lifetime activity has no window to expire it, so it gets a much wider sketch
+# (16 MiB); once it fills up, more accounts look established, never newer.
+LIFETIME_WIDTH = 1 << 20
+HLL_PRECISION = 8  # 256 bytes per creator per bucket; ~6.5% error, linear counting when small
+_MASK64 = (1 << 64) - 1
+
+
+class CountMinSketch:
+    """
+    Frequency sketch: estimates never undercount, and overcount by at most
+    ~e/width of the total. Cells live in one flat array.array, which is fast
+    for per-event updates, with a numpy view over the same memory for
+    whole-sketch arithmetic.
+    """
+
+    def __init__(self, width: int = SKETCH_WIDTH, depth: int = SKETCH_DEPTH, typecode: str = "q"):
+        self.width = width
+        self.depth = depth
+        self.cells = array(typecode, bytes(array(typecode).itemsize * width * depth))
+        self.table = np.frombuffer(self.cells, dtype=self.cells.typecode)
+
+    def columns(self, key: Any) -> List[int]:
+        """Cell per row for a key; hash once and reuse it across sketches of the same shape."""
+        width = self.width
+        return [row * width + hash((row, key)) % width for row in range(self.depth)]
+
+    def add(self, columns: Sequence[int], count: int = 1) -> int:
+        """Add to a key (given by its columns) and return the new estimate."""
+        cells = self.cells
+        for c in columns:
+            cells[c] += count
+        return min(cells[c] for c in columns)
+
+    def increment(self, columns: Sequence[int], count: int = 1) -> None:
+        cells = self.cells
+        for c in columns:
+            cells[c] += count
+
+    def estimate(self, columns: Sequence[int]) -> int:
+        return min(self.cells[c] for c in columns)
+
+    def subtract(self, other: "CountMinSketch") -> None:
+        self.table -= other.table
+
+
+class HyperLogLog:
+    """Distinct-count sketch in 2^precision bytes, ~1.04/sqrt(2^precision) relative error."""
+
+    def __init__(self, precision: int = HLL_PRECISION):
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def add(self, item: Any) -> None:
+        h = hash((item, "hll")) & _MASK64
+        index = h >> (64 - self.precision)
+        rest = h & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    @classmethod
+    def union(cls, sketches: Sequence["HyperLogLog"], precision: int = HLL_PRECISION) -> "HyperLogLog":
+        merged = cls(precision)
+        if sketches:
+            merged.registers = bytearray(map(max, *(s.registers for s in sketches))) if len(sketches) > 1 \
+                else bytearray(sketches[0].registers)
+        return merged
+
+    def count(self) -> int:
+        m = len(self.registers)
+        estimate = 0.7213 / (1 + 1.079 / m) * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Small-range correction (linear counting)
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+
+class _Bucket:
+    def __init__(self, start: int):
+        self.start = start
+        self.events = CountMinSketch()
+        self.spend = CountMinSketch()
+        self.new_account_events = CountMinSketch()
+        self.new_accounts: Dict[str, HyperLogLog] = {}
+
+    def reset(self, start: int) -> "_Bucket":
+        self.start = start
+        for sketch in (self.events, self.spend, self.new_account_events):
+            sketch.table[:] = 0
+        self.new_accounts = {}
+        return self
+
+
+class AmlMonitor:
+    """
+    Streaming transaction monitor over subscribe/purchase events.
+    Per-user velocity and spend, and per-creator fan-in from new accounts, are
+    kept for a sliding window in count-min sketches and HyperLogLogs that
+    expire bucket by bucket, so memory is bounded and each event is checked in
+    O(sketch depth) without looking at history. Alerts are raised inline and
+    repeated at most once per window for the same rule and subject.
+    """
+
+    def __init__(self, window: int = WINDOW_SECONDS, buckets: int = BUCKETS, velocity_limit: int = VELOCITY_LIMIT,
+                 amount_limit_cents: int = AMOUNT_LIMIT_CENTS, fan_in_limit: int = FAN_IN_LIMIT,
+                 new_account_events: int = NEW_ACCOUNT_EVENTS, max_alerts: int = 1000):
+        self.bucket_seconds = max(1, window // buckets)
+        self.buckets = buckets
+        self.velocity_limit = velocity_limit
+        self.amount_limit_cents = amount_limit_cents
+        self.fan_in_limit = fan_in_limit
+        self.new_account_events = new_account_events
+        self.alerts: deque = deque(maxlen=max_alerts)
+        self.events_seen = 0
+        self._window: deque = deque()
+        # Running sums of every live bucket, so a check is a single lookup
+        self._events = CountMinSketch()
+        self._spend = CountMinSketch()
+        self._new_account_events = CountMinSketch()
+        # Lifetime activity, to tell new accounts from established ones
+        self._lifetime = CountMinSketch(LIFETIME_WIDTH, typecode="i")
+        self._alerted: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, kind: str, user_id: str, creator_id: Optional[str], amount: float,
+                ts: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Feed one event; returns the alerts it raised."""
+        ts = time.time() if ts is None else ts
+        cents = int(round((amount or 0) * 100))
+        user = self._events.columns(("user", user_id))
+        raised = []
+        with self._lock:
+            bucket = self._advance(ts)
+            self.events_seen += 1
+            bucket.events.increment(user)
+            velocity = self._events.add(user)
+            bucket.spend.increment(user, cents)
+            spend = self._spend.add(user, cents)
+            is_new = self._lifetime.add(self._lifetime.columns(("user", user_id))) <= self.new_account_events
+            if velocity > self.velocity_limit:
+                self._alert(raised, ts, "velocity", "user", user_id, velocity, kind=kind)
+            if spend > self.amount_limit_cents:
+                self._alert(raised, ts, "amount_burst", "user", user_id, spend / 100, kind=kind)
+            if is_new and creator_id is not None:
+                bucket.new_accounts.setdefault(creator_id, HyperLogLog()).add(user_id)
+                creator = self._events.columns(("creator", creator_id))
+                bucket.new_account_events.increment(creator)
+                # Distinct accounts can't exceed events, so the union is only counted near the limit
+                if self._new_account_events.add(creator) > self.fan_in_limit \
+                        and ("new_account_fan_in", creator_id) not in self._alerted:
+                    fan_in = HyperLogLog.union([b.new_accounts[creator_id] for b in self._window
+                                                if creator_id in b.new_accounts]).count()
+                    if fan_in > self.fan_in_limit:
+                        self._alert(raised, ts, "new_account_fan_in", "creator", creator_id, fan_in)
+        return raised
+
+    def _advance(self, ts: float) -> _Bucket:
+        start = int(ts // self.bucket_seconds) * self.bucket_seconds
+        if self._window and start <= self._window[-1].start:
+            # Late events count toward the newest bucket
+            return self._window[-1]
+        horizon = start - self.bucket_seconds * self.buckets
+        recycled = None
+        while self._window and self._window[0].start <= horizon:
+            recycled = self._window.popleft()
+            self._events.subtract(recycled.events)
+            self._spend.subtract(recycled.spend)
+            self._new_account_events.subtract(recycled.new_account_events)
+        for key in [k for k, at in self._alerted.items() if at <= horizon]:
+            del self._alerted[key]
+        # Reuse an expired bucket's sketches rather than allocating new ones
+        self._window.append(recycled.reset(start) if recycled else _Bucket(start))
+        return self._window[-1]
+
+    def _alert(self, raised: list, ts: float, rule: str, subject_type: str, subject: str, value: Any, **extra) -> None:
+        if (rule, subject) in self._alerted:
+            return
+        self._alerted[(rule, subject)] = ts
+        alert = {"rule": rule, subject_type + "_id": subject, "value": value, "at": ts, **extra}
+        self.alerts.append(alert)
+        raised.append(alert)
+
+    def recent_alerts(self, limit: int = 100) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self.alerts)[-limit:][::-1]
@@ -0,0 +1,109 @@
+from typing import Any, Callable, Dict, Iterable, Mapping, Optional, Tuple
+
+import numpy as np
+
+# Column name -> default used by calculate_ml_score when the key is missing
+FLAG_COLUMNS = {
+    "is_original": False,
+    "unique_perspective": False,
+    "trending_topic": False,
+    "searchable_content": False,
+    "no_ads": True,
+    "policy_compliant": True,
+}
+ENGAGEMENT_COLUMNS = ("watch_time", "likes", "comments", "shares")
+
+# Step ladders from calculate_ml_score: points[i] applies once the value
+# reaches thresholds[i - 1], so a single searchsorted replaces each elif chain.
+WATCH_TIME_STEPS = (np.array([60, 120]), np.array([0, 20, 25]))
+LIKES_STEPS = (np.array([100, 500, 1000]), np.array([0, 5, 7, 10]))
+COMMENTS_STEPS = (np.array([10, 50, 100]), np.array([0, 5, 7, 10]))
+SHARES_STEPS = (np.array([5, 20, 50]), np.array([0, 1, 3, 5]))
+ENGAGEMENT_STEPS = {
+    "watch_time": WATCH_TIME_STEPS,
+    "likes": LIKES_STEPS,
+    "comments": COMMENTS_STEPS,
+    "shares": SHARES_STEPS,
+}
+FLAG_POINTS = {
+    "is_original": 15,
+    "unique_perspective": 10,
+    "trending_topic": 15,
+    "searchable_content": 10,
+    "no_ads": 5,
+    "policy_compliant": 5,
+}
+
+# calculate_revenue_split ladder
+SPLIT_STEPS = (np.array([50, 60, 70, 80, 90]), np.array([0.50, 0.55, 0.60, 0.65, 0.70, 0.75]))
+
+
+def _ladder(values: np.ndarray, steps: Tuple[np.ndarray, np.ndarray]) -> np.ndarray:
+    thresholds, points = steps
+    return points[np.searchsorted(thresholds, values, side="right")]
+
+
+def score_batch(columns: Mapping[str, Any]) -> np.ndarray:
+    """
+    Vectorized calculate_ml_score over columnar inputs.
+    Every column must have the same length; results are bit-identical to the
+    scalar function because all partial sums are small integers.
+    """
+    score = _ladder(np.asarray(columns["watch_time"]), WATCH_TIME_STEPS)
+    score = score + _ladder(np.asarray(columns["likes"]), LIKES_STEPS)
+    score += _ladder(np.asarray(columns["comments"]), COMMENTS_STEPS)
+    score += _ladder(np.asarray(columns["shares"]), SHARES_STEPS)
+    for name, points in FLAG_POINTS.items():
+        score += np.asarray(columns[name], dtype=bool) * points
+    return np.minimum(score, 100).astype(np.float64)
+
+
+def revenue_split_batch(scores: np.ndarray) -> np.ndarray:
+    """Vectorized calculate_revenue_split."""
+    return _ladder(np.asarray(scores), SPLIT_STEPS)
+
+
+def score_and_split(columns: Mapping[str, Any]) -> Tuple[np.ndarray, np.ndarray]:
+    scores = score_batch(columns)
+    return scores, revenue_split_batch(scores)
+
+
+def columns_from_videos(videos: Iterable[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+    """Build scorer columns from video records, applying calculate_ml_score's defaults."""
+    videos = list(videos)
+    columns = {name: np.array([v.get(name, 0) for v in videos]) for name in ENGAGEMENT_COLUMNS}
+    for name, default in FLAG_COLUMNS.items():
+        columns[name] = np.array([bool(v.get(name, default)) for v in videos], dtype=bool)
+    return columns
+
+
+def rescore_table(videos, rescored: Optional[Callable[[Any, float], Any]] = None) -> int:
+    """
+    Rescore every video in a table in one vectorized pass; returns the number
+    of rows changed, each of which is also passed to rescored(id, ml_score).
+    """
+    if hasattr(videos, "columns"):
+        return _rescore_columns(videos, rescored)
+    rows = list(videos)
+    scores, splits = score_and_split(columns_from_videos(rows))
+    changed = 0
+    for row, score, split in zip(rows, scores.tolist(), splits.tolist()):
+        if row.get("ml_score") != score or row.get("revenue_split") != split:
+            videos.update(row["id"], {"ml_score": score, "revenue_split": split})
+            if rescored is not None:
+                rescored(row["id"], score)
+            changed += 1
+    return changed
+
+
+def _rescore_columns(videos, rescored: Optional[Callable[[Any, float], Any]]) -> int:
+    # Columnar catalog: read the scorer inputs as arrays and only touch rows that change
+    defaults = {**{name: 0 for name in ENGAGEMENT_COLUMNS}, **FLAG_COLUMNS, "ml_score": np.nan, "revenue_split": np.nan}
+    keys, columns = videos.columns(defaults)
+    scores, splits = score_and_split(columns)
+    changed = np.flatnonzero((columns["ml_score"] != scores) | (columns["revenue_split"] != splits))
+    for i in changed.tolist():
+        videos.update(keys[i], {"ml_score": float(scores[i]), "revenue_split": float(splits[i])})
+        if rescored is not None:
+            rescored(keys[i], float(scores[i]))
+    return len(changed)
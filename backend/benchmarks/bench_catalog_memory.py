@@ -0,0 +1,99 @@
+"""
+Bytes per video for the dict-per-row Table versus the columnar VideoCatalog,
+plus the cost of reading rows back through the catalog's views.
+
+    cd backend && python benchmarks/bench_catalog_memory.py --videos 1000000
+"""
+import argparse
+import gc
+import hashlib
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from catalog import VideoCatalog  # noqa: E402
+from models import VIDEO_ORDERINGS, calculate_ml_score, calculate_revenue_split  # noqa: E402
+from store import Table  # noqa: E402
+
+TAGS = ["tutorial", "music", "gaming", "vlog", "cooking", "fitness", "travel", "tech"]
+
+
+def make_videos(count: int, creators: int, seed: int = 5):
+    """Processed upload records shaped like content_service builds them."""
+    rng = random.Random(seed)
+    for n in range(count):
+        video = {
+            "id": f"video{n + 1}",
+            "filename": f"clip_{n + 1}.mp4",
+            "title": f"Episode {n + 1}: {rng.choice(TAGS)} session",
+            "description": rng.choice(["", "Full walkthrough with notes", "Behind the scenes"]),
+            "minTier": rng.choice(["tier1", "tier2", "tier3"]),
+            "tags": ",".join(rng.sample(TAGS, 2)),
+            "creator_id": f"creator{rng.randrange(creators) + 1}",
+            "created_at": f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T{rng.randint(0, 23):02d}:"
+                          f"{rng.randint(0, 59):02d}:{rng.randint(0, 59):02d}.{rng.randrange(10 ** 6):06d}Z",
+            "status": "ready",
+            "is_original": rng.random() < 0.8,
+            "unique_perspective": rng.random() < 0.3,
+            "trending_topic": rng.random() < 0.2,
+            "searchable_content": True,
+            "no_ads": True,
+            "policy_compliant": True,
+            "watch_time": round(rng.uniform(0, 300), 1),
+            "likes": rng.randrange(5000),
+            "comments": rng.randrange(500),
+            "shares": rng.randrange(200),
+            "size_bytes": rng.randrange(10 ** 6, 10 ** 9),
+            "sha256": hashlib.sha256(str(n).encode()).hexdigest(),
+        }
+        video["ml_score"] = calculate_ml_score(video)
+        video["revenue_split"] = calculate_revenue_split(video["ml_score"])
+        yield video
+
+
+def measure(factory, videos: int, creators: int):
+    gc.collect()
+    tracemalloc.start()
+    table = factory()
+    for video in make_videos(videos, creators):
+        table.insert(video)
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return table, used
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--videos", type=int, default=200_000)
+    parser.add_argument("--creators", type=int, default=1_000)
+    parser.add_argument("--reads", type=int, default=100_000)
+    args = parser.parse_args()
+
+    results = {}
+    for name, factory in (("dict rows", lambda: Table(indexes=("creator_id",), ordered=VIDEO_ORDERINGS)),
+                          ("columnar", lambda: VideoCatalog(indexes=("creator_id",), ordered=VIDEO_ORDERINGS))):
+        table, used = measure(factory, args.videos, args.creators)
+        ids = [f"video{random.randrange(args.videos) + 1}" for _ in range(args.reads)]
+        start = time.perf_counter()
+        for pk in ids:
+            table.get(pk).get("ml_score")
+        get_time = time.perf_counter() - start
+        start = time.perf_counter()
+        for pk in ids:
+            dict(table.get(pk))
+        copy_time = time.perf_counter() - start
+        results[name] = used
+        print(f"{name:10s} {used / args.videos:8.0f} B/video  total {used / 2 ** 20:8.1f} MiB  "
+              f"get+field {get_time / args.reads * 1e6:5.2f}us  full row {copy_time / args.reads * 1e6:5.2f}us")
+        del table
+    print(f"videos:    {args.videos}")
+    print(f"reduction: {results['dict rows'] / results['columnar']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Feed skewed engagement deltas through the ingestion pipeline and report
+throughput, rows written per batch and how many videos actually got rescored.
+
+    cd backend && python benchmarks/bench_engagement.py --videos 100000 --deltas 1000000
+"""
+import argparse
+import itertools
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engagement import EngagementPipeline  # noqa: E402
+from models import calculate_ml_score, calculate_revenue_split  # noqa: E402
+from store import Table  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--videos", type=int, default=100_000)
+    parser.add_argument("--deltas", type=int, default=1_000_000)
+    parser.add_argument("--batch", type=int, default=100_000)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    videos = Table("id")
+    for i in range(args.videos):
+        row = {"id": f"video{i + 1}", "is_original": True, "searchable_content": True, "no_ads": True,
+               "policy_compliant": True, "watch_time": 0, "likes": 0, "comments": 0, "shares": 0}
+        row["ml_score"] = calculate_ml_score(row)
+        row["revenue_split"] = calculate_revenue_split(row["ml_score"])
+        videos.insert(row)
+
+    # Zipf-ish traffic: a few viral videos get most of the events
+    ids = [f"video{i + 1}" for i in range(args.videos)]
+    cumulative = list(itertools.accumulate(1 / (i + 1) for i in range(args.videos)))
+    targets = rng.choices(ids, cum_weights=cumulative, k=args.deltas)
+    watch = {vid: rng.uniform(10, 150) for vid in ids}
+    deltas = [{"video_id": vid, "likes": 1, "comments": int(rng.random() < 0.1), "shares": int(rng.random() < 0.02),
+               "watch_time": round(watch[vid] + rng.uniform(-2, 2), 1)} for vid in targets]
+
+    # Before: every delta is its own row write plus a full rescore
+    naive = Table("id", rows=(dict(v) for v in videos))
+    start = time.perf_counter()
+    for delta in deltas:
+        def changes(row, delta=delta):
+            new = {name: row[name] + delta[name] for name in ("likes", "comments", "shares")}
+            new["watch_time"] = delta["watch_time"]
+            new["ml_score"] = calculate_ml_score({**row, **new})
+            new["revenue_split"] = calculate_revenue_split(new["ml_score"])
+            return new
+        naive.modify(delta["video_id"], changes)
+    before = time.perf_counter() - start
+
+    pipeline = EngagementPipeline(videos, score=calculate_ml_score, split=calculate_revenue_split,
+                                  max_batch=args.batch, max_pending=args.deltas)
+    start = time.perf_counter()
+    for i in range(0, len(deltas), args.batch):
+        pipeline.submit(deltas[i:i + args.batch])
+    pipeline.flush()
+    elapsed = time.perf_counter() - start
+
+    stats = pipeline.snapshot()
+    print(f"{args.deltas} deltas over {args.videos} videos")
+    print(f"  per-delta write + rescore {before:.2f}s ({args.deltas / before:,.0f}/s)")
+    print(f"  pipeline                  {elapsed:.2f}s ({args.deltas / elapsed:,.0f}/s)")
+    print(f"  batches {stats['batches']}, row writes {stats['rows_updated']} "
+          f"({stats['rows_updated'] / args.deltas:.1%} of deltas)")
+    print(f"  rescored {stats['rescored']} rows ({stats['rescored'] / max(stats['rows_updated'], 1):.1%} of writes)")
+    assert sum(v["likes"] for v in videos) == args.deltas, "lost like increments"
+
+
+if __name__ == "__main__":
+    main()
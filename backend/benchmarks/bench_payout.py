@@ -0,0 +1,42 @@
+"""
+Time a nightly payout settlement over many creators.
+
+    cd backend && python benchmarks/bench_payout.py --creators 100000 --days 5 --workers 4
+"""
+import argparse
+import os
+import random
+import resource
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from payout import PayoutEngine  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--creators", type=int, default=100_000)
+    parser.add_argument("--days", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    engine = PayoutEngine(workers=args.workers)
+    day = date(2025, 1, 1)
+    for _ in range(args.days):
+        for c in range(args.creators):
+            engine.record(f"creator{c}", rng.choice((0, 4.99, 9.99, 24.99)))
+        start = time.perf_counter()
+        result = engine.settle_day(day)
+        elapsed = time.perf_counter() - start
+        print(f"{result['day']}: settled {result['creators']} creators in {elapsed:.3f}s "
+              f"(rolling total {result['total_rolling_payout']})")
+        day += timedelta(days=1)
+    print(f"peak RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MiB")
+
+
+if __name__ == "__main__":
+    main()
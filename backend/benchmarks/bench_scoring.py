@@ -0,0 +1,62 @@
+"""
+Compare the scalar calculate_ml_score/calculate_revenue_split loop with the
+vectorized batch scorer.
+
+    cd backend && python benchmarks/bench_scoring.py --rows 1000000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batch_scoring import ENGAGEMENT_COLUMNS, FLAG_COLUMNS, score_and_split  # noqa: E402
+from models import calculate_ml_score, calculate_revenue_split  # noqa: E402
+
+
+def make_columns(rows: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    columns = {
+        "watch_time": rng.integers(0, 200, rows),
+        "likes": rng.integers(0, 2000, rows),
+        "comments": rng.integers(0, 200, rows),
+        "shares": rng.integers(0, 100, rows),
+    }
+    for name in FLAG_COLUMNS:
+        columns[name] = rng.random(rows) < 0.5
+    return columns
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    columns = make_columns(args.rows)
+    names = ENGAGEMENT_COLUMNS + tuple(FLAG_COLUMNS)
+    records = [dict(zip(names, values)) for values in zip(*(columns[n].tolist() for n in names))]
+
+    start = time.perf_counter()
+    scalar_scores = [calculate_ml_score(r) for r in records]
+    scalar_splits = [calculate_revenue_split(s) for s in scalar_scores]
+    scalar_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    scores, splits = score_and_split(columns)
+    batch_time = time.perf_counter() - start
+
+    identical = scores.tolist() == scalar_scores and splits.tolist() == scalar_splits
+    print(f"rows:      {args.rows}")
+    print(f"scalar:    {scalar_time:.3f}s")
+    print(f"batch:     {batch_time:.3f}s")
+    print(f"speedup:   {scalar_time / batch_time:.1f}x")
+    print(f"identical: {identical}")
+    if not identical:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Build, query, save and reopen the content search index over synthetic videos.
+
+    cd backend && python benchmarks/bench_search.py --videos 1000000 --queries 2000
+"""
+import argparse
+import itertools
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from search import SearchIndex  # noqa: E402
+
+TAGS = ["travel", "cooking", "gaming", "music", "fitness", "tech", "vlog", "comedy", "art", "diy",
+        "beauty", "finance", "pets", "news", "sports", "science", "fashion", "film", "books", "cars"]
+
+
+def vocabulary(size: int, rng: random.Random) -> list:
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return ["".join(rng.choice(letters) for _ in range(rng.randint(3, 9))) for _ in range(size)]
+
+
+def videos(n: int, words: list, rng: random.Random):
+    # Zipf-ish word choice, so a few words are very common and most are rare
+    cumulative = list(itertools.accumulate(1 / (i + 1) for i in range(len(words))))
+    for i in range(n):
+        title = rng.choices(words, cum_weights=cumulative, k=rng.randint(3, 8))
+        description = rng.choices(words, cum_weights=cumulative, k=rng.randint(10, 30))
+        yield {
+            "id": f"video{i + 1}", "title": " ".join(title), "description": " ".join(description),
+            "tags": ",".join(rng.sample(TAGS, rng.randint(1, 3))), "creator_id": f"creator{i % 10_000}",
+            "ml_score": rng.uniform(20, 100),
+        }
+
+
+def percentile(values: list, p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100 * len(values)))]
+
+
+def time_queries(index: SearchIndex, queries: list, limit: int) -> str:
+    latencies = []
+    for text, tags, boost in queries:
+        start = time.perf_counter()
+        hits = index.search(text, tags, boost)
+        for _ in zip(range(limit), hits):
+            pass
+        latencies.append((time.perf_counter() - start) * 1000)
+    return (f"p50 {percentile(latencies, 50):.2f} ms  p95 {percentile(latencies, 95):.2f} ms  "
+            f"p99 {percentile(latencies, 99):.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--videos", type=int, default=1_000_000)
+    parser.add_argument("--vocabulary", type=int, default=50_000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    words = vocabulary(args.vocabulary, rng)
+    rows = list(videos(args.videos, words, rng))
+    start = time.perf_counter()
+    index = SearchIndex.from_rows(rows)
+    print(f"indexed {len(index)} videos in {time.perf_counter() - start:.1f}s")
+
+    queries = []
+    for _ in range(args.queries):
+        # Mostly mid-frequency words; some queries add a tag filter or the ml_score boost
+        text = " ".join(rng.choice(words[:5000]) for _ in range(rng.randint(1, 3)))
+        queries.append((text, [rng.choice(TAGS)] if rng.random() < 0.3 else [], 0.5 if rng.random() < 0.5 else 0.0))
+    print(f"queries (top {args.limit}): {time_queries(index, queries, args.limit)}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        index.directory = directory
+        start = time.perf_counter()
+        index.save()
+        print(f"saved in {time.perf_counter() - start:.1f}s")
+        start = time.perf_counter()
+        reopened = SearchIndex.open(directory, rows)
+        print(f"reopened (memory-mapped, reconciled with {len(rows)} rows) in {time.perf_counter() - start:.1f}s")
+        print(f"queries after reopen: {time_queries(reopened, queries, args.limit)}")
+    print(f"peak RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Time serializing a 10k-item list response the old and new ways: backend rows
+through FastAPI's default path (jsonable_encoder + json.dumps) versus
+FastJSONResponse returned directly (orjson, no encoder pass).
+
+    cd backend && python benchmarks/bench_serialization.py --items 10000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+
+from responses import FastJSONResponse  # noqa: E402
+
+
+def video_rows(n: int) -> list:
+    return [{
+        "id": f"video{i}", "filename": f"clip{i}.mp4", "title": f"Clip number {i}", "description": "Behind the scenes",
+        "minTier": "tier1", "tags": "vlog,travel", "creator_id": f"creator{i % 100}",
+        "created_at": f"2025-01-{i % 28 + 1:02d}T12:00:00Z", "status": "ready", "is_original": True,
+        "unique_perspective": i % 2 == 0, "trending_topic": False, "searchable_content": True, "no_ads": True,
+        "policy_compliant": True, "watch_time": 90, "likes": 500 + i, "comments": 75, "shares": 25,
+        "size_bytes": 1_048_576 + i, "ml_score": 62.5 + i % 30, "revenue_split": 0.65,
+    } for i in range(n)]
+
+
+def best_of(fn, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rows = video_rows(args.items)
+    # (name, before, after)
+    cases = [
+        ("backend rows", lambda: JSONResponse(jsonable_encoder(rows)).body, lambda: FastJSONResponse(rows).body),
+    ]
+    size = len(FastJSONResponse(rows).body)
+    print(f"{args.items} items, {size / 1024:.0f} KiB of JSON, best of {args.repeat}")
+    for name, before, after in cases:
+        old, new = best_of(before, args.repeat), best_of(after, args.repeat)
+        print(f"  {name:24s} before {old * 1000:8.2f} ms  after {new * 1000:7.2f} ms  ({old / new:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
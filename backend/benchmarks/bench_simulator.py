@@ -0,0 +1,81 @@
+"""
+Time the what-if simulator on one large creator catalog and check its scores and
+splits against the scalar calculate_ml_score/calculate_revenue_split per scenario.
+
+    cd backend && python benchmarks/bench_simulator.py --videos 10000 --scenarios 16
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batch_scoring import FLAG_COLUMNS, columns_from_videos, score_and_split  # noqa: E402
+from models import calculate_ml_score, calculate_revenue_split  # noqa: E402
+from simulator import _scenario_columns, simulate  # noqa: E402
+from store import Table  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--videos", type=int, default=10_000)
+    parser.add_argument("--scenarios", type=int, default=16)
+    parser.add_argument("--toggles", type=int, default=1_000, help="flag changes per scenario")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(3)
+    videos = Table(indexes=("creator_id",))
+    for i in range(args.videos):
+        row = {"id": f"video{i + 1}", "creator_id": "creator1", "watch_time": rng.randint(0, 200),
+               "likes": rng.randint(0, 2000), "comments": rng.randint(0, 200), "shares": rng.randint(0, 100)}
+        row.update({name: rng.random() < 0.5 for name in FLAG_COLUMNS})
+        videos.insert(row)
+    tiers = [{"id": f"tier{i}", "creator_id": "creator1", "price": p, "subscriberCount": n}
+             for i, (p, n) in enumerate(((4.99, 2500), (9.99, 1200), (24.99, 180)))]
+    purchases = [{"id": "item1", "creator_id": "creator1", "price": 19.99, "purchaseCount": 40}]
+
+    ids = [f"video{i + 1}" for i in range(args.videos)]
+    scenarios = []
+    for s in range(args.scenarios):
+        changes = {}
+        for vid in rng.sample(ids, min(args.toggles, len(ids))):
+            changes[vid] = {rng.choice(list(FLAG_COLUMNS)): rng.random() < 0.5}
+        scenarios.append({"name": f"scenario {s + 1}", "videos": changes,
+                          "tiers": {"tier1": {"price": round(rng.uniform(5, 15), 2), "subscriber_delta": rng.randint(-200, 200)}}})
+
+    timings = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        result = simulate(videos.find("creator_id", "creator1"), tiers, purchases, scenarios, months=12)
+        timings.append(time.perf_counter() - start)
+
+    # Scalar reference: score every video of every scenario one record at a time
+    rows = videos.find("creator_id", "creator1")
+    start = time.perf_counter()
+    scalar = []
+    for scenario in [{}] + scenarios:
+        for row in rows:
+            record = {**row, **scenario.get("videos", {}).get(row["id"], {})}
+            score = calculate_ml_score(record)
+            scalar.append((score, calculate_revenue_split(score)))
+    scalar_time = time.perf_counter() - start
+    columns = _scenario_columns(columns_from_videos(rows), {r["id"]: i for i, r in enumerate(rows)}, scenarios)
+    scores, splits = score_and_split(columns)
+    identical = list(zip(scores.ravel().tolist(), splits.ravel().tolist())) == scalar
+
+    print(f"videos:     {args.videos}")
+    print(f"scenarios:  {args.scenarios} x {args.toggles} flag changes")
+    print(f"simulate:   p50 {statistics.median(timings) * 1000:.1f}ms  max {max(timings) * 1000:.1f}ms")
+    print(f"scalar:     {scalar_time * 1000:.1f}ms (scores and splits only)")
+    print(f"baseline:   {result['scenarios'][0]['creator_earnings']:.2f}/month")
+    print(f"identical:  {identical}")
+    if not identical:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Warm restart from a state snapshot versus rebuilding the same state: seeds the
+video catalog and subscriptions, saves a snapshot, then starts the app in a fresh
+process and times startup and the first request against each store.
+
+    cd backend && python benchmarks/bench_snapshot.py --videos 1000000 --subscriptions 500000
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+# Runs in a fresh process pointed at the snapshot directory
+RESTART = """
+import json, time
+start = time.perf_counter()
+import mainC
+from fastapi.testclient import TestClient
+client = TestClient(mainC.app)
+timings = {"startup": time.perf_counter() - start}
+for name, url in (("tiers", "/membership/tiers/creator1"), ("subscriptions", "/membership/subscriptions/user7"),
+                  ("videos", "/content/creator/creator7?limit=20"), ("dashboard", "/membership/dashboard/creator1")):
+    start = time.perf_counter()
+    assert client.get(url).status_code == 200, url
+    first = time.perf_counter() - start
+    start = time.perf_counter()
+    client.get(url)
+    timings[name] = (first, time.perf_counter() - start)
+# The first write builds the derived state the routers update
+for name, user in (("subscribe", "user-new1"), ("subscribe again", "user-new2")):
+    start = time.perf_counter()
+    assert client.post("/membership/subscribe/", data={"user_id": user, "tier_id": "tier1"}).status_code == 200
+    timings[name] = (time.perf_counter() - start, None)
+print(json.dumps(timings))
+"""
+
+
+def subscriptions(count: int, users: int):
+    for n in range(count):
+        yield {"id": f"sub{n + 1}", "user_id": f"user{n % users + 1}", "tier_id": f"tier{n % 3 + 1}",
+               "subscribed_at": f"2025-{n % 12 + 1:02d}-{n % 28 + 1:02d}T00:00:{n % 60:02d}.{n % 10 ** 6:06d}Z"}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--videos", type=int, default=200_000)
+    parser.add_argument("--subscriptions", type=int, default=100_000)
+    parser.add_argument("--creators", type=int, default=1_000)
+    parser.add_argument("--users", type=int, default=20_000)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="tierflow-snapshot-")
+    os.environ.pop("TIERFLOW_DATABASE_URL", None)
+    os.environ.pop("TIERFLOW_EVENT_LOG", None)
+    os.environ.update({"TIERFLOW_SNAPSHOT_DIR": directory, "TIERFLOW_SNAPSHOT_INTERVAL": "0"})
+    env = dict(os.environ)
+    # The models modules read the snapshot directory on import
+    import content_models
+    import membership_models
+    import models
+    from bench_catalog_memory import make_videos
+
+    videos = list(make_videos(args.videos, args.creators))
+    subs = list(subscriptions(args.subscriptions, args.users))
+    start = time.perf_counter()
+    for video in videos:
+        content_models.videos_db.insert(video)
+    for sub in subs:
+        membership_models.subscriptions_db.insert(sub)
+    for table in (membership_models.tiers_db, membership_models.one_time_purchases_db, membership_models.kyc_db,
+                  membership_models.revenue_rollups_db):
+        len(table)
+    rebuild = time.perf_counter() - start
+    start = time.perf_counter()
+    models.state_snapshot.save()
+    save = time.perf_counter() - start
+    size = os.path.getsize(models.state_snapshot.path)
+
+    try:
+        output = subprocess.run([sys.executable, "-c", RESTART], cwd=BACKEND, env=env, check=True,
+                                capture_output=True, text=True).stdout
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    timings = json.loads(output.strip().splitlines()[-1])
+
+    print(f"videos:        {args.videos}")
+    print(f"subscriptions: {args.subscriptions}")
+    print(f"rebuild:       {rebuild:.2f}s (inserting the same rows)")
+    print(f"save:          {save:.2f}s, {size / 2 ** 20:.1f} MiB")
+    print(f"startup:       {timings.pop('startup') * 1000:.0f}ms (imports and app, no store decoded)")
+    for name, (first, warm) in timings.items():
+        if warm is None:
+            print(f"{name:20s} {first * 1000:8.1f}ms")
+        else:
+            print(f"first {name:14s} {first * 1000:8.1f}ms  then {warm * 1000:6.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Load a year of synthetic revenue events into the rollups and time chart
+queries against bucketing the raw events on every request.
+
+    cd backend && python benchmarks/bench_timeseries.py --events 1000000 --creators 1000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import REVENUE_ORDERINGS  # noqa: E402
+from store import Table  # noqa: E402
+from timeseries import RevenueSeries, bucket_start  # noqa: E402
+
+YEAR = 365 * 86400
+
+
+def percentile(samples, p):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(p / 100 * len(samples)))]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=1_000_000)
+    parser.add_argument("--creators", type=int, default=1000)
+    parser.add_argument("--queries", type=int, default=500)
+    args = parser.parse_args()
+
+    rng = random.Random(11)
+    now = time.time()
+    events = []
+    for _ in range(args.events):
+        # A few creators get most of the traffic
+        creator = f"creator{min(int(rng.paretovariate(1.2)), args.creators)}"
+        at = now - rng.random() * YEAR
+        kind = rng.random()
+        events.append((creator, at, rng.choice((4.99, 9.99, 24.99)), kind < 0.7, 0.7 <= kind < 0.8, kind >= 0.8))
+    events.sort(key=lambda e: e[1])
+
+    series = RevenueSeries(Table(ordered=REVENUE_ORDERINGS))
+    start = time.perf_counter()
+    for creator, at, price, sub, cancel, purchase in events:
+        series.record(creator, revenue=0 if cancel else price, subscriptions=int(sub), cancellations=int(cancel),
+                      purchases=int(purchase), at=at)
+    series.flush()
+    ingest = time.perf_counter() - start
+    print(f"{args.events} events over a year, {args.creators} creators: ingest {ingest:.2f}s "
+          f"({args.events / ingest:,.0f}/s), {len(series.rollups)} rollup rows")
+
+    by_creator = defaultdict(list)
+    for event in events:
+        by_creator[event[0]].append(event)
+    creators = list(by_creator)
+
+    def raw(creator):
+        # Before: bucket the creator's raw events by day on every request
+        days = defaultdict(float)
+        for _, at, price, _, cancel, _ in by_creator[creator]:
+            if at >= now - YEAR and not cancel:
+                days[bucket_start("day", at)] += price
+        return days
+
+    for name, query in (("raw events, per day", raw),
+                        ("rollups, 1 year", lambda c: series.query(c, now - YEAR, now)),
+                        ("rollups, 30 days", lambda c: series.query(c, now - 30 * 86400, now)),
+                        ("rollups, 24 hours", lambda c: series.query(c, now - 86400, now))):
+        samples = []
+        for _ in range(args.queries):
+            creator = rng.choice(creators[:20])  # the busiest charts
+            t = time.perf_counter()
+            query(creator)
+            samples.append((time.perf_counter() - t) * 1000)
+        print(f"  {name:22s} p50 {statistics.median(samples):7.2f} ms  p99 {percentile(samples, 99):7.2f} ms")
+    print(f"  busiest creator has {len(by_creator['creator1'])} raw events")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""
+Load test for the mainC API: seeds data, drives a weighted request mix and
+reports per-route latency percentiles and throughput.
+
+    cd backend
+    python benchmarks/load.py --scale 100000 --requests 20000 --output baseline.json
+    python benchmarks/load.py --scale 100000 --requests 20000 --compare baseline.json
+    python benchmarks/load.py --mode uvicorn --scale 1000000 --concurrency 64
+
+--mode inprocess drives the ASGI app directly (no sockets); --mode uvicorn
+starts a real server in a subprocess and drives it over HTTP keep-alive.
+--compare exits non-zero when a route's p95 or throughput regresses by more
+than --tolerance against the saved baseline.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks.seed import SEED_CREATORS, creator_id, seed  # noqa: E402
+
+# name -> weight; tuned to what the React pages do: constant dashboard polling,
+# frequent score reads, bursts of subscriptions, occasional uploads
+MIX = {
+    "subscribe": 20,
+    "dashboard": 40,
+    "ml_score": 35,
+    "upload": 5,
+}
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(q / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+class Workload:
+    def __init__(self, seeded: dict, rng: random.Random):
+        self.seeded = seeded
+        self.rng = rng
+        self.first_video, self.last_video = seeded["video_ids"]
+
+    def request(self, name: str):
+        rng = self.rng
+        creator = creator_id(rng.randrange(SEED_CREATORS))
+        if name == "subscribe":
+            tier = f"bench-tier{rng.randrange(SEED_CREATORS)}-{rng.randrange(3)}"
+            return "POST", "/membership/subscribe/", {"data": {"user_id": f"load-user{rng.randrange(100_000)}", "tier_id": tier}}
+        if name == "dashboard":
+            return "GET", f"/membership/dashboard/{creator}", {}
+        if name == "ml_score":
+            return "GET", f"/content/ml-score/video{rng.randint(self.first_video, self.last_video)}", {}
+        if name == "upload":
+            data = {"title": "Load test", "minTier": "tier1", "creator_id": creator, "tags": "load"}
+            return "POST", "/content/", {"data": data, "files": {"file": ("load.mp4", b"\0" * 64 * 1024)}}
+        raise ValueError(name)
+
+
+async def drive(client: httpx.AsyncClient, workload: Workload, total: int, concurrency: int) -> Dict[str, dict]:
+    names = list(MIX)
+    weights = [MIX[n] for n in names]
+    latencies: Dict[str, List[float]] = {n: [] for n in names}
+    errors: Dict[str, int] = {n: 0 for n in names}
+    remaining = total
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            name = workload.rng.choices(names, weights)[0]
+            method, url, kwargs = workload.request(name)
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, url, **kwargs)
+                ok = response.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            latencies[name].append(time.perf_counter() - start)
+            if not ok:
+                errors[name] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    report = {}
+    for name in names:
+        values = sorted(latencies[name])
+        report[name] = {
+            "count": len(values),
+            "errors": errors[name],
+            "rps": round(len(values) / elapsed, 1),
+            "mean_ms": round(sum(values) / len(values) * 1000, 3) if values else 0.0,
+            "p50_ms": round(percentile(values, 50) * 1000, 3),
+            "p95_ms": round(percentile(values, 95) * 1000, 3),
+            "p99_ms": round(percentile(values, 99) * 1000, 3),
+        }
+    report["_total"] = {"count": total, "seconds": round(elapsed, 3), "rps": round(total / elapsed, 1)}
+    return report
+
+
+async def run_inprocess(args) -> Dict[str, dict]:
+    seeded = seed(args.scale)
+    import mainC
+
+    transport = httpx.ASGITransport(app=mainC.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        return await drive(client, Workload(seeded, random.Random(args.seed)), args.requests, args.concurrency)
+
+
+async def run_uvicorn(args) -> Dict[str, dict]:
+    env = dict(os.environ, BENCH_SCALE=str(args.scale))
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "benchmarks.seed:app", "--port", str(args.port), "--log-level", "warning",
+         "--workers", "1"],
+        cwd=BACKEND_DIR, env=env,
+    )
+    base_url = f"http://127.0.0.1:{args.port}"
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    try:
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+            deadline = time.monotonic() + args.startup_timeout
+            while True:
+                try:
+                    await client.get("/docs")
+                    break
+                except httpx.TransportError:
+                    if time.monotonic() > deadline or server.poll() is not None:
+                        raise RuntimeError("uvicorn did not start")
+                    await asyncio.sleep(0.2)
+            # Same split as seed(), so the workload addresses the server's records
+            videos = args.scale // 2
+            seeded = {"video_ids": (1, videos)}
+            return await drive(client, Workload(seeded, random.Random(args.seed)), args.requests, args.concurrency)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def compare(report: Dict[str, dict], baseline: Dict[str, dict], tolerance: float) -> List[str]:
+    regressions = []
+    for name, current in report["routes"].items():
+        before = baseline["routes"].get(name)
+        if not before or name.startswith("_") or not before["count"]:
+            continue
+        if current["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {before['p95_ms']}ms -> {current['p95_ms']}ms")
+        if current["rps"] < before["rps"] * (1 - tolerance):
+            regressions.append(f"{name}: rps {before['rps']} -> {current['rps']}")
+    return regressions
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=("inprocess", "uvicorn"), default="inprocess")
+    parser.add_argument("--scale", type=int, default=1000, help="records to seed (10^3 .. 10^7)")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--port", type=int, default=8002)
+    parser.add_argument("--startup-timeout", type=float, default=600.0)
+    parser.add_argument("--output", help="write the machine-readable report here")
+    parser.add_argument("--compare", help="baseline report to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    os.environ.setdefault("TIERFLOW_BLOB_DIR", os.path.join(BACKEND_DIR, "blobs", "bench"))
+    runner = run_inprocess if args.mode == "inprocess" else run_uvicorn
+    routes = asyncio.run(runner(args))
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "mode": args.mode,
+            "scale": args.scale,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "python": platform.python_version(),
+        },
+        "routes": routes,
+    }
+
+    print(f"{'route':<12}{'count':>8}{'err':>6}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, r in routes.items():
+        if not name.startswith("_"):
+            print(f"{name:<12}{r['count']:>8}{r['errors']:>6}{r['rps']:>10}{r['p50_ms']:>10}{r['p95_ms']:>10}{r['p99_ms']:>10}")
+    print(f"total: {routes['_total']['count']} requests in {routes['_total']['seconds']}s ({routes['_total']['rps']} rps)")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Seed the in-process stores with synthetic creators, tiers, videos and subscriptions.
+
+Records go in through the same paths the routes use: tiers and subscriptions
+are recorded in the membership ledger (so the event log, aggregates, earnings
+and access index see them), videos are built by the upload route's helper and
+added to the search index.
+
+Also usable as the uvicorn entry point for load tests: BENCH_SCALE records are
+seeded at import time and mainC's app is re-exported.
+
+    BENCH_SCALE=100000 uvicorn benchmarks.seed:app --port 8002
+"""
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import content_service  # noqa: E402
+import membership_service  # noqa: E402
+import content_models  # noqa: E402
+from batch_scoring import score_and_split  # noqa: E402
+
+SEED_CREATORS = 100
+TIER_PRICES = (4.99, 9.99, 24.99)
+QUALITY_FLAGS = ("is_original", "unique_perspective", "trending_topic", "searchable_content", "no_ads", "policy_compliant")
+
+
+def creator_id(i: int) -> str:
+    return f"bench-creator{i}"
+
+
+def _number(video) -> int:
+    return int(video["id"][len("video"):])
+
+
+def seed(scale: int, creators: int = SEED_CREATORS, rng_seed: int = 0) -> dict:
+    """Insert `scale` records split evenly between videos and subscriptions."""
+    rng = random.Random(rng_seed)
+    tier_ids = []
+    for c in range(creators):
+        for n, price in enumerate(TIER_PRICES):
+            tier = membership_service._add_tier({"id": f"bench-tier{c}-{n}", "name": f"Tier {n}", "price": price,
+                                                 "benefits": [], "subscriberCount": 0, "creator_id": creator_id(c)})
+            tier_ids.append(tier["id"])
+
+    videos = scale // 2
+    engagement = {
+        "watch_time": [rng.randrange(0, 200) for _ in range(videos)],
+        "likes": [rng.randrange(0, 2000) for _ in range(videos)],
+        "comments": [rng.randrange(0, 200) for _ in range(videos)],
+        "shares": [rng.randrange(0, 100) for _ in range(videos)],
+    }
+    flags = {name: [rng.random() < 0.5 for _ in range(videos)] for name in QUALITY_FLAGS}
+    # Scored as the processing job would, in one vectorized pass
+    scores, splits = (column.tolist() for column in score_and_split({**engagement, **flags}))
+    numbers = []  # video<n> ids are handed out in order, so the first and last bound the range
+    for start in range(0, videos, membership_service.BULK_BATCH_SIZE):
+        batch = []
+        for i in range(start, min(start + membership_service.BULK_BATCH_SIZE, videos)):
+            video = content_service._new_video("bench.mp4", {
+                "title": f"Bench video {i}",
+                "minTier": "tier1",
+                "tags": "bench",
+                "creator_id": creator_id(i % creators),
+                **{name: column[i] for name, column in flags.items()},
+            })
+            video.update({name: column[i] for name, column in engagement.items()})
+            video.update({"status": "ready", "ml_score": scores[i], "revenue_split": splits[i]})
+            content_models.videos_db.insert(video)
+            batch.append(video)
+        content_service.search_index.add_many(batch)
+        numbers = [numbers[0] if numbers else _number(batch[0]), _number(batch[-1])]
+
+    # Subscriptions go through the bulk ingest path, which counts them per tier per batch
+    subscriptions = scale - videos
+    for start in range(0, subscriptions, membership_service.BULK_BATCH_SIZE):
+        events = [(i, {"type": "subscribe", "user_id": f"bench-user{i % 10_000}",
+                       "tier_id": tier_ids[rng.randrange(len(tier_ids))]})
+                  for i in range(start, min(start + membership_service.BULK_BATCH_SIZE, subscriptions))]
+        failed = [r for r in membership_service._apply_bulk(events) if r["status"] != "applied"]
+        if failed:
+            raise RuntimeError(f"seeding subscriptions failed: {failed[0]}")
+    return {"creators": creators, "tiers": len(tier_ids), "videos": videos, "subscriptions": subscriptions,
+            "video_ids": tuple(numbers) if numbers else (1, 0)}
+
+
+if os.environ.get("BENCH_SCALE"):
+    import mainC
+
+    SEEDED = seed(int(os.environ["BENCH_SCALE"]))
+    app = mainC.app
@@ -0,0 +1,149 @@
+"""
+Concurrency stress test for the membership write path: many threads (and
+optionally several worker processes sharing a database) subscribe, purchase,
+and create/delete tiers at once, then the totals are checked for lost
+updates and id collisions.
+
+    cd backend
+    python benchmarks/stress.py --threads 64 --ops 20000
+    python benchmarks/stress.py --processes 4 --threads 16 --ops 5000 --database sqlite:////tmp/stress.db
+
+Exits non-zero when any check fails.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+TIERS = ("tier1", "tier2", "tier3")
+ITEMS = ("purchase1", "purchase2", "purchase3")
+
+
+def run_ops(ops: int, threads: int, worker: int = 0) -> dict:
+    """Drive the router functions from a thread pool; returns what was done."""
+    import membership_service as ms
+
+    def op(i: int):
+        kind = i % 10
+        if kind < 6:
+            tier_id = TIERS[i % len(TIERS)]
+            ms.subscribe(user_id=f"stress-{worker}-{i}", tier_id=tier_id, idempotency_key=None)
+            return "subscribe", tier_id
+        if kind < 8:
+            item_id = ITEMS[i % len(ITEMS)]
+            ms.purchase_item(item_id, user_id=f"stress-{worker}-{i}", idempotency_key=None)
+            return "purchase", item_id
+        tier = ms.create_tier({"name": f"Stress {worker}-{i}", "price": 1.0, "creator_id": "stress-creator"})
+        if kind == 9:
+            ms.delete_tier(tier["id"])
+        return "tier", tier["id"]
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        done = list(pool.map(op, range(ops)))
+    return {
+        "subscribes": Counter(target for kind, target in done if kind == "subscribe"),
+        "purchases": Counter(target for kind, target in done if kind == "purchase"),
+        "tier_ids": [target for kind, target in done if kind == "tier"],
+    }
+
+
+def counts():
+    import membership_models
+
+    return ({t: membership_models.tiers_db.get(t)["subscriberCount"] for t in TIERS},
+            {p: membership_models.one_time_purchases_db.get(p)["purchaseCount"] for p in ITEMS},
+            len(membership_models.subscriptions_db))
+
+
+def check(before, after, subscribes: Counter, purchases: Counter, tier_ids) -> list:
+    failures = []
+    for tier_id in TIERS:
+        if after[0][tier_id] - before[0][tier_id] != subscribes[tier_id]:
+            failures.append(f"{tier_id}: subscriberCount grew by {after[0][tier_id] - before[0][tier_id]}, "
+                            f"expected {subscribes[tier_id]}")
+    for item_id in ITEMS:
+        if after[1][item_id] - before[1][item_id] != purchases[item_id]:
+            failures.append(f"{item_id}: purchaseCount grew by {after[1][item_id] - before[1][item_id]}, "
+                            f"expected {purchases[item_id]}")
+    if after[2] - before[2] != sum(subscribes.values()):
+        failures.append(f"subscriptions: {after[2] - before[2]} rows, expected {sum(subscribes.values())}")
+    duplicates = [pk for pk, n in Counter(tier_ids).items() if n > 1]
+    if duplicates:
+        failures.append(f"{len(duplicates)} duplicate tier ids, e.g. {duplicates[:5]}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ops", type=int, default=20000, help="operations per process")
+    parser.add_argument("--threads", type=int, default=64)
+    parser.add_argument("--processes", type=int, default=1, help="worker processes; needs --database when > 1")
+    parser.add_argument("--database", help="TIERFLOW_DATABASE_URL shared by the processes")
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.database:
+        os.environ["TIERFLOW_DATABASE_URL"] = args.database
+    elif args.processes > 1:
+        parser.error("--processes > 1 needs --database: in-memory state is per process")
+
+    if args.child is not None:
+        # Report to the parent as "kind target count" lines
+        result = run_ops(args.ops, args.threads, args.child)
+        for kind in ("subscribes", "purchases"):
+            for target, n in result[kind].items():
+                print(kind, target, n)
+        for tier_id in result["tier_ids"]:
+            print("tier", tier_id, 1)
+        return
+
+    from membership_service import verify_dashboard
+
+    before = counts()
+    started = time.perf_counter()
+    if args.processes == 1:
+        result = run_ops(args.ops, args.threads)
+        subscribes, purchases, tier_ids = result["subscribes"], result["purchases"], result["tier_ids"]
+    else:
+        children = [
+            subprocess.Popen([sys.executable, __file__, "--child", str(w), "--ops", str(args.ops),
+                              "--threads", str(args.threads), "--database", args.database],
+                             stdout=subprocess.PIPE, text=True, cwd=BACKEND_DIR)
+            for w in range(args.processes)
+        ]
+        subscribes, purchases, tier_ids = Counter(), Counter(), []
+        for child in children:
+            out, _ = child.communicate()
+            if child.returncode:
+                sys.exit(f"worker exited with {child.returncode}")
+            for line in out.splitlines():
+                if not line.startswith(("subscribes ", "purchases ", "tier ")):
+                    continue  # router logging
+                kind, target, n = line.split()
+                if kind == "tier":
+                    tier_ids.append(target)
+                else:
+                    (subscribes if kind == "subscribes" else purchases)[target] += int(n)
+    elapsed = time.perf_counter() - started
+
+    failures = check(before, counts(), subscribes, purchases, tier_ids)
+    if args.processes == 1 and not verify_dashboard("creator1")["consistent"]:
+        failures.append("creator1 dashboard drifted from a full recompute")
+    total = args.ops * args.processes
+    print(f"{total} ops, {args.processes} process(es) x {args.threads} threads in {elapsed:.2f}s "
+          f"({total / elapsed:.0f} ops/s)")
+    for line in failures:
+        print(f"FAIL {line}")
+    if failures:
+        sys.exit(1)
+    print("ok: no lost updates, no id collisions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,645 @@
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import Mapping
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from snapshot import pack_groups, pack_sections, unpack_groups, unpack_sections
+from store import SCAN_BATCH, Row
+
+_ABSENT = object()  # field not set on this row
+_NO_FLAG = 255
+
+
+class _Top:
+    """Sorts after every key, for inclusive upper bounds on (value, key) pairs."""
+
+    def __lt__(self, other: Any) -> bool:
+        return False
+
+    def __gt__(self, other: Any) -> bool:
+        return True
+
+
+_TOP = _Top()
+
+
+class _Text:
+    """
+    Free text as UTF-8 appended to one buffer, with a single 64-bit word per
+    row packing (offset << 24 | length) so a reader never sees half an update.
+    A rewritten value is appended again; the old bytes are not reclaimed.
+    """
+
+    kind = "text"
+    UNSET = 0xFFFFFF
+    NONE = 0xFFFFFE
+
+    def __init__(self):
+        self.data = bytearray()
+        self.slots = array("Q")
+
+    def save(self) -> Tuple[Dict[str, Any], Any]:
+        return {"data": self.data, "slots": self.slots}, None
+
+    def restore(self, part: Callable[[str], memoryview], meta: Any) -> None:
+        self.data = bytearray(part("data"))
+        self.slots.frombytes(part("slots"))
+
+    def grow(self) -> None:
+        self.slots.append(self.UNSET)
+
+    def accepts(self, value: Any) -> bool:
+        # 4 UTF-8 bytes per character at most, so the length always fits below the sentinels
+        return value is None or (isinstance(value, str) and len(value) <= 0x3FFFFF)
+
+    def get(self, i: int) -> Any:
+        slot = self.slots[i]
+        length = slot & 0xFFFFFF
+        if length >= self.NONE:
+            return _ABSENT if length == self.UNSET else None
+        start = slot >> 24
+        return self.data[start:start + length].decode()
+
+    def set(self, i: int, value: Any) -> None:
+        if value is None:
+            self.slots[i] = self.NONE
+            return
+        raw = value.encode()
+        start = len(self.data)
+        self.data += raw
+        self.slots[i] = start << 24 | len(raw)
+
+    def clear(self, i: int) -> None:
+        self.slots[i] = self.UNSET
+
+
+class _Interned(_Text):
+    """Low-cardinality strings stored as 4-byte codes into a shared vocabulary."""
+
+    kind = "interned"
+
+    def __init__(self):
+        self.codes = array("I")
+        self.vocab: List[Any] = [_ABSENT]
+        self.lookup: Dict[Any, int] = {}
+
+    def save(self) -> Tuple[Dict[str, Any], Any]:
+        return {"codes": self.codes}, self.vocab[1:]
+
+    def restore(self, part: Callable[[str], memoryview], meta: Any) -> None:
+        self.codes.frombytes(part("codes"))
+        self.vocab = [_ABSENT] + meta
+        self.lookup = {value: code for code, value in enumerate(meta, 1)}
+
+    def grow(self) -> None:
+        self.codes.append(0)
+
+    def accepts(self, value: Any) -> bool:
+        return value is None or isinstance(value, str)
+
+    def get(self, i: int) -> Any:
+        return self.vocab[self.codes[i]]
+
+    def set(self, i: int, value: Any) -> None:
+        code = self.lookup.get(value)
+        if code is None:
+            code = self.lookup[value] = len(self.vocab)
+            self.vocab.append(value)
+        self.codes[i] = code
+
+    def clear(self, i: int) -> None:
+        self.codes[i] = 0
+
+
+class _Number:
+    """Typed array plus a presence byte; int64 ('q') or float64 ('d'), floats read back as float."""
+
+    def __init__(self, typecode: str):
+        self.values = array(typecode)
+        self.present = bytearray()
+        self.integral = typecode == "q"
+        self.kind = "int" if self.integral else "float"
+
+    def save(self) -> Tuple[Dict[str, Any], Any]:
+        return {"values": self.values, "present": self.present}, None
+
+    def restore(self, part: Callable[[str], memoryview], meta: Any) -> None:
+        self.values.frombytes(part("values"))
+        self.present = bytearray(part("present"))
+
+    def grow(self) -> None:
+        self.values.append(0)
+        self.present.append(0)
+
+    def accepts(self, value: Any) -> bool:
+        if isinstance(value, bool):
+            return False
+        if self.integral:
+            return isinstance(value, int) and -2 ** 63 <= value < 2 ** 63
+        return isinstance(value, (int, float))
+
+    def get(self, i: int) -> Any:
+        return self.values[i] if self.present[i] else _ABSENT
+
+    def set(self, i: int, value: Any) -> None:
+        self.values[i] = value
+        self.present[i] = 1
+
+    def clear(self, i: int) -> None:
+        self.values[i] = 0
+        self.present[i] = 0
+
+    def array(self, default: Any) -> np.ndarray:
+        values = np.array(self.values)
+        return np.where(np.frombuffer(bytes(self.present), dtype=np.uint8) == 1, values, default)
+
+
+class _Flag:
+    """One byte per row: 0/1, or _NO_FLAG when unset."""
+
+    kind = "flag"
+
+    def __init__(self):
+        self.values = bytearray()
+
+    def save(self) -> Tuple[Dict[str, Any], Any]:
+        return {"values": self.values}, None
+
+    def restore(self, part: Callable[[str], memoryview], meta: Any) -> None:
+        self.values = bytearray(part("values"))
+
+    def grow(self) -> None:
+        self.values.append(_NO_FLAG)
+
+    def accepts(self, value: Any) -> bool:
+        return isinstance(value, bool)
+
+    def get(self, i: int) -> Any:
+        value = self.values[i]
+        return _ABSENT if value == _NO_FLAG else value == 1
+
+    def set(self, i: int, value: Any) -> None:
+        self.values[i] = value
+
+    def clear(self, i: int) -> None:
+        self.values[i] = _NO_FLAG
+
+    def array(self, default: Any) -> np.ndarray:
+        values = np.frombuffer(bytes(self.values), dtype=np.uint8)
+        return np.where(values == _NO_FLAG, bool(default), values == 1)
+
+
+# Video record layout, in the order content_service builds it. Fields outside
+# it, or values of another type, are kept per row in an overflow dict.
+VIDEO_FIELDS = (
+    ("filename", "text"), ("title", "text"), ("description", "text"),
+    ("minTier", "interned"), ("tags", "interned"), ("creator_id", "interned"),
+    ("created_at", "text"), ("status", "interned"),
+    ("is_original", "flag"), ("unique_perspective", "flag"), ("trending_topic", "flag"),
+    ("searchable_content", "flag"), ("no_ads", "flag"), ("policy_compliant", "flag"),
+    ("watch_time", "float"), ("likes", "int"), ("comments", "int"), ("shares", "int"),
+    ("size_bytes", "int"), ("sha256", "text"), ("blob_id", "text"), ("ml_score", "float"), ("revenue_split", "float"),
+)
+COLUMN_KINDS = {
+    "text": _Text,
+    "interned": _Interned,
+    "flag": _Flag,
+    "float": lambda: _Number("d"),
+    "int": lambda: _Number("q"),
+}
+
+
+class _Ordering:
+    """
+    One group's row numbers sorted by (sort value, key). Only the 4-byte row
+    numbers are stored; comparisons read the values from the columns.
+    """
+
+    def __init__(self, value: Callable[[int], Any], key: Callable[[int], Any]):
+        self.rows = array("I")
+        self.value = value
+        self.key = key
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def left(self, value: Any, pk: Any = None) -> int:
+        """First position whose (value, key) >= (value, pk); pk None means (value,)."""
+        lo = bisect_left(self.rows, value, key=self.value)
+        if pk is None:
+            return lo
+        return bisect_left(self.rows, pk, lo, bisect_right(self.rows, value, lo, key=self.value), key=self.key)
+
+    def right(self, value: Any, pk: Any = _TOP) -> int:
+        """First position whose (value, key) > (value, pk)."""
+        hi = bisect_right(self.rows, value, key=self.value)
+        if pk is _TOP:
+            return hi
+        return bisect_right(self.rows, pk, bisect_left(self.rows, value, 0, hi, key=self.value), hi, key=self.key)
+
+    def add(self, i: int) -> None:
+        self.rows.insert(self.right(self.value(i), self.key(i)), i)
+
+    def remove(self, i: int) -> None:
+        j = self.left(self.value(i), self.key(i))
+        if j < len(self.rows) and self.rows[j] == i:
+            del self.rows[j]
+
+
+class VideoRow(Mapping):
+    """
+    Read-only dict-shaped view of one catalog row. The first access copies the
+    whole row out of the columns under the catalog lock and the view keeps
+    that copy, so every field it returns comes from one version of the row,
+    never from either side of a multi-column update. Bulk passes read the
+    columns directly instead (VideoCatalog.columns).
+    """
+
+    __slots__ = ("_catalog", "_i", "_row")
+
+    def __init__(self, catalog: "VideoCatalog", i: int):
+        self._catalog = catalog
+        self._i = i
+        self._row: Optional[Row] = None
+
+    def _snapshot(self) -> Row:
+        if self._row is None:
+            self._row = self._catalog._materialize(self._i)
+        return self._row
+
+    def __getitem__(self, name: str) -> Any:
+        return self._snapshot()[name]
+
+    def get(self, name: str, default: Any = None) -> Any:
+        return self._snapshot().get(name, default)
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._snapshot()
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._snapshot())
+
+    def __len__(self) -> int:
+        return len(self._snapshot())
+
+    def to_dict(self) -> Row:
+        return dict(self._snapshot())
+
+    def __repr__(self) -> str:
+        return f"VideoRow({self._snapshot()!r})"
+
+
+class VideoCatalog:
+    """
+    Columnar, memory-compact drop-in for Table holding video records.
+    Numbers and flags live in typed arrays, creator_id/minTier/tags/status are
+    interned, and rows are addressed through a key -> row number map, so a
+    video costs a few hundred bytes instead of a ~1 KB dict plus boxed values.
+    Reads return VideoRow views; writes are serialized by a per-catalog lock
+    and update the columns in place. Deleted rows are not reused.
+    """
+
+    def __init__(self, key: str = "id", indexes: Iterable[str] = (), rows: Iterable[Row] = (),
+                 ordered: Iterable[Tuple[str, str]] = (), fields=VIDEO_FIELDS):
+        self.key = key
+        self._columns = {name: COLUMN_KINDS[kind]() for name, kind in fields}
+        self._getters = [(name, column.get) for name, column in self._columns.items()]
+        self._keys: List[Any] = []  # row number -> key, None once deleted
+        self._key_map: Optional[Dict[Any, int]] = {}  # and back; None until first needed after load()
+        self._extra: Dict[int, Row] = {}
+        self._indexes: Dict[str, Dict[Any, array]] = {field: {} for field in indexes}
+        self._ordered: Dict[Tuple[str, str], Dict[Any, _Ordering]] = {spec: {} for spec in ordered}
+        self._sequences: Dict[str, int] = {}
+        self._lock = threading.RLock()
+        for row in rows:
+            self.insert(row)
+
+    @property
+    def _rows(self) -> Dict[Any, int]:
+        rows = self._key_map
+        if rows is None:
+            # Hashing every key is most of load()'s cost; group lookups and pages don't need it
+            with self._lock:
+                if self._key_map is None:
+                    rows = dict(zip(self._keys, range(len(self._keys))))
+                    rows.pop(None, None)  # deleted rows
+                    self._key_map = rows
+                rows = self._key_map
+        return rows
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __iter__(self) -> Iterator[VideoRow]:
+        return iter([VideoRow(self, i) for i in list(self._rows.values())])
+
+    def __contains__(self, pk: Any) -> bool:
+        return pk in self._rows
+
+    def get(self, pk: Any) -> Optional[VideoRow]:
+        i = self._rows.get(pk)
+        return None if i is None else VideoRow(self, i)
+
+    def find(self, field: str, value: Any) -> List[VideoRow]:
+        rows = self._indexes[field].get(value)
+        return [] if rows is None else [VideoRow(self, i) for i in rows.tolist()]
+
+    def count(self, field: str, value: Any) -> int:
+        return len(self._indexes[field].get(value, ()))
+
+    def insert(self, row: Row) -> VideoRow:
+        pk = row[self.key]
+        with self._lock:
+            if pk in self._rows:
+                raise KeyError(f"Duplicate key: {pk}")
+            i = len(self._keys)
+            for column in self._columns.values():
+                column.grow()
+            self._keys.append(pk)
+            self._write(i, row)
+            self._rows[pk] = i
+            for field, index in self._indexes.items():
+                index.setdefault(self._field(i, field), array("I")).append(i)
+            for spec in self._ordered:
+                self._order(spec, i)
+        return VideoRow(self, i)
+
+    def insert_new(self, row: Row) -> bool:
+        """Insert unless the key exists; False if it did."""
+        with self._lock:
+            if row[self.key] in self._rows:
+                return False
+            self.insert(row)
+            return True
+
+    def next_id(self, prefix: str) -> str:
+        """Allocate the next key of the form prefix<n>; n only grows, so deleted keys are never reused."""
+        with self._lock:
+            last = self._sequences.get(prefix)
+            if last is None:
+                last = max((int(pk[len(prefix):]) for pk in self._rows
+                            if isinstance(pk, str) and pk.startswith(prefix) and pk[len(prefix):].isdigit()), default=0)
+            self._sequences[prefix] = last + 1
+        return f"{prefix}{last + 1}"
+
+    def update(self, pk: Any, changes: Row) -> Optional[VideoRow]:
+        with self._lock:
+            i = self._rows.get(pk)
+            if i is None:
+                return None
+            changes = {k: v for k, v in changes.items() if k != self.key}
+            indexed = [f for f in self._indexes if f in changes]
+            ordered = [spec for spec in self._ordered if spec[0] in changes or spec[1] in changes]
+            before = {f: self._field(i, f) for f in indexed}
+            for spec in ordered:
+                self._unorder(spec, i)
+            self._write(i, changes)
+            for field in indexed:
+                value = self._field(i, field)
+                if value != before[field]:
+                    self._unindex(field, before[field], i)
+                    self._indexes[field].setdefault(value, array("I")).append(i)
+            for spec in ordered:
+                self._order(spec, i)
+        return VideoRow(self, i)
+
+    def upsert(self, row: Row) -> VideoRow:
+        with self._lock:
+            if row[self.key] in self._rows:
+                return self.update(row[self.key], row)
+            return self.insert(row)
+
+    def modify(self, pk: Any, changes: Callable[[VideoRow], Row]) -> Optional[VideoRow]:
+        """Atomic read-modify-write: changes(row) computes the fields to update from the current row."""
+        with self._lock:
+            i = self._rows.get(pk)
+            if i is None:
+                return None
+            return self.update(pk, changes(VideoRow(self, i)))
+
+    def increment(self, pk: Any, field: str, by: int = 1) -> Optional[VideoRow]:
+        with self._lock:
+            i = self._rows.get(pk)
+            if i is None:
+                return None
+            return self.update(pk, {field: (self._field(i, field) or 0) + by})
+
+    def delete(self, pk: Any) -> Optional[Row]:
+        """Remove a row; returns a plain copy of it, since the row number is retired."""
+        with self._lock:
+            i = self._rows.get(pk)
+            if i is None:
+                return None
+            row = self._materialize(i)
+            for field in self._indexes:
+                self._unindex(field, self._field(i, field), i)
+            for spec in self._ordered:
+                self._unorder(spec, i)
+            del self._rows[pk]
+            self._keys[i] = None
+            for column in self._columns.values():
+                column.clear(i)
+            self._extra.pop(i, None)
+        return row
+
+    def scan(self, group_field: str, group_value: Any, sort_field: str, after: Optional[Tuple[Any, Any]] = None,
+             descending: bool = False, low: Any = None, high: Any = None) -> Iterator[VideoRow]:
+        """
+        Yield a group's rows ordered by (sort value, key), optionally bounded to
+        low <= sort value <= high and starting strictly after an (sort value, key) cursor.
+        Rows whose sort value is None are not part of the ordering.
+        """
+        entries = self._ordered[(group_field, sort_field)].get(group_value)
+        if entries is None:
+            return
+        start = 0 if low is None else entries.left(low)
+        stop = len(entries) if high is None else entries.right(high)
+        if after is not None:
+            value, pk = after
+            if descending:
+                stop = min(stop, entries.left(value, pk))
+            else:
+                start = max(start, entries.right(value, pk))
+        while start < stop:
+            # Copy a small batch at a time so concurrent writers can't break iteration
+            if descending:
+                batch = entries.rows[max(start, stop - SCAN_BATCH):stop][::-1]
+                stop -= len(batch)
+            else:
+                batch = entries.rows[start:min(stop, start + SCAN_BATCH)]
+                start += len(batch)
+            if not batch:
+                return
+            for i in batch:
+                if self._keys[i] is not None:
+                    yield VideoRow(self, i)
+
+    def dump(self) -> bytes:
+        """Serialize columns, keys, indexes and orderings for a snapshot; buffers are copied as-is."""
+        with self._lock:
+            columns, buffers = [], []
+            for name, column in self._columns.items():
+                parts, meta = column.save()
+                columns.append([name, column.kind, meta])
+                buffers.extend((f"{name}.{part}", bytes(data)) for part, data in parts.items())
+            indexes = {}
+            for field, index in self._indexes.items():
+                indexes[field], packed = pack_groups(index.items())
+                buffers.append((f"index.{field}", packed))
+            ordered = []
+            for n, (spec, groups) in enumerate(self._ordered.items()):
+                groups, packed = pack_groups((value, group.rows) for value, group in groups.items())
+                ordered.append([*spec, groups])
+                buffers.append((f"ordered.{n}", packed))
+            meta = {
+                "key": self.key,
+                "columns": columns,
+                "keys": list(self._keys),
+                "extra": {str(i): dict(row) for i, row in self._extra.items()},
+                "sequences": dict(self._sequences),
+                "indexes": indexes,
+                "ordered": ordered,
+            }
+        return pack_sections(meta, buffers)
+
+    @classmethod
+    def load(cls, data: memoryview, indexes: Iterable[str] = (), ordered: Iterable[Tuple[str, str]] = ()) -> "VideoCatalog":
+        """Inverse of dump(). Indexes or orderings the dump doesn't have are rebuilt from the rows."""
+        meta, buffers = unpack_sections(data)
+        catalog = cls(key=meta["key"], fields=[(name, kind) for name, kind, _ in meta["columns"]])
+        for name, _, column_meta in meta["columns"]:
+            catalog._columns[name].restore(lambda part, name=name: buffers[f"{name}.{part}"], column_meta)
+        catalog._keys = meta["keys"]
+        catalog._key_map = None
+        catalog._extra = {int(i): row for i, row in meta["extra"].items()}
+        catalog._sequences = meta["sequences"]
+        live = lambda: catalog._rows.values()  # only walked to rebuild something the dump lacks
+        for field in indexes:
+            saved = meta["indexes"].get(field)
+            if saved is not None:
+                catalog._indexes[field] = unpack_groups(saved, buffers[f"index.{field}"])
+                continue
+            index = catalog._indexes[field] = {}
+            for i in live():
+                index.setdefault(catalog._field(i, field), array("I")).append(i)
+        saved_orderings = {(group, sort): (n, groups) for n, (group, sort, groups) in enumerate(meta["ordered"])}
+        for spec in ordered:
+            spec = tuple(spec)
+            if spec in saved_orderings:
+                n, groups = saved_orderings[spec]
+                catalog._ordered[spec] = {value: catalog._new_ordering(spec, rows)
+                                          for value, rows in unpack_groups(groups, buffers[f"ordered.{n}"]).items()}
+                continue
+            catalog._ordered[spec] = {}
+            for i in live():
+                catalog._order(spec, i)
+        return catalog
+
+    def columns(self, defaults: Dict[str, Any]) -> Tuple[List[Any], Dict[str, np.ndarray]]:
+        """
+        Keys of the live rows and numpy arrays of the given numeric/flag fields
+        for them, with defaults filling unset values, for vectorized passes.
+        """
+        with self._lock:
+            live = np.fromiter(self._rows.values(), dtype=np.int64, count=len(self._rows))
+            arrays = {name: self._columns[name].array(default) for name, default in defaults.items()}
+            for i, extra in self._extra.items():
+                for name in defaults:
+                    if name in extra:
+                        arrays[name] = arrays[name].astype(object)
+                        arrays[name][i] = extra[name]
+            keys = [self._keys[i] for i in live.tolist()]
+        return keys, {name: values[live] for name, values in arrays.items()}
+
+    def _value(self, i: int, name: Any) -> Any:
+        if name == self.key:
+            pk = self._keys[i]
+            return _ABSENT if pk is None else pk
+        column = self._columns.get(name)
+        if column is not None:
+            value = column.get(i)
+            if value is not _ABSENT:
+                return value
+        extra = self._extra.get(i)
+        return _ABSENT if extra is None else extra.get(name, _ABSENT)
+
+    def _field(self, i: int, name: str) -> Any:
+        # row.get(name) semantics for indexes: unset reads as None
+        value = self._value(i, name)
+        return None if value is _ABSENT else value
+
+    def _materialize(self, i: int) -> Row:
+        with self._lock:
+            row = {self.key: self._keys[i]}
+            for name, get in self._getters:
+                value = get(i)
+                if value is not _ABSENT:
+                    row[name] = value
+            extra = self._extra.get(i)
+            if extra:
+                row.update(extra)
+        return row
+
+    def _write(self, i: int, changes: Row) -> None:
+        extra = self._extra.get(i)
+        for name, value in changes.items():
+            if name == self.key:
+                continue
+            column = self._columns.get(name)
+            if column is not None and column.accepts(value):
+                column.set(i, value)
+                if extra is not None:
+                    extra.pop(name, None)
+                continue
+            if column is not None:
+                column.clear(i)
+            if extra is None:
+                extra = self._extra[i] = {}
+            extra[name] = value
+        if extra is not None and not extra:
+            del self._extra[i]
+
+    def _ordered_value(self, i: int, field: str) -> Any:
+        # None (or a value the float ordering can't compare) leaves the row out
+        value = self._field(i, field)
+        column = self._columns.get(field)
+        if isinstance(column, _Number) and not column.integral and not isinstance(value, (int, float)):
+            return None
+        return value
+
+    def _order(self, spec: Tuple[str, str], i: int) -> None:
+        if self._ordered_value(i, spec[1]) is None:
+            return
+        group_value = self._field(i, spec[0])
+        group = self._ordered[spec].get(group_value)
+        if group is None:
+            group = self._ordered[spec][group_value] = self._new_ordering(spec)
+        group.add(i)
+
+    def _new_ordering(self, spec: Tuple[str, str], rows: Optional[array] = None) -> _Ordering:
+        ordering = _Ordering(lambda row, field=spec[1]: self._field(row, field), lambda row: self._keys[row])
+        if rows is not None:
+            ordering.rows = rows
+        return ordering
+
+    def _unorder(self, spec: Tuple[str, str], i: int) -> None:
+        group_value = self._field(i, spec[0])
+        group = self._ordered[spec].get(group_value)
+        if group is None or self._ordered_value(i, spec[1]) is None:
+            return
+        group.remove(i)
+        if not len(group):
+            del self._ordered[spec][group_value]
+
+    def _unindex(self, field: str, value: Any, i: int) -> None:
+        rows = self._indexes[field].get(value)
+        if rows is not None:
+            try:
+                rows.remove(i)
+            except ValueError:
+                pass
+            if not rows:
+                del self._indexes[field][value]
@@ -0,0 +1,39 @@
+from catalog import VideoCatalog
+from engagement import EngagementPipeline
+from metrics import InstrumentedTable
+from search import SearchIndex
+from models import (DATABASE_URL, SEARCH_INDEX_DIR, VIDEO_ORDERINGS, calculate_ml_score, calculate_revenue_split,
+                    derived, response_cache, state_snapshot)
+
+# Stores behind the content service: the video catalog, its search index and the
+# engagement pipeline that rescores it
+
+if DATABASE_URL:
+    from models import database
+
+    videos_db = database.table("content", indexes=("creator_id",), ordered=VIDEO_ORDERINGS)
+elif state_snapshot is not None:
+    def _load_videos(data):
+        if data is None:
+            return VideoCatalog(indexes=("creator_id",), ordered=VIDEO_ORDERINGS)
+        return VideoCatalog.load(data, indexes=("creator_id",), ordered=VIDEO_ORDERINGS)
+
+    videos_db = state_snapshot.store("videos", _load_videos, VideoCatalog.dump)
+else:
+    # Columnar: typed arrays and interned strings instead of one dict per video
+    videos_db = VideoCatalog(indexes=("creator_id",), ordered=VIDEO_ORDERINGS)
+
+# Count every table call against the route that made it, for /metrics
+videos_db = InstrumentedTable(videos_db, "videos")
+
+# Full-text/tag search over uploaded content, updated by the content router
+search_index = derived(lambda: SearchIndex.open(SEARCH_INDEX_DIR, videos_db) if SEARCH_INDEX_DIR else
+                       SearchIndex.from_rows(videos_db))
+
+def _engagement_rescored(rows):
+    for row in rows:
+        search_index.set_quality(row["id"], row.get("ml_score"))
+        response_cache.invalidate(row["id"])
+
+engagement_pipeline = EngagementPipeline(videos_db, score=calculate_ml_score, split=calculate_revenue_split,
+                                         on_rescore=_engagement_rescored)
@@ -1,9 +1,85 @@
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException
-from models import videos_db, calculate_ml_score, calculate_revenue_split
+from typing import Optional, Union
+import orjson
+from fastapi import APIRouter, UploadFile, File, Form, Header, HTTPException, Query, Request
+from starlette.concurrency import run_in_threadpool
+from models import response_cache, calculate_ml_score, calculate_revenue_split
+from content_models import videos_db, search_index, engagement_pipeline
+from batch_scoring import rescore_table
+from uploads import OffsetConflict, blob_store, upload_sessions, processing_queue, iter_upload_file
+from pagination import decode_cursor, paginate
+from responses import FastJSONResponse
+from metrics import ProfiledRoute
+from entitlements import EntitlementCache, LocalEntitlements, RemoteEntitlements
+from snapshot import loaded
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
 
-@router.post("/")
+# Content authorization, set by the gateway: in-process against the access index when
+# membership runs here too, otherwise through the membership service it points us at
+entitlements: Optional[Union[LocalEntitlements, RemoteEntitlements]] = None
+
+def configure_entitlements(membership_url: Optional[str] = None, ttl: float = 30.0):
+    global entitlements
+    if membership_url:
+        entitlements = RemoteEntitlements(membership_url, EntitlementCache(ttl=ttl))
+    else:
+        from membership_models import access_index
+        entitlements = LocalEntitlements(access_index)
+
+def _new_video(filename, metadata: dict):
+    return {
+        "id": videos_db.next_id("video"),
+        "filename": filename,
+        "title": metadata["title"],
+        "description": metadata.get("description", ""),
+        "minTier": metadata["minTier"],
+        "tags": metadata.get("tags", ""),
+        "creator_id": metadata.get("creator_id", ""),
+        "created_at": __import__("datetime").datetime.utcnow().isoformat() + "Z",
+        "status": "uploading",
+        "blob_id": blob_store.new_id(),
+        # ML model parameters
+        "is_original": metadata.get("is_original", True),
+        "unique_perspective": metadata.get("unique_perspective", False),
+        "trending_topic": metadata.get("trending_topic", False),
+        "searchable_content": metadata.get("searchable_content", True),
+        "no_ads": metadata.get("no_ads", True),
+        "policy_compliant": metadata.get("policy_compliant", True),
+        # Engagement starts at zero and is fed by POST /content/engagement
+        "watch_time": 0,  # seconds
+        "likes": 0,
+        "comments": 0,
+        "shares": 0,
+    }
+
+def process_video(video_id: str):
+    """Background job: extract file metadata, then calculate ML score and revenue split."""
+    video = videos_db.get(video_id)
+    if video is None:
+        return
+    blob_id = video.get("blob_id") or video_id
+    size, digest = blob_store.size(blob_id), blob_store.digest(blob_id)
+
+    def scored(row):
+        # Scored from the row as it is when written, so engagement applied meanwhile isn't overwritten
+        ml_score = calculate_ml_score(row)
+        return {
+            "size_bytes": size,
+            "sha256": digest,
+            "ml_score": ml_score,
+            "revenue_split": calculate_revenue_split(ml_score),
+            "status": "ready",
+        }
+
+    video = videos_db.modify(video_id, scored)
+    if video is None:
+        return
+    search_index.set_quality(video_id, video["ml_score"])
+    response_cache.invalidate(video_id)
+
+# Deprecated: the multipart body is spooled by the form parser before this runs.
+# Clients should use the resumable /uploads routes, which stream to the blob store.
+@router.post("/", deprecated=True)
 async def upload_content(
     file: UploadFile = File(...),
     title: str = Form(...),
@@ -18,66 +94,285 @@ async def upload_content(
     no_ads: bool = Form(True),
     policy_compliant: bool = Form(True)
 ):
-    video = {
-        "id": f"video{len(videos_db)+1}",
-        "filename": file.filename,
+    video = _new_video(file.filename, {
         "title": title,
         "description": description,
         "minTier": minTier,
         "tags": tags,
         "creator_id": creator_id,
-        "created_at": __import__("datetime").datetime.utcnow().isoformat() + "Z",
-        # ML model parameters
         "is_original": is_original,
         "unique_perspective": unique_perspective,
         "trending_topic": trending_topic,
         "searchable_content": searchable_content,
         "no_ads": no_ads,
         "policy_compliant": policy_compliant,
-        # Mock engagement data (in real app, this would come from TikTok API)
-        "watch_time": 90,  # seconds
-        "likes": 500,
-        "comments": 75,
-        "shares": 25,
-    }
-    
-    # Calculate ML score and revenue split
-    ml_score = calculate_ml_score(video)
-    revenue_split = calculate_revenue_split(ml_score)
-    
-    video["ml_score"] = ml_score
-    video["revenue_split"] = revenue_split
-    
-    videos_db.append(video)
+    })
+    videos_db.insert(video)
+    search_index.add(video)
+
+    # Copy to the blob store in bounded chunks; scoring happens off the request
+    await blob_store.append(video["blob_id"], iter_upload_file(file))
+    # Snapshot before queueing; the worker updates the stored record concurrently
+    video = dict(videos_db.update(video["id"], {"status": "processing"}))
+    processing_queue.submit(process_video, video["id"])
+    return video
+
+# Resumable uploads: create a session, PUT raw bytes at Upload-Offset, then complete.
+# The request body is streamed straight to disk, so memory stays bounded for any file size.
+@router.post("/uploads")
+def create_upload(metadata: dict):
+    if not metadata.get("title") or not metadata.get("minTier"):
+        raise HTTPException(status_code=400, detail="title and minTier required")
+    video = _new_video(metadata.get("filename"), metadata)
+    videos_db.insert(video)
+    search_index.add(video)
+    return upload_sessions.create(video["id"], video["blob_id"], metadata.get("size"))
+
+@router.get("/uploads/{upload_id}")
+def get_upload(upload_id: str):
+    session = upload_sessions.get(upload_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return session
+
+@router.put("/uploads/{upload_id}")
+async def upload_chunk(upload_id: str, request: Request, upload_offset: int = Header(0)):
+    session = await run_in_threadpool(upload_sessions.get, upload_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    total = session["total_size"]
+    try:
+        # Checks the offset and appends under the blob's lock, so of two PUTs at one offset only one writes
+        await blob_store.append(session["blob_id"], request.stream(), offset=upload_offset,
+                                limit=None if total is None else total - upload_offset)
+    except OffsetConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    finally:
+        # The blob on disk is the source of truth for where to resume
+        session["offset"] = blob_store.size(session["blob_id"])
+    return session
+
+@router.post("/uploads/{upload_id}/complete")
+def complete_upload(upload_id: str):
+    session = upload_sessions.get(upload_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    if session["total_size"] is not None and session["offset"] != session["total_size"]:
+        raise HTTPException(status_code=400, detail=f"Upload incomplete: {session['offset']} of {session['total_size']} bytes")
+    if upload_sessions.close(upload_id) is None:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    video = videos_db.update(session["video_id"], {"status": "processing"})
+    if video is None:
+        # Kept only in memory, the video didn't survive a restart the session did
+        raise HTTPException(status_code=404, detail="Content not found")
+    video = dict(video)
+    processing_queue.submit(process_video, session["video_id"])
     return video
 
+@router.post("/rescore")
+def rescore_content():
+    # Recompute every ml_score/revenue_split in one vectorized pass (e.g. per payout cycle)
+    # Only changed rows move in the search index; the rest already match it
+    rescored = rescore_table(videos_db, search_index.set_quality)
+    response_cache.clear()
+    return {"rescored": rescored, "total": len(videos_db)}
+
+def _tag_set(tags: str):
+    return {t.strip().lower() for t in (tags or "").split(",") if t.strip()}
+
 @router.get("/creator/{creator_id}")
-def get_creator_content(creator_id: str):
-    return [v for v in videos_db if v["creator_id"] == creator_id]
+def get_creator_content(
+    creator_id: str,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    sort: str = Query("created_at", pattern="^-?(created_at|ml_score)$"),
+    tier: Optional[str] = None,
+    tags: Optional[str] = None,
+    created_after: Optional[str] = None,
+    created_before: Optional[str] = None,
+    min_score: Optional[float] = None,
+    max_score: Optional[float] = None,
+):
+    # Keyset pagination over the creator's (created_at | ml_score) ordered index;
+    # the next page's cursor is returned in the X-Next-Cursor header.
+    sort_field = sort.lstrip("-")
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # The range on the sort field seeks the index; the other range is a filter
+    if sort_field == "created_at":
+        low, high = created_after, created_before
+    else:
+        low, high = min_score, max_score
+    wanted_tags = _tag_set(tags)
+
+    def matches(v):
+        if tier is not None and v.get("minTier") != tier:
+            return False
+        if wanted_tags and not wanted_tags <= _tag_set(v.get("tags")):
+            return False
+        if sort_field == "ml_score":
+            created_at = v.get("created_at") or ""
+            if (created_after and created_at < created_after) or (created_before and created_at > created_before):
+                return False
+        elif min_score is not None or max_score is not None:
+            score = v.get("ml_score")
+            if score is None or (min_score is not None and score < min_score) or (max_score is not None and score > max_score):
+                return False
+        return True
+
+    rows = videos_db.scan("creator_id", creator_id, sort_field, after=after, descending=sort.startswith("-"), low=low, high=high)
+    page, next_cursor = paginate(rows, limit, sort_field, matches)
+    # Returned directly so the page skips jsonable_encoder
+    return FastJSONResponse(page, headers={"X-Next-Cursor": next_cursor} if next_cursor else None)
+
+async def shutdown():
+    """Run by the gateway's lifespan when the app stops."""
+    # Let queued uploads reach "ready" before the search index and state snapshot are saved
+    await run_in_threadpool(processing_queue.join)
+    # Nothing to save if the index was never built this run
+    if loaded(search_index):
+        search_index.save()
+    if entitlements is not None:
+        await entitlements.close()
+
+@router.post("/entitlements/invalidate")
+async def invalidate_entitlements(payload: dict):
+    # Called by a membership service running elsewhere when users' subscriptions or
+    # purchases change: {"user_id", "creator_id"}, or {"changes": [...]} of those.
+    # Async so it runs on the loop alongside the checks that fill the cache
+    changes = payload.get("changes", [payload])
+    if not isinstance(changes, list) or not all(isinstance(c, dict) and isinstance(c.get("user_id"), str) for c in changes):
+        raise HTTPException(status_code=400, detail="changes must be a list of {user_id, creator_id} objects")
+    return {"invalidated": entitlements.invalidate((c["user_id"], c.get("creator_id")) for c in changes)}
+
+@router.get("/search")
+async def search_content(
+    q: str = "",
+    tags: Optional[str] = None,
+    creator_id: Optional[str] = None,
+    tier: Optional[str] = None,
+    user_id: Optional[str] = None,
+    boost: float = Query(0.0, ge=0, le=10),
+    limit: int = Query(20, ge=1, le=100),
+):
+    # BM25 over title/description/tags, optionally boosted by ml_score. Ranked
+    # hits stream out best first and are filtered until the page is full; with
+    # user_id, only content that user's tiers unlock is returned.
+    if not q.strip() and not tags:
+        raise HTTPException(status_code=400, detail="q or tags required")
+    results = []
+    hits = search_index.search(q, tags.split(",") if tags else (), boost)
+
+    def next_batch():
+        batch = []
+        for video_id, score in hits:
+            v = videos_db.get(video_id)
+            if v is None or (creator_id is not None and v.get("creator_id") != creator_id) \
+                    or (tier is not None and v.get("minTier") != tier):
+                continue
+            batch.append((v, score))
+            if len(batch) == limit:
+                break
+        return batch
+
+    while len(results) < limit:
+        # Ranking runs off the event loop; entitlement checks may await the membership service
+        batch = await run_in_threadpool(next_batch)
+        if not batch:
+            break
+        allowed = await entitlements.visible(user_id, [v for v, _ in batch]) if user_id else [True] * len(batch)
+        results.extend({**v, "score": round(score, 4)} for (v, score), ok in zip(batch, allowed) if ok)
+    return FastJSONResponse(results[:limit])
+
+@router.post("/visible")
+async def get_visible_content(payload: dict):
+    # Authorize a whole gallery page at once: one bitmask test per item
+    user_id = payload.get("user_id")
+    content_ids = payload.get("content_ids") or []
+    found = [v for v in (videos_db.get(cid) for cid in content_ids) if v is not None]
+    allowed = dict(zip((v["id"] for v in found), await entitlements.visible(user_id, found)))
+    return FastJSONResponse({
+        "visible": [cid for cid in content_ids if allowed.get(cid)],
+        "denied": [cid for cid in content_ids if allowed.get(cid) is False],
+        "missing": [cid for cid in content_ids if cid not in allowed],
+    })
+
+@router.post("/engagement", status_code=202)
+async def ingest_engagement(request: Request):
+    """
+    Engagement deltas, as a JSON array:
+    [{"video_id": ..., "likes": 3, "comments": 1, "shares": 0, "watch_time": 42.5}, ...]
+    likes/comments/shares are increments; watch_time is the current average
+    seconds watched. Deltas are applied asynchronously in micro-batches.
+    """
+    try:
+        deltas = orjson.loads(await request.body())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Body must be a JSON array")
+    if not isinstance(deltas, list):
+        raise HTTPException(status_code=400, detail="Body must be a JSON array")
+    accepted, rejected = [], []
+    for i, delta in enumerate(deltas):
+        error = _engagement_error(delta)
+        if error:
+            rejected.append({"index": i, "detail": error})
+        else:
+            accepted.append(delta)
+    if accepted and not engagement_pipeline.submit(accepted):
+        raise HTTPException(status_code=503, detail="Engagement backlog full, retry later")
+    return {"accepted": len(accepted), "rejected": rejected}
+
+def _engagement_error(delta):
+    if not isinstance(delta, dict):
+        return "delta must be a JSON object"
+    if not isinstance(delta.get("video_id"), str):
+        return "video_id required"
+    for name in ("likes", "comments", "shares", "watch_time"):
+        value = delta.get(name)
+        if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float))):
+            return f"{name} must be a number"
+    if (delta.get("watch_time") or 0) < 0:
+        return "watch_time must not be negative"
+    return None
+
+@router.get("/engagement/stats")
+def get_engagement_stats():
+    return engagement_pipeline.snapshot()
 
 @router.get("/{content_id}")
-def get_content(content_id: str, user_id: str):
-    # For demo, just return the video if found
-    for v in videos_db:
-        if v["id"] == content_id:
-            return v
-    raise HTTPException(status_code=404, detail="Content not found")
+async def get_content(content_id: str, user_id: str):
+    v = videos_db.get(content_id)
+    if v is None:
+        raise HTTPException(status_code=404, detail="Content not found")
+    if not (await entitlements.visible(user_id, [v]))[0]:
+        raise HTTPException(status_code=403, detail="Not subscribed to a required membership tier")
+    return FastJSONResponse(v)
 
 @router.get("/ml-score/{content_id}")
-def get_content_ml_score(content_id: str):
-    for v in videos_db:
-        if v["id"] == content_id:
-            return {
-                "content_id": content_id,
-                "ml_score": v.get("ml_score", 0),
-                "revenue_split": v.get("revenue_split", 0.5),
-                "quality_factors": {
-                    "originality": v.get("is_original", False),
-                    "unique_perspective": v.get("unique_perspective", False),
-                    "trending_topic": v.get("trending_topic", False),
-                    "searchable_content": v.get("searchable_content", False),
-                    "no_ads": v.get("no_ads", False),
-                    "policy_compliant": v.get("policy_compliant", False),
-                }
-            }
-    raise HTTPException(status_code=404, detail="Content not found")
\ No newline at end of file
+def get_content_ml_score(content_id: str, if_none_match: Optional[str] = Header(None)):
+    v = videos_db.get(content_id)
+    if v is None:
+        raise HTTPException(status_code=404, detail="Content not found")
+    return response_cache.respond(content_id, "ml-score", lambda: _ml_score(content_id), if_none_match)
+
+def _ml_score(content_id: str):
+    # Re-read inside the cache's compute so a concurrent rescore can't be cached under the new version
+    v = videos_db.get(content_id)
+    return {
+        "content_id": content_id,
+        "ml_score": v.get("ml_score", 0),
+        "revenue_split": v.get("revenue_split", 0.5),
+        "quality_factors": {
+            "originality": v.get("is_original", False),
+            "unique_perspective": v.get("unique_perspective", False),
+            "trending_topic": v.get("trending_topic", False),
+            "searchable_content": v.get("searchable_content", False),
+            "no_ads": v.get("no_ads", False),
+            "policy_compliant": v.get("policy_compliant", False),
+        }
+    }
\ No newline at end of file
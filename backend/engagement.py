@@ -0,0 +1,138 @@
+import logging
+import threading
+from bisect import bisect_right
+from collections import deque
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from batch_scoring import ENGAGEMENT_STEPS
+from store import Row
+
+logger = logging.getLogger(__name__)
+
+COUNTERS = ("likes", "comments", "shares")  # deltas add up
+GAUGES = ("watch_time",)  # latest reported value (average seconds watched) wins
+FLUSH_INTERVAL = 0.2  # seconds a delta may wait to be coalesced
+MAX_BATCH = 100_000
+MAX_PENDING = 1_000_000
+
+# Score thresholds per field, as plain lists for bisect
+_THRESHOLDS = {name: steps[0].tolist() for name, steps in ENGAGEMENT_STEPS.items()}
+
+
+def crossed(before: Row, after: Row) -> bool:
+    """True if any engagement field moved to another step of calculate_ml_score's ladders."""
+    return any(bisect_right(steps, before.get(name, 0) or 0) != bisect_right(steps, after.get(name, 0) or 0)
+               for name, steps in _THRESHOLDS.items())
+
+
+class EngagementPipeline:
+    """
+    Ingests engagement deltas and keeps videos' counters and scores current.
+    Deltas are queued and a worker drains them in micro-batches, coalescing
+    everything for one video into a single row update, so a burst on a hot
+    video costs one write per batch. Scoring only depends on which step of
+    each threshold ladder a counter sits on, so a video is rescored only when
+    an update moves a counter across a boundary.
+    """
+
+    def __init__(self, videos, score: Callable[[Row], float], split: Callable[[float], float],
+                 on_rescore: Optional[Callable[[List[Row]], Any]] = None, interval: float = FLUSH_INTERVAL,
+                 max_batch: int = MAX_BATCH, max_pending: int = MAX_PENDING):
+        self.videos = videos
+        self.score = score
+        self.split = split
+        self.on_rescore = on_rescore
+        self.interval = interval
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self.stats = {"received": 0, "batches": 0, "rows_updated": 0, "rescored": 0, "unknown_videos": 0}
+        self._pending: deque = deque()
+        self._ready = threading.Condition()
+        self._busy = False
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, deltas: Iterable[Dict[str, Any]]) -> bool:
+        """Queue deltas; False (nothing queued) when the backlog is full."""
+        deltas = list(deltas)
+        with self._ready:
+            if len(self._pending) + len(deltas) > self.max_pending:
+                return False
+            self._pending.extend(deltas)
+            self.stats["received"] += len(deltas)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True, name="engagement-worker")
+                self._thread.start()
+            if len(self._pending) >= self.max_batch:
+                self._ready.notify()
+        return True
+
+    def flush(self) -> None:
+        """Block until everything submitted so far has been applied."""
+        with self._ready:
+            self._ready.notify()
+            while self._pending or self._busy:
+                self._ready.wait(0.01)
+
+    def _run(self) -> None:
+        while True:
+            with self._ready:
+                if len(self._pending) < self.max_batch:
+                    self._ready.wait(self.interval)
+                n = min(len(self._pending), self.max_batch)
+                batch = [self._pending.popleft() for _ in range(n)]
+                self._busy = bool(batch)
+            if not batch:
+                continue
+            try:
+                self.apply(batch)
+            except Exception:
+                logger.exception("Engagement batch failed")
+            finally:
+                with self._ready:
+                    self._busy = False
+
+    def apply(self, batch: List[Dict[str, Any]]) -> Tuple[int, int]:
+        """Coalesce and apply one batch; returns (rows updated, rows rescored)."""
+        coalesced: Dict[str, Dict[str, Any]] = {}
+        for delta in batch:
+            merged = coalesced.setdefault(delta["video_id"], {})
+            for name in COUNTERS:
+                if delta.get(name):
+                    merged[name] = merged.get(name, 0) + delta[name]
+            for name in GAUGES:
+                if delta.get(name) is not None:
+                    merged[name] = delta[name]
+        rescored, updated, unknown = [], 0, 0
+        for video_id, merged in coalesced.items():
+            flag = []
+
+            def changes(row: Row, merged=merged, flag=flag) -> Row:
+                new = {name: max(0, (row.get(name, 0) or 0) + merged[name]) for name in COUNTERS if name in merged}
+                new.update((name, merged[name]) for name in GAUGES if name in merged)
+                after = {**row, **new}
+                if crossed(row, after):
+                    score = self.score(after)
+                    new["ml_score"] = score
+                    new["revenue_split"] = self.split(score)
+                    flag.append(True)
+                return new
+
+            row = self.videos.modify(video_id, changes)
+            if row is None:
+                unknown += 1
+                continue
+            updated += 1
+            if flag:
+                rescored.append(row)
+        with self._ready:
+            self.stats["batches"] += 1
+            self.stats["rows_updated"] += updated
+            self.stats["rescored"] += len(rescored)
+            self.stats["unknown_videos"] += unknown
+        if rescored and self.on_rescore is not None:
+            self.on_rescore(rescored)
+        return updated, len(rescored)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._ready:
+            return {**self.stats, "pending": len(self._pending)}
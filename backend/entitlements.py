@@ -0,0 +1,195 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+
+import httpx
+
+from store import Row
+
+Gate = Tuple[str, str]  # (creator_id, minTier)
+Change = Tuple[str, Optional[str]]  # (user_id, creator_id or None for every creator)
+
+logger = logging.getLogger(__name__)
+
+
+class LocalEntitlements:
+    """Entitlement checks against the in-process access index, for when membership runs in the same app."""
+
+    def __init__(self, index):
+        self.index = index
+
+    async def visible(self, user_id: Optional[str], videos: List[Row]) -> List[bool]:
+        return self.index.visible(user_id, videos)
+
+    def invalidate(self, changes: Iterable[Change]) -> int:
+        # Nothing is cached: the index is updated by the write itself
+        return 0
+
+    async def close(self) -> None:
+        pass
+
+
+class EntitlementCache:
+    """TTL + LRU cache of (user_id, creator_id, minTier) -> whether the user passes that gate."""
+
+    def __init__(self, max_entries: int = 100_000, ttl: float = 30.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple[str, str, str], Tuple[float, bool]]" = OrderedDict()
+
+    def get(self, user_id: str, gate: Gate) -> Optional[bool]:
+        key = (user_id,) + gate
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires, allowed = entry
+        if expires < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return allowed
+
+    def put(self, user_id: str, gate: Gate, allowed: bool) -> None:
+        key = (user_id,) + gate
+        self._entries[key] = (time.monotonic() + self.ttl, allowed)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: str, creator_id: Optional[str] = None) -> int:
+        keys = [k for k in self._entries if k[0] == user_id and (creator_id is None or k[1] == creator_id)]
+        for k in keys:
+            del self._entries[k]
+        return len(keys)
+
+
+class RemoteEntitlements:
+    """
+    Entitlement checks against a membership service running elsewhere.
+    One pooled HTTP client is shared by all requests and created on first use;
+    a page's uncached gates are checked in a single call, answers are cached
+    for `ttl` seconds, and concurrent identical checks share that one call.
+    The membership service calls invalidate() (through the content router)
+    when users' subscriptions or purchases change, so answers don't outlive
+    the change by a TTL.
+    """
+
+    def __init__(self, base_url: str, cache: Optional[EntitlementCache] = None, timeout: float = 2.0,
+                 max_connections: int = 100):
+        self.base_url = base_url
+        self.cache = cache or EntitlementCache()
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self._client: Optional[httpx.AsyncClient] = None
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._generation = 0  # bumped by invalidate(), so answers fetched before it aren't cached
+
+    def invalidate(self, changes: Iterable[Change]) -> int:
+        self._generation += 1
+        return sum(self.cache.invalidate(user_id, creator_id) for user_id, creator_id in changes)
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections),
+            )
+        return self._client
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def visible(self, user_id: Optional[str], videos: List[Row]) -> List[bool]:
+        result: List[Optional[bool]] = [None] * len(videos)
+        missing: Dict[Gate, List[int]] = {}
+        for i, video in enumerate(videos):
+            min_tier = video.get("minTier")
+            if not min_tier or (user_id and user_id == video.get("creator_id")):
+                result[i] = True
+            elif not user_id:
+                result[i] = False
+            else:
+                gate = (video.get("creator_id"), min_tier)
+                cached = self.cache.get(user_id, gate)
+                if cached is None:
+                    missing.setdefault(gate, []).append(i)
+                else:
+                    result[i] = cached
+        if missing:
+            generation = self._generation
+            for gate, allowed in zip(missing, await self._check(user_id, tuple(missing))):
+                if generation == self._generation:
+                    self.cache.put(user_id, gate, allowed)
+                for i in missing[gate]:
+                    result[i] = allowed
+        return result
+
+    async def _check(self, user_id: str, gates: Tuple[Gate, ...]) -> List[bool]:
+        key = (user_id, gates)
+        pending = self._inflight.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            response = await self.client.post("/membership/entitlements/check", json={
+                "user_id": user_id,
+                "items": [{"creator_id": creator_id, "minTier": min_tier} for creator_id, min_tier in gates],
+            })
+            response.raise_for_status()
+            allowed = [bool(a) for a in response.json()["allowed"]]
+            future.set_result(allowed)
+            return allowed
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so an unawaited failure doesn't log a warning
+            future.exception()
+            raise
+        except BaseException:
+            future.cancel()
+            raise
+        finally:
+            del self._inflight[key]
+
+
+
+class EntitlementInvalidator:
+    """
+    Membership's side of the cache above: tells content services running
+    elsewhere which users' entitlements just changed, in one call per
+    service. Calls are made from the write's request with a short timeout;
+    a service that can't be reached is logged and falls back on its TTL.
+    """
+
+    def __init__(self, content_urls: Iterable[str], timeout: float = 2.0):
+        self.content_urls = [url.rstrip("/") for url in content_urls]
+        self.timeout = timeout
+        self._client: Optional[httpx.Client] = None
+
+    @property
+    def client(self) -> httpx.Client:
+        if self._client is None:
+            self._client = httpx.Client(timeout=self.timeout)
+        return self._client
+
+    def changed(self, changes: Iterable[Change]) -> None:
+        body = {"changes": [{"user_id": user_id, "creator_id": creator_id}
+                            for user_id, creator_id in dict.fromkeys(changes)]}
+        if not body["changes"]:
+            return
+        for url in self.content_urls:
+            try:
+                self.client.post(f"{url}/content/entitlements/invalidate", json=body).raise_for_status()
+            except httpx.HTTPError:
+                logger.exception("Invalidating entitlements at %s failed", url)
+
+    def close(self) -> None:
+        if self._client is not None:
+            self._client.close()
+            self._client = None
@@ -0,0 +1,145 @@
+import glob
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+SEGMENT_BYTES = 64 * 1024 * 1024  # roll to a new segment file past this size
+SYNC_INTERVAL = 0.05  # seconds between group fsyncs
+SNAPSHOTS_KEPT = 2
+
+
+class EventLog:
+    """
+    Append-only event log stored as NDJSON segment files.
+    Appends only write to the open segment; a background thread flushes and
+    fsyncs every SYNC_INTERVAL, so many appends share one fsync (group commit)
+    and at most that window of events is lost on a crash.
+    Snapshots record materialized state up to a sequence number, so a restart
+    loads the newest snapshot and replays only the tail after it.
+    """
+
+    def __init__(self, directory: str, segment_bytes: int = SEGMENT_BYTES, sync_interval: float = SYNC_INTERVAL):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.sync_interval = sync_interval
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._closed = threading.Event()
+        self.seq = self._recover()
+        self._file = open(self._segment_path(self._segment_start), "ab")
+        self._syncer = threading.Thread(target=self._sync_loop, daemon=True, name="event-log-sync")
+        self._syncer.start()
+
+    def _segment_path(self, first_seq: int) -> str:
+        return os.path.join(self.directory, f"{first_seq:016d}.log")
+
+    def _segments(self) -> List[Tuple[int, str]]:
+        paths = glob.glob(os.path.join(self.directory, "*.log"))
+        return sorted((int(os.path.basename(p)[:-4]), p) for p in paths)
+
+    def _recover(self) -> int:
+        """Find the last sequence number, trimming a torn final line left by a crash."""
+        segments = self._segments()
+        if not segments:
+            self._segment_start = 1
+            return 0
+        self._segment_start, path = segments[-1]
+        last = self._segment_start - 1
+        good = 0
+        with open(path, "rb") as f:
+            for line in f:
+                try:
+                    last = json.loads(line)["seq"]
+                except ValueError:
+                    break
+                good += len(line)
+        if good != os.path.getsize(path):
+            with open(path, "r+b") as f:
+                f.truncate(good)
+        return last
+
+    def append(self, event: Dict[str, Any]) -> int:
+        """Append one event and return its sequence number; durable after the next sync."""
+        with self._lock:
+            self.seq += 1
+            record = {"seq": self.seq, "ts": time.time(), **event}
+            self._file.write(json.dumps(record, separators=(",", ":")).encode() + b"\n")
+            self._dirty = True
+            if self._file.tell() >= self.segment_bytes:
+                self._roll()
+            return self.seq
+
+    def _roll(self) -> None:
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        self._segment_start = self.seq + 1
+        self._file = open(self._segment_path(self._segment_start), "ab")
+        self._dirty = False
+
+    def sync(self) -> None:
+        with self._lock:
+            if not self._dirty or self._file.closed:
+                return
+            self._file.flush()
+            self._dirty = False
+            fd = os.dup(self._file.fileno())
+        # fsync outside the lock so appends keep landing in the page cache meanwhile
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def _sync_loop(self) -> None:
+        while not self._closed.wait(self.sync_interval):
+            self.sync()
+
+    def close(self) -> None:
+        self._closed.set()
+        self.sync()
+        with self._lock:
+            self._file.close()
+
+    def replay(self, after: int = 0) -> Iterator[Dict[str, Any]]:
+        """Yield events with seq > after, oldest first."""
+        self.sync()
+        segments = self._segments()
+        for i, (first, path) in enumerate(segments):
+            # Skip segments that end before the requested position
+            if i + 1 < len(segments) and segments[i + 1][0] <= after + 1:
+                continue
+            with open(path, "rb") as f:
+                for line in f:
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        return
+                    if event["seq"] > after:
+                        yield event
+
+    def write_snapshot(self, seq: int, state: Dict[str, Any]) -> str:
+        """Atomically write state as of seq and drop older snapshots."""
+        path = os.path.join(self.directory, f"snapshot-{seq:016d}.json")
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"seq": seq, "state": state}, f, separators=(",", ":"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+        for old in self._snapshots()[:-SNAPSHOTS_KEPT]:
+            os.remove(old)
+        return path
+
+    def _snapshots(self) -> List[str]:
+        return sorted(glob.glob(os.path.join(self.directory, "snapshot-*.json")))
+
+    def latest_snapshot(self) -> Tuple[int, Optional[Dict[str, Any]]]:
+        snapshots = self._snapshots()
+        if not snapshots:
+            return 0, None
+        with open(snapshots[-1]) as f:
+            data = json.load(f)
+        return data["seq"], data["state"]
@@ -0,0 +1,97 @@
+import inspect
+import os
+from contextlib import asynccontextmanager
+from typing import Callable, Iterable, List, Optional
+
+from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+
+import metrics
+from responses import FastJSONResponse
+
+SERVICES = ("membership", "content")
+
+
+def create_app(services: Optional[Iterable[str]] = None, membership_url: Optional[str] = None,
+               content_urls: Optional[Iterable[str]] = None) -> FastAPI:
+    """
+    Build the API with the given services mounted, by default every service (or
+    the comma-separated TIERFLOW_SERVICES). Only the mounted services' modules
+    and stores are imported. Content co-located with membership checks entitlements
+    in-process; on its own it asks the membership service at membership_url
+    (MEMBERSHIP_SERVICE_URL) through a pooled client opened on first use, and
+    caches the answers. Membership on its own tells the content services at
+    content_urls (comma-separated CONTENT_SERVICE_URLS) to drop those answers
+    when a user's subscriptions or purchases change, and refuses revenue
+    simulations, which score the content catalog.
+    """
+    if services is None:
+        services = os.environ.get("TIERFLOW_SERVICES", ",".join(SERVICES)).split(",")
+    services = {s.strip() for s in services if s.strip()}
+    unknown = services - set(SERVICES)
+    if unknown or not services:
+        raise ValueError(f"services must be some of {', '.join(SERVICES)}, got {', '.join(sorted(unknown)) or 'none'}")
+
+    # Shutdown steps, run in order once the server stops taking requests
+    closing: List[Callable] = []
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        yield
+        for close in closing:
+            if inspect.isawaitable(result := close()):
+                await result
+
+    app = FastAPI(default_response_class=FastJSONResponse, lifespan=lifespan)
+
+    # CORS for frontend
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],  # For dev; restrict in prod!
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=["X-Next-Cursor"],
+    )
+
+    # Per-route latency/size/storage-call metrics on /metrics; slow-request
+    # profiling when TIERFLOW_PROFILE_SLOW_MS is set
+    app.add_middleware(metrics.MetricsMiddleware, profiler=metrics.profiler)
+
+    if "membership" in services:
+        import membership_service
+        if "content" in services:
+            from content_models import videos_db
+            membership_service.configure_invalidation(None)
+            membership_service.configure_catalog(videos_db)
+        else:
+            membership_service.configure_catalog(None)
+            if content_urls is None:
+                content_urls = os.environ.get("CONTENT_SERVICE_URLS", "").split(",")
+            membership_service.configure_invalidation([url.strip() for url in content_urls if url.strip()])
+        app.include_router(membership_service.router, prefix="/membership", tags=["Membership"])
+        closing.append(membership_service.shutdown)
+    if "content" in services:
+        import content_service
+        if "membership" in services:
+            content_service.configure_entitlements(None)
+        else:
+            url = membership_url or os.environ.get("MEMBERSHIP_SERVICE_URL")
+            if not url:
+                raise ValueError("content without membership needs membership_url or MEMBERSHIP_SERVICE_URL")
+            content_service.configure_entitlements(url, float(os.environ.get("ENTITLEMENT_TTL_SECONDS", "30")))
+        app.include_router(content_service.router, prefix="/content", tags=["Content"])
+        closing.append(content_service.shutdown)
+    app.include_router(metrics.router, tags=["Metrics"])
+
+    # Write the in-process state snapshot (TIERFLOW_SNAPSHOT_DIR) on shutdown, and
+    # flush and fsync the event log's last batch (TIERFLOW_EVENT_LOG) before exiting.
+    # These run after the services' own shutdown, so no write follows them
+    from models import state_snapshot
+    if state_snapshot is not None:
+        closing.append(state_snapshot.close)
+    if "membership" in services:
+        from membership_models import event_log
+        if event_log is not None:
+            closing.append(event_log.close)
+    return app
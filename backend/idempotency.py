@@ -0,0 +1,80 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from store import Table
+
+# claim() result for a key another request holds but hasn't recorded a result for yet
+IN_PROGRESS = object()
+
+
+class IdempotencyStore:
+    """
+    Remembers the result recorded for each idempotency key, so a retried
+    request returns the original result instead of applying twice.
+    A request claims its key before applying, then records its result (or
+    releases the key if it failed). In process, keys are bounded by entry
+    count and age, the oldest dropped first. Given a table shared by every
+    worker (a database), the claim is one atomic insert there, so a retry
+    landing on another worker finds it; rows expire by age and are replaced
+    when their key is claimed again.
+    """
+
+    def __init__(self, max_entries: int = 1_000_000, ttl: float = 24 * 3600, table: Optional[Table] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.table = table
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def claim(self, key: str) -> Optional[Any]:
+        """None if the caller now holds the key; else the recorded result, or IN_PROGRESS."""
+        if self.table is not None:
+            return self._claim_row(key)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] >= time.monotonic():
+                return IN_PROGRESS if entry[1] is None else entry[1]
+            self._set(key, None)
+            return None
+
+    def _claim_row(self, key: str) -> Optional[Any]:
+        # Wall-clock expiry: every worker reads the same rows
+        while not self.table.insert_new({"id": key, "result": None, "expires": time.time() + self.ttl}):
+            taken = []
+
+            def take_expired(row):
+                if row["expires"] >= time.time():
+                    return {}
+                taken.append(True)
+                return {"result": None, "expires": time.time() + self.ttl}
+
+            row = self.table.modify(key, take_expired)
+            if taken:
+                return None
+            if row is not None:
+                return IN_PROGRESS if row["result"] is None else row["result"]
+            # Released meanwhile; claim it again
+        return None
+
+    def put(self, key: str, result: Any) -> None:
+        if self.table is not None:
+            self.table.update(key, {"result": result, "expires": time.time() + self.ttl})
+            return
+        with self._lock:
+            self._set(key, result)
+
+    def release(self, key: str) -> None:
+        """Give up a claimed key without a result, so a retry applies."""
+        if self.table is not None:
+            self.table.delete(key)
+            return
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def _set(self, key: str, result: Any) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
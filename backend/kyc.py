@@ -0,0 +1,232 @@
+import asyncio
+import hashlib
+import hmac
+import logging
+import os
+import random
+import secrets
+import uuid
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+# Statuses the KYC page understands; submission and retries all show as pending
+NOT_STARTED, PENDING, VERIFIED, REJECTED = "not_started", "pending", "verified", "rejected"
+TERMINAL = (VERIFIED, REJECTED)
+
+CONCURRENCY = 8  # provider calls in flight at once
+MAX_ATTEMPTS = 5
+BACKOFF_SECONDS = 0.5
+MAX_BACKOFF_SECONDS = 30.0
+PENDING_TIMEOUT_SECONDS = 15 * 60  # a check with no verdict by then can be submitted again
+
+# Shared with the provider to sign webhook callbacks. Unset, the in-process stand-in
+# gets a random key per process, so there is no known default to forge verdicts with.
+KYC_SECRET = os.environ.get("TIERFLOW_KYC_SECRET") or secrets.token_hex(32)
+
+logger = logging.getLogger(__name__)
+
+
+class ProviderError(Exception):
+    """Transient provider failure; the submission is retried."""
+
+
+def sign(secret: str, payload: Dict[str, Any]) -> str:
+    message = f"{payload.get('reference')}:{payload.get('creator_id')}:{payload.get('status')}".encode()
+    return hmac.new(secret.encode(), message, hashlib.sha256).hexdigest()
+
+
+class LocalKycProvider:
+    """
+    Stand-in for a third-party KYC provider. submit() accepts a check after a
+    short delay (failing transiently some of the time); the verdict arrives
+    later through the signed webhook callback, like a real provider's.
+    """
+
+    def __init__(self, secret: str, latency: Tuple[float, float] = (0.05, 0.2), failure_rate: float = 0.2,
+                 review_seconds: Tuple[float, float] = (0.5, 2.0), approval_rate: float = 0.9,
+                 rng: Optional[random.Random] = None):
+        self.secret = secret
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.review_seconds = review_seconds
+        self.approval_rate = approval_rate
+        self.rng = rng or random.Random()
+        self._reviews = set()
+
+    async def submit(self, creator_id: str, callback: Callable[[Dict[str, Any]], Awaitable[Any]]) -> str:
+        await asyncio.sleep(self.rng.uniform(*self.latency))
+        if self.rng.random() < self.failure_rate:
+            raise ProviderError("provider temporarily unavailable")
+        reference = uuid.uuid4().hex
+        review = asyncio.create_task(self._review(reference, creator_id, callback))
+        # Keep a reference so the review task isn't garbage collected mid-flight
+        self._reviews.add(review)
+        review.add_done_callback(self._reviews.discard)
+        return reference
+
+    async def _review(self, reference: str, creator_id: str, callback) -> None:
+        await asyncio.sleep(self.rng.uniform(*self.review_seconds))
+        approved = self.rng.random() < self.approval_rate
+        payload = {"reference": reference, "creator_id": creator_id, "status": VERIFIED if approved else REJECTED}
+        if not approved:
+            payload["rejection_reason"] = "Document could not be verified"
+        payload["signature"] = sign(self.secret, payload)
+        await callback(payload)
+
+
+class KycEngine:
+    """
+    Runs KYC checks in the background on the event loop.
+    A fixed number of workers bounds concurrent provider calls; transient
+    failures are retried with capped exponential backoff and jitter. Results
+    arrive as signed webhook callbacks and only count for the reference the
+    provider returned. Final statuses are cached so gates like payouts check KYC
+    with a dict lookup; in-flight ones read through to `load`. `save` runs in a
+    worker thread.
+    """
+
+    def __init__(self, provider, load: Callable[[str], Optional[Dict[str, Any]]],
+                 save: Callable[[str, str, Dict[str, Any]], Any], secret: str, concurrency: int = CONCURRENCY,
+                 max_attempts: int = MAX_ATTEMPTS, backoff: float = BACKOFF_SECONDS,
+                 max_backoff: float = MAX_BACKOFF_SECONDS, pending_timeout: float = PENDING_TIMEOUT_SECONDS):
+        self.provider = provider
+        self.load = load
+        self.save = save
+        self.secret = secret
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.pending_timeout = pending_timeout
+        self._final: Dict[str, str] = {}
+        self._inflight = set()  # creators queued or being submitted by this process
+        self._lock = asyncio.Lock()
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers = []
+
+    def status(self, creator_id: str) -> str:
+        cached = self._final.get(creator_id)
+        if cached is not None:
+            return cached
+        record = self.load(creator_id)
+        status = record["status"] if record else NOT_STARTED
+        if status in TERMINAL:
+            self._final[creator_id] = status
+        return status
+
+    async def _set(self, creator_id: str, status: str, **details: Any) -> None:
+        # The ledger write takes its lock and may fsync, so keep it off the event loop
+        await asyncio.to_thread(self.save, creator_id, status, details)
+        if status in TERMINAL:
+            self._final[creator_id] = status
+        else:
+            self._final.pop(creator_id, None)
+
+    def _stalled(self, creator_id: str) -> bool:
+        """
+        A pending check that can't finish here: lost before the provider accepted
+        it (e.g. a restart mid-submit), or with no verdict within pending_timeout.
+        """
+        if creator_id in self._inflight:
+            return False
+        record = self.load(creator_id) or {}
+        if not record.get("reference"):
+            return True
+        try:
+            submitted = datetime.fromisoformat(str(record.get("submitted_at")).rstrip("Z"))
+        except ValueError:
+            return True
+        return (datetime.utcnow() - submitted).total_seconds() > self.pending_timeout
+
+    async def submit(self, creator_id: str) -> str:
+        """
+        Queue a check unless one is running or already passed; returns the
+        resulting status. A stalled pending check is started over.
+        """
+        if creator_id in self._inflight:
+            return PENDING
+        current = self.status(creator_id)
+        if current == VERIFIED or (current == PENDING and not self._stalled(creator_id)):
+            return current
+        self._inflight.add(creator_id)
+        try:
+            await self._set(creator_id, PENDING, submitted_at=_now(), reference=None, rejection_reason=None,
+                            last_error=None)
+            self._ensure_workers()
+            await self._queue.put(creator_id)
+        except BaseException:
+            self._inflight.discard(creator_id)
+            raise
+        return PENDING
+
+    def _ensure_workers(self) -> None:
+        # Started lazily so they attach to the loop that serves requests
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        self._workers = [w for w in self._workers if not w.done()]
+        while len(self._workers) < self.concurrency:
+            self._workers.append(asyncio.create_task(self._work()))
+
+    async def _work(self) -> None:
+        while True:
+            creator_id = await self._queue.get()
+            try:
+                await self._check(creator_id)
+            except Exception:
+                logger.exception("KYC check failed for %s", creator_id)
+            finally:
+                self._inflight.discard(creator_id)
+                self._queue.task_done()
+
+    async def _check(self, creator_id: str) -> None:
+        for attempt in range(self.max_attempts):
+            try:
+                reference = await self.provider.submit(creator_id, self.handle_callback)
+            except ProviderError as e:
+                if attempt + 1 == self.max_attempts:
+                    # Give up and let the creator start over
+                    await self._set(creator_id, NOT_STARTED, last_error=str(e))
+                    return
+                delay = min(self.max_backoff, self.backoff * 2 ** attempt)
+                await asyncio.sleep(delay * random.uniform(0.5, 1.0))
+                continue
+            # Callbacks are only accepted for this reference once it is recorded
+            async with self._lock:
+                if (self.load(creator_id) or {}).get("status") == PENDING:
+                    await self._set(creator_id, PENDING, reference=reference, attempts=attempt + 1)
+            return
+
+    async def handle_callback(self, payload: Dict[str, Any]) -> str:
+        """
+        Apply a provider verdict; raises PermissionError on a bad signature and
+        ValueError for a reference that doesn't match the creator's submitted check.
+        """
+        if not hmac.compare_digest(str(payload.get("signature", "")), sign(self.secret, payload)):
+            raise PermissionError("invalid KYC callback signature")
+        status = payload["status"]
+        if status not in TERMINAL:
+            raise ValueError(f"unexpected KYC status: {status}")
+        creator_id = payload["creator_id"]
+        async with self._lock:
+            record = self.load(creator_id) or {}
+            if record.get("status") in TERMINAL and record.get("reference") == payload["reference"]:
+                return record["status"]  # duplicate delivery
+            if record.get("status") != PENDING or not record.get("reference") \
+                    or record["reference"] != payload["reference"]:
+                raise ValueError(f"reference {payload['reference']} does not match a submitted check")
+            details = {"reference": payload["reference"]}
+            if status == VERIFIED:
+                details["verified_at"] = _now()
+            else:
+                details["rejection_reason"] = payload.get("rejection_reason")
+            await self._set(creator_id, status, **details)
+        return status
+
+    async def join(self) -> None:
+        if self._queue is not None:
+            await self._queue.join()
+
+
+def _now() -> str:
+    return datetime.utcnow().isoformat() + "Z"
+
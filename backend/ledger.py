@@ -0,0 +1,127 @@
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from eventlog import EventLog
+from store import Row
+
+
+class MembershipLedger:
+    """
+    Single write path for membership state.
+    Every change is an event: it is applied to the tables and appended to the
+    event log (when one is configured) under one lock, so the log order is the
+    order the tables saw. Replaying the log over a snapshot rebuilds the
+    same tables, and the log doubles as an audit trail.
+    """
+
+    def __init__(self, tables: Dict[str, Any], log: Optional[EventLog] = None, snapshot_every: int = 100_000):
+        self.tables = tables
+        self.log = log
+        self.snapshot_every = snapshot_every
+        self._since_snapshot = 0
+        self._before_write: List[Callable[[Dict[str, Any]], Any]] = []
+        self.lock = threading.RLock()
+
+    def before_write(self, hook: Callable[[Dict[str, Any]], Any]) -> None:
+        """Run hook(event) under the lock ahead of applying every event."""
+        self._before_write.append(hook)
+
+    def record(self, event: Dict[str, Any]) -> Tuple[Optional[Row], Optional[Row]]:
+        """
+        Apply one event and log it. Returns the changed row (the tier for
+        subscription events) as (before, after); (None, None) when the target
+        doesn't exist, in which case nothing is logged.
+        """
+        with self.lock:
+            for hook in self._before_write:
+                hook(event)
+            table, pk = self._target(event)
+            before = table.get(pk) if pk is not None else None
+            if self.apply(event) is None:
+                return None, None
+            after = table.get(pk) if pk is not None else None
+            if self.log is None:
+                return before, after
+            self.log.append(event)
+            self._since_snapshot += 1
+            snapshot = 0 < self.snapshot_every <= self._since_snapshot
+        if snapshot:
+            self.snapshot()
+        return before, after
+
+    def _target(self, event: Dict[str, Any]) -> Tuple[Any, Any]:
+        t = self.tables
+        kind = event["type"]
+        if kind == "tier_created":
+            return t["tiers"], event["tier"]["id"]
+        if kind in ("tier_updated", "tier_deleted"):
+            return t["tiers"], event["tier_id"]
+        if kind == "item_created":
+            return t["one_time_purchases"], event["item"]["id"]
+        if kind in ("item_updated", "item_deleted", "purchased"):
+            return t["one_time_purchases"], event["purchase_id"]
+        if kind == "subscribed":
+            return t["tiers"], event["subscription"]["tier_id"]
+        if kind == "unsubscribed":
+            sub = t["subscriptions"].get(event["subscription_id"])
+            return t["tiers"], sub["tier_id"] if sub else None
+        if kind == "kyc_changed":
+            return t["kyc"], event["creator_id"]
+        raise ValueError(f"Unknown event type: {kind}")
+
+    def apply(self, event: Dict[str, Any]) -> Optional[Row]:
+        t = self.tables
+        kind = event["type"]
+        if kind == "tier_created":
+            return t["tiers"].insert(dict(event["tier"]))
+        if kind == "tier_updated":
+            return t["tiers"].update(event["tier_id"], event["changes"])
+        if kind == "tier_deleted":
+            return t["tiers"].delete(event["tier_id"])
+        if kind == "item_created":
+            return t["one_time_purchases"].insert(dict(event["item"]))
+        if kind == "item_updated":
+            return t["one_time_purchases"].update(event["purchase_id"], event["changes"])
+        if kind == "item_deleted":
+            return t["one_time_purchases"].delete(event["purchase_id"])
+        if kind == "subscribed":
+            tier_id = event["subscription"]["tier_id"]
+            if tier_id not in t["tiers"]:
+                return None
+            t["subscriptions"].insert(dict(event["subscription"]))
+            return t["tiers"].increment(tier_id, "subscriberCount")
+        if kind == "unsubscribed":
+            sub = t["subscriptions"].delete(event["subscription_id"])
+            return t["tiers"].increment(sub["tier_id"], "subscriberCount", -1) if sub else None
+        if kind == "purchased":
+            item = t["one_time_purchases"].increment(event["purchase_id"], "purchaseCount", event.get("count", 1))
+            # Events logged before purchases were kept per user carry no record
+            if item is not None and "purchase" in event:
+                t["purchases"].insert(dict(event["purchase"]))
+            return item
+        if kind == "kyc_changed":
+            return t["kyc"].upsert({"creator_id": event["creator_id"], "status": event["status"], **event.get("details", {})})
+        raise ValueError(f"Unknown event type: {kind}")
+
+    def state(self) -> Dict[str, list]:
+        # Rows are replaced on write, never mutated, so copying references is enough
+        return {name: list(table) for name, table in self.tables.items()}
+
+    def snapshot(self) -> Optional[str]:
+        """Write the current tables as a snapshot; rows are collected under the lock, serialized outside it."""
+        if self.log is None:
+            return None
+        with self.lock:
+            seq = self.log.seq
+            state = self.state()
+            self._since_snapshot = 0
+        return self.log.write_snapshot(seq, state)
+
+    def replay(self, after: int) -> int:
+        """Apply logged events after seq `after` to the tables; returns how many were applied."""
+        applied = 0
+        for event in self.log.replay(after):
+            self.apply(event)
+            applied += 1
+        self._since_snapshot = applied
+        return applied
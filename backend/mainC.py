@@ -1,22 +1,8 @@
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
-import membership_service
-import content_service
+from gateway import create_app
 
-app = FastAPI()
-
-# CORS for frontend
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # For dev; restrict in prod!
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# Include routers with prefixes
-app.include_router(membership_service.router, prefix="/membership", tags=["Membership"])
-app.include_router(content_service.router, prefix="/content", tags=["Content"])
+# Every service in one process; set TIERFLOW_SERVICES=membership or =content
+# (with MEMBERSHIP_SERVICE_URL) to run one of them on its own
+app = create_app()
 
 if __name__ == "__main__":
     import uvicorn
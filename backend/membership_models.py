@@ -0,0 +1,145 @@
+import os
+from typing import Dict, Any
+from store import Table
+from aggregates import CreatorAggregates
+from access import AccessIndex
+from payout import PayoutEngine
+from eventlog import EventLog
+from ledger import MembershipLedger
+from aml import AmlMonitor
+from kyc import KYC_SECRET, KycEngine, LocalKycProvider
+from timeseries import RevenueSeries
+from metrics import InstrumentedTable
+from snapshot import force, loaded
+from models import (DATABASE_URL, EVENT_LOG_DIR, REVENUE_ORDERINGS, SNAPSHOT_EVERY, SUBSCRIPTION_ORDERINGS, derived,
+                    snapshot_table, state_snapshot)
+
+# Stores behind the membership service: tiers, subscriptions, purchases and KYC
+# profiles written through the ledger, the state derived from them, payouts and
+# the AML and KYC workers. Only imported where membership is mounted.
+
+# --- Seed data ---
+SEED_TIERS = [
+    {"id": "tier1", "name": "Basic Fan", "price": 4.99, "benefits": ["Behind-the-scenes access"], "subscriberCount": 2500, "creator_id": "creator1"},
+    {"id": "tier2", "name": "Super Fan", "price": 9.99, "benefits": ["Q&As"], "subscriberCount": 1200, "creator_id": "creator1"},
+    {"id": "tier3", "name": "VIP Circle", "price": 24.99, "benefits": ["1-on-1 access"], "subscriberCount": 180, "creator_id": "creator1"},
+]
+
+# One-time purchase items
+SEED_ONE_TIME_PURCHASES = [
+    {"id": "purchase1", "name": "Exclusive Bootcamp", "price": 19.99, "description": "Learn advanced techniques", "type": "video", "creator_id": "creator1", "purchaseCount": 45},
+    {"id": "purchase2", "name": "Premium E-book Guide", "price": 29.99, "description": "Complete guide to success", "type": "ebook", "creator_id": "creator1", "purchaseCount": 23},
+    {"id": "purchase3", "name": "Limited Edition Merch", "price": 49.99, "description": "Exclusive creator merchandise", "type": "merchandise", "creator_id": "creator1", "purchaseCount": 12},
+]
+
+event_log = EventLog(EVENT_LOG_DIR) if EVENT_LOG_DIR else None
+
+if DATABASE_URL:
+    from models import database
+
+    tiers_db = database.table("tiers", indexes=("creator_id",), seed=SEED_TIERS)
+    one_time_purchases_db = database.table("one_time_purchases", indexes=("creator_id",), seed=SEED_ONE_TIME_PURCHASES)
+    subscriptions_db = database.table("subscriptions", indexes=("user_id", "tier_id"), ordered=SUBSCRIPTION_ORDERINGS)
+    purchases_db = database.table("purchases", indexes=("user_id",))
+    kyc_db = database.table("profiles", key="creator_id")
+    revenue_rollups_db = database.table("revenue_rollups", ordered=REVENUE_ORDERINGS)
+    payouts_db = database.table("payouts", key="creator_id")
+    payout_days_db = database.table("payout_days")
+    # Idempotency keys, claimed here so a retry on another worker sees them
+    idempotency_db = database.table("idempotency")
+elif state_snapshot is not None:
+    tiers_db = snapshot_table("tiers", SEED_TIERS, indexes=("creator_id",))
+    one_time_purchases_db = snapshot_table("one_time_purchases", SEED_ONE_TIME_PURCHASES, indexes=("creator_id",))
+    subscriptions_db = snapshot_table("subscriptions", indexes=("user_id", "tier_id"), ordered=SUBSCRIPTION_ORDERINGS)
+    purchases_db = snapshot_table("purchases", indexes=("user_id",))
+    kyc_db = snapshot_table("kyc", key="creator_id")
+    revenue_rollups_db = snapshot_table("revenue_rollups", ordered=REVENUE_ORDERINGS)
+    payouts_db = snapshot_table("payouts", key="creator_id")
+    payout_days_db = snapshot_table("payout_days")
+else:
+    snapshot_seq, snapshot = event_log.latest_snapshot() if event_log else (0, None)
+    snapshot = snapshot or {"tiers": SEED_TIERS, "one_time_purchases": SEED_ONE_TIME_PURCHASES}
+    # Tables keep a primary-key index plus the secondary indexes the routers query by
+    tiers_db = Table(indexes=("creator_id",), rows=[dict(t) for t in snapshot.get("tiers", ())])
+    one_time_purchases_db = Table(indexes=("creator_id",), rows=[dict(p) for p in snapshot.get("one_time_purchases", ())])
+    subscriptions_db = Table(indexes=("user_id", "tier_id"), ordered=SUBSCRIPTION_ORDERINGS,
+                             rows=snapshot.get("subscriptions", ()))
+    # One row per purchase of a one-time item, so a buyer's access outlives the process
+    purchases_db = Table(indexes=("user_id",), rows=snapshot.get("purchases", ()))
+    kyc_db = Table(key="creator_id", rows=snapshot.get("kyc", ()))
+    revenue_rollups_db = Table(ordered=REVENUE_ORDERINGS)
+    # The event log holds membership events only; payouts stay in-process here
+    payouts_db = Table(key="creator_id")
+    payout_days_db = Table()
+
+# Count every table call against the route that made it, for /metrics
+tiers_db = InstrumentedTable(tiers_db, "tiers")
+one_time_purchases_db = InstrumentedTable(one_time_purchases_db, "one_time_purchases")
+subscriptions_db = InstrumentedTable(subscriptions_db, "subscriptions")
+purchases_db = InstrumentedTable(purchases_db, "purchases")
+kyc_db = InstrumentedTable(kyc_db, "kyc")
+revenue_rollups_db = InstrumentedTable(revenue_rollups_db, "revenue_rollups")
+idempotency_db = InstrumentedTable(idempotency_db, "idempotency") if DATABASE_URL else None
+payouts_db = InstrumentedTable(payouts_db, "payouts")
+payout_days_db = InstrumentedTable(payout_days_db, "payout_days")
+
+# Every membership write goes through the ledger. With a database the log is an
+# audit trail only (the tables are already durable), so it is never replayed.
+ledger = MembershipLedger(
+    {"tiers": tiers_db, "one_time_purchases": one_time_purchases_db, "subscriptions": subscriptions_db,
+     "purchases": purchases_db, "kyc": kyc_db},
+    log=event_log,
+    snapshot_every=0 if DATABASE_URL else SNAPSHOT_EVERY,
+)
+if not DATABASE_URL and event_log is not None:
+    ledger.replay(snapshot_seq)
+if state_snapshot is not None:
+    # Membership tables are collected under the ledger lock so the snapshot never splits a write
+    state_snapshot.guard = ledger.lock
+
+# Per-creator dashboard totals, kept current by the membership router's writes
+creator_stats = derived(lambda: CreatorAggregates.from_tables(tiers_db, one_time_purchases_db))
+
+# Tier/purchase entitlement bitsets for content authorization, kept current the same way.
+# Other workers sharing a database don't update ours, so there it re-reads what it holds after a second.
+access_index = derived(lambda: AccessIndex.from_tables(tiers_db, one_time_purchases_db, subscriptions_db, purchases_db,
+                                                       ttl=1.0 if DATABASE_URL else None))
+
+# Daily earnings ledger behind smoothed payouts, kept in tables like the rest
+payout_engine = PayoutEngine(creators=payouts_db, days=payout_days_db)
+
+# Minute/hour/day/month revenue and subscriber rollups behind the analytics charts.
+# A database or state snapshot keeps them; otherwise they are backfilled from subscriptions.
+revenue_series = derived(lambda: RevenueSeries(revenue_rollups_db)
+                         if DATABASE_URL or (state_snapshot is not None and state_snapshot.has("revenue_rollups"))
+                         else RevenueSeries.from_tables(revenue_rollups_db, subscriptions_db, tiers_db))
+if state_snapshot is not None:
+    state_snapshot.before_save(lambda: revenue_series.flush() if loaded(revenue_series) else None)
+
+def _before_write(event):
+    # Derived state is read from the tables, so it must be in place before they change:
+    # read after, it would already hold the change the router then applies
+    kind = event["type"]
+    if kind == "kyc_changed":
+        return
+    for state in (creator_stats, access_index, revenue_series):
+        force(state)
+    if kind == "subscribed":
+        access_index.load(event["subscription"]["user_id"])
+    elif kind == "unsubscribed":
+        sub = subscriptions_db.get(event["subscription_id"])
+        access_index.load(sub["user_id"] if sub else None)
+    elif kind == "purchased":
+        access_index.load(event.get("user_id"))
+
+ledger.before_write(_before_write)
+
+# Streaming transaction monitoring over subscribe/purchase events
+aml_monitor = AmlMonitor()
+
+def _save_kyc(creator_id: str, status: str, details: Dict[str, Any]):
+    ledger.record({"type": "kyc_changed", "creator_id": creator_id, "status": status, "details": details})
+
+# Background KYC checks against the local provider stand-in
+kyc_engine = KycEngine(LocalKycProvider(KYC_SECRET), load=lambda creator_id: kyc_db.get(creator_id), save=_save_kyc, secret=KYC_SECRET,
+                       concurrency=int(os.environ.get("TIERFLOW_KYC_CONCURRENCY", "8")))
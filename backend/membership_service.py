@@ -1,125 +1,473 @@
-from fastapi import APIRouter, Form, HTTPException
-from models import tiers_db, subscriptions_db, kyc_db, one_time_purchases_db
+from collections import Counter
+import time
+from datetime import date, datetime
+from typing import Optional
+import orjson
+from fastapi import APIRouter, Form, Header, HTTPException, Query, Request, Response
+from starlette.concurrency import run_in_threadpool
+from models import response_cache, DATABASE_URL
+from membership_models import tiers_db, subscriptions_db, purchases_db, kyc_db, one_time_purchases_db, creator_stats, payout_engine, ledger, aml_monitor, kyc_engine, access_index, revenue_series, idempotency_db
+from aggregates import CreatorAggregates
+from pagination import decode_cursor, paginate
+from idempotency import IN_PROGRESS, IdempotencyStore
+from responses import FastJSONResponse, dumps
+from timeseries import MAX_POINTS, to_epoch
+from metrics import ProfiledRoute
+from simulator import simulate
+from entitlements import EntitlementInvalidator
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
+
+# Results of requests sent with an Idempotency-Key, replayed on retries; shared by
+# every worker when there is a database
+idempotency = IdempotencyStore(table=idempotency_db)
+BULK_BATCH_SIZE = 1000
+
+# Content services running elsewhere cache entitlement answers; the gateway
+# points this at them so subscription changes reach those caches
+invalidator: Optional[EntitlementInvalidator] = None
+
+def configure_invalidation(content_urls=None):
+    global invalidator
+    if invalidator is not None:
+        invalidator.close()
+    invalidator = EntitlementInvalidator(content_urls) if content_urls else None
+
+# The video catalog behind /revenue/{id}/simulate; the gateway sets it when content
+# runs in this process, since on its own membership has no videos to score
+catalog = None
+
+def configure_catalog(videos=None):
+    global catalog
+    catalog = videos
+
+def _entitlements_changed(*changes):
+    # (user_id, creator_id) pairs whose access just changed
+    if invalidator is not None:
+        invalidator.changed(changes)
+
+def shutdown():
+    """Run by the gateway's lifespan when the app stops."""
+    if invalidator is not None:
+        invalidator.close()
+
+def _invalidate(*rows):
+    # Cached tier/item lists and dashboards of these rows' creators are now stale
+    for row in rows:
+        if row is not None:
+            response_cache.invalidate(row.get("creator_id"))
 
 @router.get("/tiers/{creator_id}")
-def get_tiers(creator_id: str):
-    return tiers_db
+def get_tiers(creator_id: str, if_none_match: Optional[str] = Header(None)):
+    return response_cache.respond(creator_id, "tiers", lambda: tiers_db.find("creator_id", creator_id), if_none_match)
 
 @router.post("/tiers/")
 def create_tier(tier: dict):
-    tier["id"] = f"tier{len(tiers_db)+1}"
-    tiers_db.append(tier)
+    tier["id"] = tiers_db.next_id("tier")
+    t = _add_tier(tier)
     print(f"Created tier: {tier['name']}")
-    return tier
+    return t
+
+def _add_tier(tier: dict):
+    _, t = ledger.record({"type": "tier_created", "tier": tier})
+    creator_stats.tier_changed(None, t)
+    access_index.tier_changed(None, t)
+    _invalidate(t)
+    return t
 
 @router.put("/tiers/{tier_id}")
 def update_tier(tier_id: str, tier: dict):
-    for t in tiers_db:
-        if t["id"] == tier_id:
-            t.update(tier)
-            return t
-    raise HTTPException(status_code=404, detail="Tier not found")
+    before, t = ledger.record({"type": "tier_updated", "tier_id": tier_id, "changes": tier})
+    if t is None:
+        raise HTTPException(status_code=404, detail="Tier not found")
+    creator_stats.tier_changed(before, t)
+    access_index.tier_changed(before, t)
+    _invalidate(before, t)
+    return t
 
 @router.delete("/tiers/{tier_id}")
 def delete_tier(tier_id: str):
-    global tiers_db
-    tiers_db = [t for t in tiers_db if t["id"] != tier_id]
+    before, _ = ledger.record({"type": "tier_deleted", "tier_id": tier_id})
+    creator_stats.tier_changed(before, None)
+    access_index.tier_changed(before, None)
+    _invalidate(before)
     return {"success": True}
 
 # One-time purchase endpoints
 @router.get("/one-time-purchases/{creator_id}")
-def get_one_time_purchases(creator_id: str):
-    return [p for p in one_time_purchases_db if p["creator_id"] == creator_id]
+def get_one_time_purchases(creator_id: str, if_none_match: Optional[str] = Header(None)):
+    return response_cache.respond(creator_id, "one-time-purchases",
+                                  lambda: one_time_purchases_db.find("creator_id", creator_id), if_none_match)
 
 @router.post("/one-time-purchases/")
 def create_one_time_purchase(purchase: dict):
-    purchase["id"] = f"purchase{len(one_time_purchases_db)+1}"
+    purchase["id"] = one_time_purchases_db.next_id("purchase")
     purchase["purchaseCount"] = 0
-    one_time_purchases_db.append(purchase)
+    _, p = ledger.record({"type": "item_created", "item": purchase})
+    creator_stats.purchase_changed(None, p)
+    access_index.item_changed(None, p)
+    _invalidate(p)
     print(f"Created one-time purchase: {purchase['name']}")
-    return purchase
+    return p
 
 @router.put("/one-time-purchases/{purchase_id}")
 def update_one_time_purchase(purchase_id: str, purchase: dict):
-    for p in one_time_purchases_db:
-        if p["id"] == purchase_id:
-            p.update(purchase)
-            return p
-    raise HTTPException(status_code=404, detail="One-time purchase not found")
+    before, p = ledger.record({"type": "item_updated", "purchase_id": purchase_id, "changes": purchase})
+    if p is None:
+        raise HTTPException(status_code=404, detail="One-time purchase not found")
+    creator_stats.purchase_changed(before, p)
+    access_index.item_changed(before, p)
+    _invalidate(before, p)
+    return p
 
 @router.delete("/one-time-purchases/{purchase_id}")
 def delete_one_time_purchase(purchase_id: str):
-    global one_time_purchases_db
-    one_time_purchases_db = [p for p in one_time_purchases_db if p["id"] != purchase_id]
+    before, _ = ledger.record({"type": "item_deleted", "purchase_id": purchase_id})
+    creator_stats.purchase_changed(before, None)
+    access_index.item_changed(before, None)
+    _invalidate(before)
     return {"success": True}
 
+def _purchased(purchase_id: str, user_id: str):
+    before, after = ledger.record({"type": "purchased", "purchase_id": purchase_id, "user_id": user_id, "purchase": {
+        "id": purchases_db.next_id("buy"),
+        "user_id": user_id,
+        "purchase_id": purchase_id,
+        "purchased_at": datetime.utcnow().isoformat() + "Z",
+    }})
+    if after is not None:
+        access_index.granted(user_id, purchase_id)
+        aml_monitor.observe("purchase", user_id, after.get("creator_id"), after.get("price", 0))
+    return before, after
+
+def _subscribed(user_id: str, tier_id: str):
+    before, after = ledger.record({"type": "subscribed", "subscription": {
+        "id": subscriptions_db.next_id("sub"),
+        "user_id": user_id,
+        "tier_id": tier_id,
+        "subscribed_at": datetime.utcnow().isoformat() + "Z",
+    }})
+    if after is not None:
+        access_index.granted(user_id, tier_id)
+        aml_monitor.observe("subscribe", user_id, after.get("creator_id"), after.get("price", 0))
+    return before, after
+
+def _counted_purchases(before, after, count: int):
+    # Fold `count` purchases of one item into aggregates and earnings at once
+    creator_stats.purchase_changed(before, after)
+    _invalidate(after)
+    revenue = (after.get("price", 0) or 0) * count
+    payout_engine.record(after.get("creator_id"), revenue)
+    revenue_series.record(after.get("creator_id"), revenue=revenue, purchases=count)
+
+def _counted_subscribers(before, after, count: int):
+    creator_stats.tier_changed(before, after)
+    _invalidate(after)
+    revenue = (after.get("price", 0) or 0) * count
+    payout_engine.record(after.get("creator_id"), revenue)
+    revenue_series.record(after.get("creator_id"), revenue=revenue, subscriptions=count)
+
+def _claimed(idempotency_key: Optional[str]):
+    # The result to replay for a key already used, or None once this request holds it
+    if not idempotency_key:
+        return None
+    previous = idempotency.claim(idempotency_key)
+    if previous is IN_PROGRESS:
+        raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still being applied")
+    return previous
+
+def _released(idempotency_key: Optional[str]):
+    if idempotency_key:
+        idempotency.release(idempotency_key)
+
 @router.post("/one-time-purchases/{purchase_id}/purchase")
-def purchase_item(purchase_id: str, user_id: str = Form(...)):
-    for p in one_time_purchases_db:
-        if p["id"] == purchase_id:
-            p["purchaseCount"] = p.get("purchaseCount", 0) + 1
-            return {"success": True, "purchase_id": purchase_id, "user_id": user_id}
-    raise HTTPException(status_code=404, detail="One-time purchase not found")
+def purchase_item(purchase_id: str, user_id: str = Form(...), idempotency_key: Optional[str] = Header(None)):
+    # The key is claimed before applying (atomically in the database when there is one)
+    # and its result recorded after, so concurrent retries on any worker apply once
+    with ledger.lock:
+        if (previous := _claimed(idempotency_key)) is not None:
+            return previous
+        try:
+            before, after = _purchased(purchase_id, user_id)
+            if after is None:
+                raise HTTPException(status_code=404, detail="One-time purchase not found")
+            _counted_purchases(before, after, 1)
+        except BaseException:
+            _released(idempotency_key)
+            raise
+        result = {"success": True, "purchase_id": purchase_id, "user_id": user_id}
+        if idempotency_key:
+            idempotency.put(idempotency_key, result)
+    _entitlements_changed((user_id, after.get("creator_id")))
+    return result
+
+def _add_subscription(user_id: str, tier_id: str, idempotency_key: Optional[str] = None):
+    with ledger.lock:
+        if (previous := _claimed(idempotency_key)) is not None:
+            return previous
+        try:
+            before, after = _subscribed(user_id, tier_id)
+            if after is None:
+                raise HTTPException(status_code=404, detail="Tier not found")
+            _counted_subscribers(before, after, 1)
+        except BaseException:
+            _released(idempotency_key)
+            raise
+        result = {"success": True}
+        if idempotency_key:
+            idempotency.put(idempotency_key, result)
+    _entitlements_changed((user_id, after.get("creator_id")))
+    return result
 
 @router.post("/subscribe/")
-def subscribe(user_id: str = Form(...), tier_id: str = Form(...)):
-    subscriptions_db.append({"user_id": user_id, "tier_id": tier_id})
-    # Increment subscriber count on the tier
-    for t in tiers_db:
-        if t["id"] == tier_id:
-            t["subscriberCount"] = (t.get("subscriberCount", 0) or 0) + 1
-            break
-    return {"success": True}
+def subscribe(user_id: str = Form(...), tier_id: str = Form(...), idempotency_key: Optional[str] = Header(None)):
+    return _add_subscription(user_id, tier_id, idempotency_key)
 
 @router.post("/subscribe_json")
-def subscribe_json(payload: dict):
+def subscribe_json(payload: dict, idempotency_key: Optional[str] = Header(None)):
     user_id = payload.get("user_id")
     tier_id = payload.get("tier_id")
     if not user_id or not tier_id:
         raise HTTPException(status_code=400, detail="user_id and tier_id required")
-    subscriptions_db.append({"user_id": user_id, "tier_id": tier_id})
-    for t in tiers_db:
-        if t["id"] == tier_id:
-            t["subscriberCount"] = (t.get("subscriberCount", 0) or 0) + 1
-            break
+    return _add_subscription(user_id, tier_id, idempotency_key or payload.get("idempotency_key"))
+
+@router.post("/unsubscribe/")
+def unsubscribe(subscription_id: str = Form(...)):
+    # Read under the lock that removes it, so a concurrent unsubscribe can't act on the same row
+    with ledger.lock:
+        sub = subscriptions_db.get(subscription_id)
+        if sub is None:
+            raise HTTPException(status_code=404, detail="Subscription not found")
+        before, t = ledger.record({"type": "unsubscribed", "subscription_id": subscription_id})
+        if t is None:
+            raise HTTPException(status_code=404, detail="Subscription not found")
+        creator_stats.tier_changed(before, t)
+        access_index.revoked(sub["user_id"], sub["tier_id"])
+        revenue_series.record(t.get("creator_id"), cancellations=1)
+    _invalidate(t)
+    _entitlements_changed((sub["user_id"], t.get("creator_id")))
     return {"success": True}
 
+def _apply_bulk(events):
+    """
+    Apply one batch of (index, event) pairs. Every event is recorded in the
+    ledger, but aggregates and earnings are updated once per tier or item
+    for the whole batch.
+    """
+    # Holding the ledger lock for the batch keeps other writers from landing
+    # between a tier's first "before" and last "after"
+    with ledger.lock:
+        results, changes = _apply_bulk_locked(events)
+    _entitlements_changed(*changes)
+    return results
+
+def _apply_bulk_locked(events):
+    results, changes = [], []
+    changed = {}  # (kind, id) -> [before, after]
+    subscribers, purchases = Counter(), Counter()
+    for index, event in events:
+        if isinstance(event, str):
+            results.append({"index": index, "status": "error", "detail": event})
+            continue
+        key = event.get("idempotency_key")
+        previous = idempotency.claim(key) if key else None
+        if previous is IN_PROGRESS:
+            results.append({"index": index, "status": "error", "detail": "idempotency_key is still being applied"})
+            continue
+        if previous is not None:
+            results.append({**previous, "index": index, "status": "duplicate"})
+            continue
+        kind, user_id = event.get("type"), event.get("user_id")
+        tier_id, purchase_id = event.get("tier_id"), event.get("purchase_id")
+        before = after = None
+        try:
+            if kind == "subscribe" and user_id and tier_id:
+                before, after = _subscribed(user_id, tier_id)
+                subscribers[tier_id] += after is not None
+            elif kind == "purchase" and user_id and purchase_id:
+                before, after = _purchased(purchase_id, user_id)
+                purchases[purchase_id] += after is not None
+        except BaseException:
+            _released(key)
+            raise
+        if after is None:
+            _released(key)
+            detail = "type must be subscribe or purchase" if kind not in ("subscribe", "purchase") else \
+                "user_id and an existing tier_id/purchase_id required"
+            results.append({"index": index, "status": "error", "detail": detail})
+            continue
+        changed.setdefault((kind, after["id"]), [before, None])[1] = after
+        changes.append((user_id, after.get("creator_id")))
+        result = {"index": index, "status": "applied", "idempotency_key": key}
+        if key:
+            idempotency.put(key, result)
+        results.append(result)
+    for (kind, pk), (before, after) in changed.items():
+        if kind == "subscribe":
+            _counted_subscribers(before, after, subscribers[pk])
+        else:
+            _counted_purchases(before, after, purchases[pk])
+    return results, changes
+
+async def _ndjson_events(request: Request):
+    # Parse the body line by line as it streams in, so memory stays bounded
+    index = 0
+    pending = b""
+    async for chunk in request.stream():
+        lines = (pending + chunk).split(b"\n")
+        pending = lines.pop()
+        for line in lines:
+            if line.strip():
+                yield index, _parse_event(line)
+                index += 1
+    if pending.strip():
+        yield index, _parse_event(pending)
+
+def _parse_event(line: bytes):
+    try:
+        event = orjson.loads(line)
+    except ValueError:
+        return "invalid JSON"
+    return event if isinstance(event, dict) else "event must be a JSON object"
+
+@router.post("/bulk")
+async def bulk_ingest(request: Request):
+    """
+    Bulk subscription/purchase ingestion. The body is NDJSON, one event per line:
+    {"type": "subscribe", "user_id": ..., "tier_id": ..., "idempotency_key": ...}
+    {"type": "purchase", "user_id": ..., "purchase_id": ..., "idempotency_key": ...}
+    Responds with NDJSON, one result per event in input order.
+    """
+    # The body is consumed in batches as it arrives; only the compact results are buffered
+    out = []
+    batch = []
+    async for item in _ndjson_events(request):
+        batch.append(item)
+        if len(batch) == BULK_BATCH_SIZE:
+            out.extend(dumps(r) for r in await run_in_threadpool(_apply_bulk, batch))
+            batch = []
+    if batch:
+        out.extend(dumps(r) for r in await run_in_threadpool(_apply_bulk, batch))
+    return Response(b"\n".join(out) + (b"\n" if out else b""), media_type="application/x-ndjson")
+
 @router.get("/subscriptions/{user_id}")
-def get_subscriptions(user_id: str):
-    return [s for s in subscriptions_db if s["user_id"] == user_id]
+def get_subscriptions(
+    user_id: str,
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None,
+    tier_id: Optional[str] = None,
+):
+    # Oldest first, keyset-paginated; next page cursor in the X-Next-Cursor header
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    rows = subscriptions_db.scan("user_id", user_id, "subscribed_at", after=after)
+    page, next_cursor = paginate(rows, limit, "subscribed_at", (lambda s: s["tier_id"] == tier_id) if tier_id else None)
+    return FastJSONResponse(page, headers={"X-Next-Cursor": next_cursor} if next_cursor else None)
 
 @router.post("/kyc/verify/{creator_id}")
-def trigger_kyc(creator_id: str):
-    kyc_db[creator_id] = {"status": "pending"}
-    return {"status": "pending"}
+async def trigger_kyc(creator_id: str):
+    # Returns at once; the check runs in the background and the provider calls the webhook
+    return {"status": await kyc_engine.submit(creator_id)}
+
+@router.post("/kyc/webhook")
+async def kyc_webhook(payload: dict):
+    try:
+        return {"status": await kyc_engine.handle_callback(payload)}
+    except PermissionError as e:
+        raise HTTPException(status_code=401, detail=str(e))
+    except (KeyError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid KYC callback: {e}")
 
 @router.get("/kyc/status/{creator_id}")
 def get_kyc_status(creator_id: str):
-    return kyc_db.get(creator_id, {"status": "not_started"})
+    record = kyc_db.get(creator_id)
+    if record is None:
+        return {"status": "not_started"}
+    return {k: v for k, v in record.items() if k != "creator_id" and v is not None}
+
+@router.get("/aml/alerts")
+def get_aml_alerts(limit: int = Query(100, ge=1, le=1000)):
+    # Newest first
+    return FastJSONResponse({"events_seen": aml_monitor.events_seen, "alerts": aml_monitor.recent_alerts(limit)})
+
+@router.post("/entitlements/check")
+def check_entitlements(payload: dict):
+    # For a content service running apart from membership: whether the user
+    # passes each {creator_id, minTier} gate, answered from the access index
+    items = payload.get("items")
+    if not isinstance(items, list) or not all(isinstance(i, dict) for i in items):
+        raise HTTPException(status_code=400, detail="items must be a list of {creator_id, minTier} objects")
+    return {"allowed": access_index.visible(payload.get("user_id"), items)}
 
 @router.get("/dashboard/{creator_id}")
-def get_dashboard(creator_id: str):
-    # Example stats including one-time purchases
-    one_time_revenue = sum(p["price"] * p.get("purchaseCount", 0) for p in one_time_purchases_db if p["creator_id"] == creator_id)
-    
-    # Ensure subscriberCount is not None and calculate safely
-    total_subscribers = sum(t.get("subscriberCount", 0) or 0 for t in tiers_db)
-    subscription_revenue = sum(t["price"] * (t.get("subscriberCount", 0) or 0) for t in tiers_db)
-    
-    return {
-        "total_subscribers": total_subscribers,
-        "total_tiers": len(tiers_db),
-        "revenue": subscription_revenue,
-        "one_time_revenue": one_time_revenue,
-        "total_revenue": subscription_revenue + one_time_revenue,
-    }
+def get_dashboard(creator_id: str, if_none_match: Optional[str] = Header(None)):
+    return response_cache.respond(creator_id, "dashboard", lambda: _dashboard(creator_id), if_none_match)
+
+def _dashboard(creator_id: str):
+    if DATABASE_URL:
+        # Other workers write to the shared database, so rebuild from this creator's rows
+        return _recompute_dashboard(creator_id)
+    return creator_stats.dashboard(creator_id)
+
+@router.get("/dashboard/{creator_id}/verify")
+def verify_dashboard(creator_id: str):
+    running = _dashboard(creator_id)
+    recomputed = _recompute_dashboard(creator_id)
+    return {"consistent": running == recomputed, "running": running, "recomputed": recomputed}
+
+def _recompute_dashboard(creator_id: str):
+    return CreatorAggregates.recompute(
+        creator_id,
+        tiers_db.find("creator_id", creator_id),
+        one_time_purchases_db.find("creator_id", creator_id),
+    )
+
+@router.get("/revenue/{creator_id}/series")
+def get_revenue_series(
+    creator_id: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    resolution: Optional[str] = None,
+    max_points: int = Query(MAX_POINTS, ge=1, le=5000),
+):
+    # Defaults to the last 30 days; resolution is picked from the range unless given
+    end_at = to_epoch(end) if end else time.time()
+    start_at = to_epoch(start) if start else end_at - 30 * 86400
+    try:
+        return FastJSONResponse(revenue_series.query(creator_id, start_at, end_at, resolution, max_points))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/revenue/{creator_id}/simulate")
+def simulate_revenue(creator_id: str, payload: dict):
+    # What-if projections: each scenario's tier price/subscriber changes and
+    # per-video quality flag toggles, scored over the whole catalog in one pass
+    if catalog is None:
+        raise HTTPException(status_code=501, detail="Revenue simulation needs the content service in this deployment")
+    try:
+        return FastJSONResponse(simulate(
+            catalog.find("creator_id", creator_id),
+            tiers_db.find("creator_id", creator_id),
+            one_time_purchases_db.find("creator_id", creator_id),
+            payload.get("scenarios"),
+            payload.get("months", 6),
+        ))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/payout/settle")
+def settle_payouts(day: Optional[date] = None):
+    # Nightly cycle: close the open day for every creator in one batch
+    try:
+        return payout_engine.settle_day(day)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
 
 @router.post("/payout/{creator_id}")
 def trigger_payout(creator_id: str):
-    # Example ML payout simulation
-    return {
-        "smoothed_payouts": [100, 120, 110, 130],
-        "insights": "Payouts are increasing month over month."
-    }
\ No newline at end of file
+    # KYC gate: cached final status, so this never waits on the provider
+    if kyc_engine.status(creator_id) != "verified":
+        raise HTTPException(status_code=403, detail="Creator must complete KYC verification before withdrawing funds.")
+    return payout_engine.summary(creator_id)
\ No newline at end of file
@@ -0,0 +1,351 @@
+import contextvars
+import functools
+import inspect
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, deque
+from typing import Any, Dict, Optional, Tuple
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import PlainTextResponse
+from fastapi.routing import APIRoute
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)  # seconds
+SIZE_BUCKETS = (64, 256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)  # bytes
+CALL_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250, 1000)  # storage calls per request
+
+# Set TIERFLOW_PROFILE_SLOW_MS to sample the stacks of requests slower than that
+# many milliseconds; TIERFLOW_PROFILE_DIR also writes each one as a .folded file.
+PROFILE_SLOW_MS = os.environ.get("TIERFLOW_PROFILE_SLOW_MS")
+PROFILE_DIR = os.environ.get("TIERFLOW_PROFILE_DIR")
+PROFILE_INTERVAL = float(os.environ.get("TIERFLOW_PROFILE_INTERVAL_MS", "5")) / 1000
+
+
+class RequestStats:
+    __slots__ = ("storage", "samples")
+
+    def __init__(self):
+        self.storage: Counter = Counter()  # (table, op) -> calls
+        self.samples: Optional[Counter] = None  # folded stack -> samples, while profiled
+
+
+_current: contextvars.ContextVar = contextvars.ContextVar("tierflow_request", default=None)
+
+
+class _Histogram:
+    __slots__ = ("counts", "sum")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+
+class Metrics:
+    """
+    Request and storage metrics in Prometheus' text format. Routes are labelled
+    by their path template, so label cardinality stays at the number of routes.
+    """
+
+    def __init__(self):
+        self.in_flight = 0
+        self._histograms: Dict[Tuple[str, str, str], _Histogram] = {}  # (metric, method, route)
+        self._requests: Counter = Counter()  # (method, route, status) -> requests
+        self._storage: Counter = Counter()  # (route, table, op) -> calls
+        self._lock = threading.Lock()
+
+    def _observe(self, metric: str, buckets: Tuple[float, ...], method: str, route: str, value: float) -> None:
+        histogram = self._histograms.get((metric, method, route))
+        if histogram is None:
+            histogram = self._histograms[(metric, method, route)] = _Histogram(buckets)
+        histogram.counts[bisect_left(buckets, value)] += 1
+        histogram.sum += value
+
+    def started(self) -> None:
+        with self._lock:
+            self.in_flight += 1
+
+    def finished(self, method: str, route: str, status: int, seconds: float, request_bytes: int,
+                 response_bytes: int, storage: Counter) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            self._requests[(method, route, status)] += 1
+            self._observe("http_request_duration_seconds", LATENCY_BUCKETS, method, route, seconds)
+            self._observe("http_request_size_bytes", SIZE_BUCKETS, method, route, request_bytes)
+            self._observe("http_response_size_bytes", SIZE_BUCKETS, method, route, response_bytes)
+            self._observe("http_request_storage_calls", CALL_BUCKETS, method, route, sum(storage.values()))
+            for (table, op), calls in storage.items():
+                self._storage[(route, table, op)] += calls
+
+    def storage_call(self, table: str, op: str) -> None:
+        # Calls made outside a request (background workers, startup)
+        with self._lock:
+            self._storage[("background", table, op)] += 1
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            lines += ["# HELP tierflow_http_requests_in_flight Requests currently being served",
+                      "# TYPE tierflow_http_requests_in_flight gauge",
+                      f"tierflow_http_requests_in_flight {self.in_flight}",
+                      "# HELP tierflow_http_requests_total Requests served by route and status",
+                      "# TYPE tierflow_http_requests_total counter"]
+            for (method, route, status), n in sorted(self._requests.items()):
+                lines.append(f'tierflow_http_requests_total{{method="{method}",route="{_escape(route)}",status="{status}"}} {n}')
+            for metric, buckets, help_text in (
+                    ("http_request_duration_seconds", LATENCY_BUCKETS, "Request latency by route"),
+                    ("http_request_size_bytes", SIZE_BUCKETS, "Request body size by route"),
+                    ("http_response_size_bytes", SIZE_BUCKETS, "Response body size by route"),
+                    ("http_request_storage_calls", CALL_BUCKETS, "Storage calls made per request by route")):
+                lines += [f"# HELP tierflow_{metric} {help_text}", f"# TYPE tierflow_{metric} histogram"]
+                for (name, method, route), histogram in sorted(self._histograms.items(), key=lambda kv: kv[0]):
+                    if name != metric:
+                        continue
+                    labels = f'method="{method}",route="{_escape(route)}"'
+                    running = 0
+                    for bound, count in zip(buckets + (float("inf"),), histogram.counts):
+                        running += count
+                        le = "+Inf" if bound == float("inf") else repr(bound)
+                        lines.append(f'tierflow_{metric}_bucket{{{labels},le="{le}"}} {running}')
+                    lines.append(f"tierflow_{metric}_sum{{{labels}}} {histogram.sum}")
+                    lines.append(f"tierflow_{metric}_count{{{labels}}} {running}")
+            lines += ["# HELP tierflow_storage_calls_total Table calls by route, table and operation",
+                      "# TYPE tierflow_storage_calls_total counter"]
+            for (route, table, op), n in sorted(self._storage.items()):
+                lines.append(f'tierflow_storage_calls_total{{route="{_escape(route)}",table="{table}",op="{op}"}} {n}')
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+
+class InstrumentedTable:
+    """Forwards to a Table or SQLTable, counting every call against the current request's route."""
+
+    OPS = ("get", "find", "count", "scan", "insert", "insert_new", "update", "modify", "upsert", "increment",
+           "delete", "next_id")
+
+    def __init__(self, table, name: str):
+        self._table = table
+        self._name = name
+
+    def _counted(self, op: str, method):
+        name = self._name
+
+        def call(*args, **kwargs):
+            _count(name, op)
+            return method(*args, **kwargs)
+        return call
+
+    def __getattr__(self, attr: str) -> Any:
+        # Ops are wrapped on first use, so wrapping a lazily loaded table doesn't load it
+        method = getattr(self._table, attr)
+        if attr in self.OPS:
+            method = self._counted(attr, method)
+            setattr(self, attr, method)
+        return method
+
+    def __iter__(self):
+        _count(self._name, "iter")
+        return iter(self._table)
+
+    def __len__(self) -> int:
+        _count(self._name, "len")
+        return len(self._table)
+
+    def __contains__(self, pk: Any) -> bool:
+        _count(self._name, "contains")
+        return pk in self._table
+
+
+def _count(table: str, op: str) -> None:
+    stats = _current.get()
+    if stats is None:
+        registry.storage_call(table, op)
+    else:
+        stats.storage[(table, op)] += 1
+
+
+class SlowRequestProfiler:
+    """
+    Opt-in sampling profiler. While requests are in flight, a thread samples
+    the stack of each thread running an endpoint every `interval` seconds; a
+    request slower than `threshold` keeps its samples as folded stacks (what
+    flamegraph.pl and speedscope read). Async endpoints share the event loop
+    thread, so under concurrency their samples are attributed approximately.
+    """
+
+    def __init__(self, threshold: float, interval: float = PROFILE_INTERVAL, directory: Optional[str] = None,
+                 keep: int = 50):
+        self.threshold = threshold
+        self.interval = interval
+        self.directory = directory
+        self.recent: deque = deque(maxlen=keep)
+        self._active: Dict[int, RequestStats] = {}  # thread ident -> request it is running
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def begin(self, stats: RequestStats) -> None:
+        stats.samples = Counter()
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, daemon=True, name="slow-request-profiler")
+                    self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.interval)
+            if not self._active:
+                continue
+            frames = sys._current_frames()
+            for ident, stats in list(self._active.items()):
+                frame = frames.get(ident)
+                if frame is not None and stats.samples is not None:
+                    stats.samples[_fold(frame)] += 1
+
+    def finished(self, method: str, route: str, seconds: float, stats: RequestStats) -> None:
+        if seconds < self.threshold or not stats.samples:
+            return
+        folded = "\n".join(f"{stack} {n}" for stack, n in stats.samples.most_common())
+        record = {"at": time.time(), "method": method, "route": route, "duration_ms": round(seconds * 1000, 1),
+                  "samples": sum(stats.samples.values()), "folded": folded}
+        self.recent.append(record)
+        if self.directory:
+            slug = route.strip("/").replace("/", "_").replace("{", "").replace("}", "") or "root"
+            path = os.path.join(self.directory, f"{int(record['at'] * 1000)}-{method}-{slug}.folded")
+            with open(path, "w") as f:
+                f.write(folded + "\n")
+
+
+# Stacks are folded from the endpoint up, stopping at the wrapper that ran it
+_WRAPPER_CODES: set = set()
+
+
+def _fold(frame) -> str:
+    names = []
+    while frame is not None and frame.f_code not in _WRAPPER_CODES:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+def _attached(stats: Optional[RequestStats]):
+    """Register the calling thread as running stats' request until the endpoint returns."""
+    if stats is None or stats.samples is None or profiler is None:
+        return None
+    ident = threading.get_ident()
+    profiler._active[ident] = stats
+    return ident
+
+
+def _detach(ident: Optional[int], stats: Optional[RequestStats]) -> None:
+    if ident is not None and profiler._active.get(ident) is stats:
+        del profiler._active[ident]
+
+
+def _profiled(endpoint):
+    if getattr(endpoint, "_profiled", False):
+        return endpoint
+    if inspect.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def run(*args, **kwargs):
+            stats = _current.get()
+            ident = _attached(stats)
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                _detach(ident, stats)
+    else:
+        @functools.wraps(endpoint)
+        def run(*args, **kwargs):
+            stats = _current.get()
+            ident = _attached(stats)
+            try:
+                return endpoint(*args, **kwargs)
+            finally:
+                _detach(ident, stats)
+    run._profiled = True
+    _WRAPPER_CODES.add(run.__code__)
+    return run
+
+
+
+class ProfiledRoute(APIRoute):
+    """Route class that lets the sampling profiler find the thread running each endpoint."""
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, _profiled(endpoint), **kwargs)
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing each request and sizing its body and response."""
+
+    def __init__(self, app, metrics: Optional[Metrics] = None, profiler: Optional[SlowRequestProfiler] = None):
+        self.app = app
+        self.metrics = metrics or registry
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        stats = RequestStats()
+        if self.profiler is not None:
+            self.profiler.begin(stats)
+        token = _current.set(stats)
+        status = 500
+        sizes = [0, 0]
+
+        async def counting_receive():
+            message = await receive()
+            if message["type"] == "http.request":
+                sizes[0] += len(message.get("body", b""))
+            return message
+
+        async def counting_send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                sizes[1] += len(message.get("body", b""))
+            await send(message)
+
+        self.metrics.started()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, counting_receive, counting_send)
+        finally:
+            elapsed = time.perf_counter() - start
+            _current.reset(token)
+            # The router stores the matched route in the scope; label by its template
+            route = scope.get("route")
+            label = getattr(route, "path", None) or "unmatched"
+            self.metrics.finished(scope["method"], label, status, elapsed, sizes[0], sizes[1], stats.storage)
+            if self.profiler is not None:
+                self.profiler.finished(scope["method"], label, elapsed, stats)
+
+
+registry = Metrics()
+profiler = SlowRequestProfiler(float(PROFILE_SLOW_MS) / 1000, directory=PROFILE_DIR) if PROFILE_SLOW_MS else None
+
+router = APIRouter()
+
+
+@router.get("/metrics", include_in_schema=False)
+def get_metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
+@router.get("/metrics/slow-requests")
+def get_slow_requests(limit: int = 20):
+    # Newest first; each "folded" is flame graph input (flamegraph.pl, speedscope)
+    if profiler is None:
+        raise HTTPException(status_code=404, detail="Profiler disabled; set TIERFLOW_PROFILE_SLOW_MS")
+    return list(profiler.recent)[::-1][:limit]
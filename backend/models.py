@@ -1,23 +1,58 @@
-from typing import List, Dict, Any
-from datetime import datetime
+import os
+from typing import Dict, Any
+from responses import ResponseCache
+from snapshot import Lazy, SnapshotTable, StateSnapshot
 
-# --- Mock Database Storage ---
-tiers_db = [
-    {"id": "tier1", "name": "Basic Fan", "price": 4.99, "benefits": ["Behind-the-scenes access"], "subscriberCount": 2500},
-    {"id": "tier2", "name": "Super Fan", "price": 9.99, "benefits": ["Q&As"], "subscriberCount": 1200},
-    {"id": "tier3", "name": "VIP Circle", "price": 24.99, "benefits": ["1-on-1 access"], "subscriberCount": 180},
-]
+# Storage configuration and the state every service shares. Each service's stores
+# live in content_models and membership_models, and a deployment imports only the
+# ones for the services it mounts.
 
-# One-time purchase items
-one_time_purchases_db = [
-    {"id": "purchase1", "name": "Exclusive Bootcamp", "price": 19.99, "description": "Learn advanced techniques", "type": "video", "creator_id": "creator1", "purchaseCount": 45},
-    {"id": "purchase2", "name": "Premium E-book Guide", "price": 29.99, "description": "Complete guide to success", "type": "ebook", "creator_id": "creator1", "purchaseCount": 23},
-    {"id": "purchase3", "name": "Limited Edition Merch", "price": 49.99, "description": "Exclusive creator merchandise", "type": "merchandise", "creator_id": "creator1", "purchaseCount": 12},
-]
+# --- Storage ---
+# Set TIERFLOW_DATABASE_URL (sqlite:///tierflow.db or postgresql://...) to share
+# durable state between uvicorn workers; otherwise everything stays in-process.
+DATABASE_URL = os.environ.get("TIERFLOW_DATABASE_URL")
 
-subscriptions_db: List[Dict[str, str]] = []
-kyc_db: Dict[str, Dict[str, str]] = {}
-videos_db: List[Dict[str, Any]] = []
+# Set TIERFLOW_EVENT_LOG to a directory to make membership writes an append-only
+# event log; in-process tables are rebuilt from its latest snapshot plus the tail.
+EVENT_LOG_DIR = os.environ.get("TIERFLOW_EVENT_LOG")
+SNAPSHOT_EVERY = int(os.environ.get("TIERFLOW_SNAPSHOT_EVERY", "100000"))
+
+# Without a database or event log, set TIERFLOW_SNAPSHOT_DIR to keep in-process state
+# across restarts: every store is written to a versioned binary snapshot on shutdown
+# (and every TIERFLOW_SNAPSHOT_INTERVAL seconds), which startup memory-maps and each
+# store decodes on first use.
+SNAPSHOT_DIR = os.environ.get("TIERFLOW_SNAPSHOT_DIR") if not (DATABASE_URL or EVENT_LOG_DIR) else None
+SNAPSHOT_INTERVAL = float(os.environ.get("TIERFLOW_SNAPSHOT_INTERVAL", "300"))
+
+# Set TIERFLOW_SEARCH_INDEX to a directory to persist the content search index;
+# startup then memory-maps the saved postings instead of re-tokenizing every video.
+# It defaults to the snapshot directory's search/ when there is one.
+SEARCH_INDEX_DIR = os.environ.get("TIERFLOW_SEARCH_INDEX") or (os.path.join(SNAPSHOT_DIR, "search") if SNAPSHOT_DIR else None)
+
+# (group, sort) orderings backing the cursor-paginated listing endpoints
+VIDEO_ORDERINGS = (("creator_id", "created_at"), ("creator_id", "ml_score"))
+SUBSCRIPTION_ORDERINGS = (("user_id", "subscribed_at"),)
+REVENUE_ORDERINGS = (("series", "bucket"),)
+
+state_snapshot = StateSnapshot(SNAPSHOT_DIR, SNAPSHOT_INTERVAL) if SNAPSHOT_DIR else None
+
+if DATABASE_URL:
+    from persistence import Database
+
+    database = Database(DATABASE_URL)
+
+def snapshot_table(name, seed=(), **kwargs):
+    # A table kept in the state snapshot under name, decoded on first use
+    return state_snapshot.store(name, lambda data: SnapshotTable.load(data, seed=seed, **kwargs),
+                                SnapshotTable.collect, SnapshotTable.encode)
+
+def derived(factory):
+    # With a state snapshot, built on first use so startup doesn't decode the stores behind it
+    return Lazy(factory) if state_snapshot is not None else factory()
+
+# Serialized bodies of hot read routes, invalidated per creator (or video) on writes.
+# Other workers sharing a database don't invalidate ours, so entries expire quickly there.
+response_cache = ResponseCache(ttl=1.0 if DATABASE_URL else None)
 
 # ML Model parameters for revenue calculation
 def calculate_ml_score(video_data: Dict[str, Any]) -> float:
@@ -98,4 +133,4 @@ def calculate_revenue_split(ml_score: float) -> float:
     elif ml_score >= 50:
         return 0.55  # Below average creators get 55%
     else:
-        return 0.50  # Minimum split for low quality
\ No newline at end of file
+        return 0.50  # Minimum split for low quality
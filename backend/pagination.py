@@ -0,0 +1,33 @@
+import base64
+import json
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+Row = Dict[str, Any]
+
+
+def encode_cursor(row: Row, sort_field: str, key: str = "id") -> str:
+    raw = json.dumps([row.get(sort_field), row[key]], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Any, Any]:
+    """Inverse of encode_cursor; raises ValueError for anything malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        value, pk = json.loads(raw)
+    except Exception as e:
+        raise ValueError("Invalid cursor") from e
+    return value, pk
+
+
+def paginate(rows: Iterable[Row], limit: int, sort_field: str,
+             predicate: Optional[Callable[[Row], bool]] = None) -> Tuple[List[Row], Optional[str]]:
+    """Take one page of rows that pass predicate; returns the page and the cursor for the next one."""
+    page: List[Row] = []
+    for row in rows:
+        if predicate is not None and not predicate(row):
+            continue
+        if len(page) == limit:
+            return page, encode_cursor(page[-1], sort_field)
+        page.append(row)
+    return page, None
@@ -0,0 +1,162 @@
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from store import Row, Table
+
+# Matches the RevenuePage model: each day's earnings get a 6% platform uplift
+# and are paid out in equal parts over the following WINDOW days.
+UPLIFT = 0.06
+WINDOW = 3
+EMA_ALPHA = 0.3
+HISTORY = 30  # settled payouts kept per creator for the API
+CHUNK_SIZE = 10_000  # creators per process-pool task
+
+# Per-creator ledger state, in cents so the rolling sum never drifts:
+# (recent daily earnings, sum of recent, EMA of daily earnings, settled days)
+State = Tuple[Tuple[int, ...], int, float, int]
+EMPTY_STATE: State = ((), 0, 0.0, 0)
+
+
+def advance(state: State, earned: int, window: int = WINDOW, alpha: float = EMA_ALPHA, uplift: float = UPLIFT):
+    """
+    Settle one day for one creator in O(1).
+    Returns (new state, rolling payout, EMA payout) with payouts in cents.
+    """
+    recent, window_sum, ema, days = state
+    # Today's rolling payout comes from the previous `window` days of earnings
+    rolling = (1 + uplift) * window_sum / window
+    recent = recent + (earned,)
+    window_sum += earned
+    if len(recent) > window:
+        window_sum -= recent[0]
+        recent = recent[1:]
+    ema = float(earned) if days == 0 else alpha * earned + (1 - alpha) * ema
+    return (recent, window_sum, ema, days + 1), rolling, (1 + uplift) * ema
+
+
+def _settle_chunk(items: List[Tuple[str, State, int]], window: int, alpha: float, uplift: float):
+    out = []
+    for creator_id, state, earned in items:
+        state, rolling, smoothed = advance(state, earned, window, alpha, uplift)
+        out.append((creator_id, state, rolling, smoothed))
+    return out
+
+
+class PayoutEngine:
+    """
+    Per-creator daily earnings ledger with rolling and exponentially smoothed payouts.
+    Earnings accumulate into the open day; settle_day closes it for every creator at once.
+    Each creator's open earnings, state and recent payouts are one row of
+    `creators` (keyed by creator_id), and the last settled day is a row of
+    `days`, so with shared or snapshotted tables the ledger outlives the
+    process and every worker sees the same one. Every change is a
+    read-modify-write of one row, so earnings recorded during a settlement
+    are kept for the next day.
+    """
+
+    def __init__(self, window: int = WINDOW, alpha: float = EMA_ALPHA, uplift: float = UPLIFT, workers: Optional[int] = None,
+                 creators: Optional[Table] = None, days: Optional[Table] = None):
+        self.window = window
+        self.alpha = alpha
+        self.uplift = uplift
+        self.workers = workers if workers is not None else int(os.environ.get("TIERFLOW_PAYOUT_WORKERS", "0"))
+        self.creators = creators if creators is not None else Table(key="creator_id")
+        self.days = days if days is not None else Table()
+        self._settle_lock = threading.Lock()
+
+    @property
+    def last_settled(self) -> Optional[date]:
+        row = self.days.get("last")
+        return date.fromisoformat(row["day"]) if row is not None and row.get("day") else None
+
+    def _change(self, creator_id: str, changes: Callable[[Row], Row]) -> None:
+        while self.creators.modify(creator_id, changes) is None:
+            # A creator's first earnings: create the row, then apply the change to it
+            self.creators.insert_new({"creator_id": creator_id, "open": 0, **_state_fields(EMPTY_STATE), "history": []})
+
+    def record(self, creator_id: str, amount: float) -> None:
+        cents = int(round(amount * 100))
+        self._change(creator_id, lambda row: {"open": row.get("open", 0) + cents})
+
+    def _claim(self, day: date) -> None:
+        # Atomic on the days table, so of two settlements of one day (on any worker) only one runs
+        def claim(row: Row) -> Row:
+            if row.get("day") and date.fromisoformat(row["day"]) >= day:
+                raise ValueError(f"{day.isoformat()} is already settled")
+            return {"day": day.isoformat()}
+
+        self.days.insert_new({"id": "last", "day": None})
+        self.days.modify("last", claim)
+
+    def settle_day(self, day: Optional[date] = None) -> Dict[str, Any]:
+        """Close the open day for every creator; uses a process pool for large batches when workers > 1."""
+        day = day or date.today()
+        # Check, run and update as one step within this process
+        with self._settle_lock:
+            self._claim(day)
+            items = [(row["creator_id"], _state(row), row.get("open", 0)) for row in self.creators]
+            total_rolling = 0.0
+            total_smoothed = 0.0
+            for (creator_id, _, earned), (_, state, rolling, smoothed) in zip(items, self._run(items)):
+                entry = (day.isoformat(), rolling, smoothed)
+                # Only the earnings this run settled leave the open day
+                self._change(creator_id, lambda row, state=state, earned=earned, entry=entry: {
+                    "open": row.get("open", 0) - earned,
+                    **_state_fields(state),
+                    "history": (row.get("history") or [])[-(HISTORY - 1):] + [list(entry)],
+                })
+                total_rolling += rolling
+                total_smoothed += smoothed
+        return {
+            "day": day.isoformat(),
+            "creators": len(items),
+            "total_rolling_payout": round(total_rolling / 100, 2),
+            "total_smoothed_payout": round(total_smoothed / 100, 2),
+        }
+
+    def _run(self, items: List[Tuple[str, State, int]]) -> Iterable[Tuple[str, State, float, float]]:
+        params = (self.window, self.alpha, self.uplift)
+        if self.workers <= 1 or len(items) <= CHUNK_SIZE:
+            yield from _settle_chunk(items, *params)
+            return
+        chunks = [items[i:i + CHUNK_SIZE] for i in range(0, len(items), CHUNK_SIZE)]
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            futures = [pool.submit(_settle_chunk, chunk, *params) for chunk in chunks]
+            for future in futures:
+                yield from future.result()
+
+    def summary(self, creator_id: str) -> Dict[str, Any]:
+        row = self.creators.get(creator_id) or {}
+        history = row.get("history") or []
+        recent = _state(row)[0]
+        rolling = [round(r / 100, 2) for _, r, _ in history]
+        return {
+            "smoothed_payouts": rolling,
+            "ema_payouts": [round(s / 100, 2) for _, _, s in history],
+            "days": [d for d, _, _ in history],
+            "recent_daily_earnings": [round(e / 100, 2) for e in recent],
+            "pending_earnings": round(row.get("open", 0) / 100, 2),
+            "insights": _insights(rolling),
+        }
+
+
+def _state(row: Row) -> State:
+    return tuple(row.get("recent") or ()), row.get("window_sum", 0), row.get("ema", 0.0), row.get("days", 0)
+
+
+def _state_fields(state: State) -> Row:
+    recent, window_sum, ema, days = state
+    return {"recent": list(recent), "window_sum": window_sum, "ema": ema, "days": days}
+
+
+def _insights(payouts: List[float]) -> str:
+    if len(payouts) < 2:
+        return "Not enough settled days yet to show a trend."
+    if payouts[-1] > payouts[-2]:
+        return "Payouts are increasing day over day."
+    if payouts[-1] < payouts[-2]:
+        return "Payouts are decreasing day over day."
+    return "Payouts are stable."
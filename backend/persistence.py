@@ -0,0 +1,349 @@
+import json
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from store import Row, SCAN_BATCH
+
+# The columns a router filters or aggregates by are real, indexed columns; the
+# full record is kept as JSON so the dict-shaped API responses round-trip
+# unchanged. That layout doesn't fit the supabase/migrations tables of the same
+# names (UUID ids, no record column), so these live beside them under a prefix.
+TABLE_PREFIX = "tierflow_"
+SEQUENCES = TABLE_PREFIX + "id_sequences"
+# record field -> (column, type)
+SCHEMA: Dict[str, Dict[str, Tuple[str, str]]] = {
+    "tiers": {
+        "creator_id": ("creator_id", "TEXT"),
+        "name": ("name", "TEXT"),
+        "price": ("price", "REAL"),
+        "subscriberCount": ("subscriber_count", "INTEGER"),
+    },
+    "subscriptions": {
+        "user_id": ("user_id", "TEXT"),
+        "tier_id": ("tier_id", "TEXT"),
+        "status": ("status", "TEXT"),
+        "subscribed_at": ("subscribed_at", "TEXT"),
+    },
+    "purchases": {
+        "user_id": ("user_id", "TEXT"),
+        "purchase_id": ("purchase_id", "TEXT"),
+        "purchased_at": ("purchased_at", "TEXT"),
+    },
+    "content": {
+        "creator_id": ("creator_id", "TEXT"),
+        "title": ("title", "TEXT"),
+        "minTier": ("min_tier_id", "TEXT"),
+        "created_at": ("created_at", "TEXT"),
+        "ml_score": ("ml_score", "REAL"),
+    },
+    "one_time_purchases": {
+        "creator_id": ("creator_id", "TEXT"),
+        "name": ("name", "TEXT"),
+        "price": ("price", "REAL"),
+        "purchaseCount": ("purchase_count", "INTEGER"),
+    },
+    "profiles": {
+        "status": ("kyc_status", "TEXT"),
+    },
+    "revenue_rollups": {
+        "series": ("series", "TEXT"),
+        "bucket": ("bucket_start", "BIGINT"),
+    },
+}
+
+
+class SQLiteDialect:
+    param = "?"
+    serial = "INTEGER PRIMARY KEY AUTOINCREMENT"
+    types = {"TEXT": "TEXT", "REAL": "REAL", "INTEGER": "INTEGER", "BIGINT": "INTEGER"}
+    lock_suffix = ""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def connect(self):
+        # Autocommit mode so transactions are opened explicitly with BEGIN IMMEDIATE;
+        # statements are prepared once and reused from the per-connection cache.
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, cached_statements=256)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        return conn
+
+    def begin(self, conn) -> None:
+        # Takes the database write lock up front so read-modify-write is atomic
+        # across every worker process sharing the file
+        conn.execute("BEGIN IMMEDIATE")
+
+    def commit(self, conn) -> None:
+        if conn.in_transaction:
+            conn.execute("COMMIT")
+
+    def rollback(self, conn) -> None:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+
+
+class PostgresDialect:
+    param = "%s"
+    serial = "BIGSERIAL PRIMARY KEY"
+    types = {"TEXT": "TEXT", "REAL": "DOUBLE PRECISION", "INTEGER": "INTEGER", "BIGINT": "BIGINT"}
+    lock_suffix = " FOR UPDATE"
+
+    def __init__(self, url: str):
+        self.url = url
+
+    def connect(self):
+        try:
+            import psycopg
+        except ImportError as e:
+            raise RuntimeError("psycopg is required for postgresql:// database URLs") from e
+        # Server-side prepared statements after the first execution of each query
+        return psycopg.connect(self.url, prepare_threshold=0)
+
+    def begin(self, conn) -> None:
+        pass  # psycopg opens a transaction implicitly
+
+    def commit(self, conn) -> None:
+        conn.commit()
+
+    def rollback(self, conn) -> None:
+        conn.rollback()
+
+
+class ConnectionPool:
+    """Bounded pool; connections are created lazily and reused LIFO."""
+
+    def __init__(self, dialect, size: int = 8):
+        self.dialect = dialect
+        self._idle: "queue.LifoQueue" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    @contextmanager
+    def transaction(self, write: bool = True):
+        self._slots.acquire()
+        try:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self.dialect.connect()
+            try:
+                if write:
+                    self.dialect.begin(conn)
+                cur = conn.cursor()
+                yield cur
+                self.dialect.commit(conn)
+            except BaseException:
+                self.dialect.rollback(conn)
+                raise
+            finally:
+                self._idle.put(conn)
+        finally:
+            self._slots.release()
+
+
+class Database:
+    """
+    Durable storage shared by every uvicorn worker.
+    Accepts sqlite:///path/to/file.db (local stand-in) or postgresql://...
+    """
+
+    def __init__(self, url: str, pool_size: int = 8):
+        if url.startswith("sqlite:///"):
+            self.dialect = SQLiteDialect(url[len("sqlite:///"):])
+        elif url.startswith(("postgresql://", "postgres://")):
+            self.dialect = PostgresDialect(url)
+        else:
+            raise ValueError(f"Unsupported database URL: {url}")
+        self.pool = ConnectionPool(self.dialect, pool_size)
+        with self.pool.transaction() as cur:
+            # Last number handed out per key prefix, shared by every worker
+            cur.execute(f"CREATE TABLE IF NOT EXISTS {SEQUENCES} (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+
+    def table(self, name: str, key: str = "id", indexes: Iterable[str] = (), seed: Iterable[Row] = (),
+              ordered: Iterable[Tuple[str, str]] = ()) -> "SQLTable":
+        table = SQLTable(self, name, key, indexes, ordered)
+        table.create(seed)
+        return table
+
+
+class SQLTable:
+    """SQL-backed table exposing the same interface as store.Table."""
+
+    def __init__(self, db: Database, name: str, key: str, indexes: Iterable[str], ordered: Iterable[Tuple[str, str]] = ()):
+        self.db = db
+        self.name = name
+        self.table = TABLE_PREFIX + name
+        self.key = key
+        self.fields = SCHEMA.get(name, {})
+        self.indexes = tuple(indexes)
+        self.ordered = tuple(ordered)
+        for field in self.indexes + tuple(f for spec in self.ordered for f in spec):
+            if field not in self.fields:
+                raise ValueError(f"{name}.{field} is not a column")
+        p = db.dialect.param
+        cols = ", ".join(col for col, _ in self.fields.values())
+        marks = ", ".join(p for _ in range(len(self.fields) + 2))
+        sets = ", ".join(f"{col} = {p}" for col, _ in self.fields.values())
+        self._sql_get = f"SELECT data FROM {self.table} WHERE id = {p}"
+        self._sql_get_locked = self._sql_get + db.dialect.lock_suffix
+        self._sql_insert = f"INSERT INTO {self.table} (id, data{', ' + cols if cols else ''}) VALUES ({marks})"
+        self._sql_insert_new = self._sql_insert + " ON CONFLICT (id) DO NOTHING"
+        self._sql_update = f"UPDATE {self.table} SET data = {p}{', ' + sets if sets else ''} WHERE id = {p}"
+        self._sql_delete = f"DELETE FROM {self.table} WHERE id = {p}"
+
+    def create(self, seed: Iterable[Row] = ()) -> None:
+        d = self.db.dialect
+        cols = "".join(f", {col} {d.types[typ]}" for col, typ in self.fields.values())
+        with self.db.pool.transaction() as cur:
+            cur.execute(f"CREATE TABLE IF NOT EXISTS {self.table} (seq {d.serial}, id TEXT NOT NULL UNIQUE, data TEXT NOT NULL{cols})")
+            for field in self.indexes:
+                col = self.fields[field][0]
+                cur.execute(f"CREATE INDEX IF NOT EXISTS idx_{self.table}_{col} ON {self.table} ({col}, seq)")
+            for group_field, sort_field in self.ordered:
+                group, order = self.fields[group_field][0], self.fields[sort_field][0]
+                cur.execute(f"CREATE INDEX IF NOT EXISTS idx_{self.table}_{group}_{order} ON {self.table} ({group}, {order}, id)")
+            cur.execute(f"SELECT COUNT(*) FROM {self.table}")
+            if cur.fetchone()[0] == 0:
+                for row in seed:
+                    cur.execute(self._sql_insert, self._params(row))
+
+    def _params(self, row: Row) -> List[Any]:
+        return [row[self.key], json.dumps(row)] + [row.get(f) for f in self.fields]
+
+    def _fetch(self, sql: str, params: Iterable[Any] = ()) -> List[Row]:
+        with self.db.pool.transaction(write=False) as cur:
+            cur.execute(sql, tuple(params))
+            return [json.loads(r[0]) for r in cur.fetchall()]
+
+    def __len__(self) -> int:
+        with self.db.pool.transaction(write=False) as cur:
+            cur.execute(f"SELECT COUNT(*) FROM {self.table}")
+            return cur.fetchone()[0]
+
+    def __iter__(self) -> Iterator[Row]:
+        return iter(self._fetch(f"SELECT data FROM {self.table} ORDER BY seq"))
+
+    def __contains__(self, pk: Any) -> bool:
+        return self.get(pk) is not None
+
+    def get(self, pk: Any) -> Optional[Row]:
+        rows = self._fetch(self._sql_get, (pk,))
+        return rows[0] if rows else None
+
+    def find(self, field: str, value: Any) -> List[Row]:
+        col = self.fields[field][0]
+        return self._fetch(f"SELECT data FROM {self.table} WHERE {col} = {self.db.dialect.param} ORDER BY seq", (value,))
+
+    def count(self, field: str, value: Any) -> int:
+        col = self.fields[field][0]
+        with self.db.pool.transaction(write=False) as cur:
+            cur.execute(f"SELECT COUNT(*) FROM {self.table} WHERE {col} = {self.db.dialect.param}", (value,))
+            return cur.fetchone()[0]
+
+    def scan(self, group_field: str, group_value: Any, sort_field: str, after: Optional[Tuple[Any, Any]] = None,
+             descending: bool = False, low: Any = None, high: Any = None) -> Iterator[Row]:
+        """Keyset scan over the (group, sort, id) index; same contract as store.Table.scan."""
+        p = self.db.dialect.param
+        group, order = self.fields[group_field][0], self.fields[sort_field][0]
+        where = [f"{group} = {p}", f"{order} IS NOT NULL"]
+        params: List[Any] = [group_value]
+        if low is not None:
+            where.append(f"{order} >= {p}")
+            params.append(low)
+        if high is not None:
+            where.append(f"{order} <= {p}")
+            params.append(high)
+        op, direction = ("<", "DESC") if descending else (">", "ASC")
+        while True:
+            clause, args = list(where), list(params)
+            if after is not None:
+                clause.append(f"({order} {op} {p} OR ({order} = {p} AND id {op} {p}))")
+                args += [after[0], after[0], after[1]]
+            sql = (f"SELECT data, {order}, id FROM {self.table} WHERE {' AND '.join(clause)} "
+                   f"ORDER BY {order} {direction}, id {direction} LIMIT {SCAN_BATCH}")
+            with self.db.pool.transaction(write=False) as cur:
+                cur.execute(sql, tuple(args))
+                batch = cur.fetchall()
+            for data, _, _ in batch:
+                yield json.loads(data)
+            if len(batch) < SCAN_BATCH:
+                return
+            after = (batch[-1][1], batch[-1][2])
+
+    def insert(self, row: Row) -> Row:
+        with self.db.pool.transaction() as cur:
+            cur.execute(self._sql_insert, self._params(row))
+        return row
+
+    def _modify(self, pk: Any, apply) -> Optional[Row]:
+        # Row is read under the write lock so concurrent workers never lose updates
+        with self.db.pool.transaction() as cur:
+            cur.execute(self._sql_get_locked, (pk,))
+            found = cur.fetchone()
+            if found is None:
+                return None
+            row = json.loads(found[0])
+            apply(row)
+            params = self._params(row)
+            cur.execute(self._sql_update, params[1:] + [pk])
+            return row
+
+    def update(self, pk: Any, changes: Row) -> Optional[Row]:
+        changes = {k: v for k, v in changes.items() if k != self.key}
+        return self._modify(pk, lambda row: row.update(changes))
+
+    def modify(self, pk: Any, changes: Callable[[Row], Row]) -> Optional[Row]:
+        return self._modify(pk, lambda row: row.update({k: v for k, v in changes(row).items() if k != self.key}))
+
+    def insert_new(self, row: Row) -> bool:
+        with self.db.pool.transaction() as cur:
+            cur.execute(self._sql_insert_new, self._params(row))
+            return bool(cur.rowcount)
+
+    def upsert(self, row: Row) -> Row:
+        while True:
+            updated = self.update(row[self.key], row)
+            if updated is not None:
+                return updated
+            if self.insert_new(row):
+                return row
+            # Another worker inserted the key first; update its row instead
+
+    def next_id(self, prefix: str) -> str:
+        """Allocate the next key of the form prefix<n> from a sequence shared by every worker."""
+        p = self.db.dialect.param
+        name = f"{self.name}:{prefix}"
+        select = f"SELECT value FROM {SEQUENCES} WHERE name = {p}{self.db.dialect.lock_suffix}"
+        with self.db.pool.transaction() as cur:
+            cur.execute(select, (name,))
+            found = cur.fetchone()
+            if found is None:
+                # First use: continue after the highest existing key
+                cur.execute(f"SELECT id FROM {self.table}")
+                last = max((int(pk[len(prefix):]) for (pk,) in cur.fetchall()
+                            if pk.startswith(prefix) and pk[len(prefix):].isdigit()), default=0)
+                cur.execute(f"INSERT INTO {SEQUENCES} (name, value) VALUES ({p}, {p}) ON CONFLICT (name) DO NOTHING",
+                            (name, last))
+                cur.execute(select, (name,))
+                found = cur.fetchone()
+            value = found[0] + 1
+            cur.execute(f"UPDATE {SEQUENCES} SET value = {p} WHERE name = {p}", (value, name))
+        return f"{prefix}{value}"
+
+    def increment(self, pk: Any, field: str, by: int = 1) -> Optional[Row]:
+        def bump(row: Row) -> None:
+            row[field] = (row.get(field, 0) or 0) + by
+        return self._modify(pk, bump)
+
+    def delete(self, pk: Any) -> Optional[Row]:
+        with self.db.pool.transaction() as cur:
+            cur.execute(self._sql_get_locked, (pk,))
+            found = cur.fetchone()
+            if found is None:
+                return None
+            cur.execute(self._sql_delete, (pk,))
+            return json.loads(found[0])
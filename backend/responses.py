@@ -0,0 +1,96 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Mapping
+from typing import Any, Callable, Dict, Hashable, Optional
+
+import orjson
+from fastapi import Response
+from fastapi.responses import ORJSONResponse
+
+_ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def _default(obj: Any) -> Any:
+    # Row views from the columnar video catalog serialize as their current row
+    if isinstance(obj, Mapping):
+        return obj.to_dict() if hasattr(obj, "to_dict") else dict(obj)
+    raise TypeError
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=_default, option=_ORJSON_OPTIONS)
+
+
+class FastJSONResponse(ORJSONResponse):
+    """
+    orjson-encoded JSON. Returned straight from a route it also skips
+    FastAPI's jsonable_encoder pass, which dominates for long lists; rows
+    hold plain JSON types, so there is nothing to convert first.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+class ResponseCache:
+    """
+    Pre-serialized JSON bodies for hot read routes.
+    Each entry records the version of its scope (a creator, a video) at the
+    time it was built; writes bump the version, so a stale entry is never
+    served and simply ages out of the LRU. A hit skips both the query and
+    serialization, and a request whose If-None-Match carries the current
+    strong ETag gets a bodiless 304.
+    """
+
+    def __init__(self, max_entries: int = 10_000, ttl: Optional[float] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl  # bounds staleness when other processes write the same data
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._versions: Dict[Hashable, int] = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def invalidate(self, scope: Hashable) -> None:
+        with self._lock:
+            self._versions[scope] = self._versions.get(scope, 0) + 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def respond(self, scope: Hashable, key: Hashable, compute: Callable[[], Any],
+                if_none_match: Optional[str] = None) -> Response:
+        body, etag = self._lookup(scope, key, compute)
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if if_none_match and _matches(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type=FastJSONResponse.media_type, headers=headers)
+
+    def _lookup(self, scope: Hashable, key: Hashable, compute: Callable[[], Any]):
+        with self._lock:
+            # Read the version before computing: a write landing meanwhile bumps
+            # it, so whatever we build here is already marked stale
+            version = (self._generation, self._versions.get(scope, 0))
+            entry = self._entries.get((scope, key))
+            if entry is not None and entry[0] == version and (entry[1] is None or entry[1] > time.monotonic()):
+                self._entries.move_to_end((scope, key))
+                return entry[2], entry[3]
+        body = dumps(compute())
+        etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+        expires = None if self.ttl is None else time.monotonic() + self.ttl
+        with self._lock:
+            self._entries[(scope, key)] = (version, expires, body, etag)
+            self._entries.move_to_end((scope, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return body, etag
+
+
+def _matches(if_none_match: str, etag: str) -> bool:
+    # If-None-Match uses weak comparison and may list several tags
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
@@ -0,0 +1,352 @@
+import glob
+import math
+import os
+import re
+import shutil
+import threading
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from store import Row
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+# Field weights: a word in a tag or the title counts as that many in the description
+TITLE_WEIGHT = 2.0
+TAG_WEIGHT = 3.0
+# Fold in-memory postings into the packed arrays once they grow past this share of them
+COMPACT_RATIO = 0.125
+COMPACT_MIN_POSTINGS = 50_000
+SAVE_EVERY = 10_000  # uploads between background saves when persisted
+VERSIONS_KEPT = 2
+
+_TOKEN = re.compile(r"\w+")
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return _TOKEN.findall((text or "").lower())
+
+
+def tag_terms(tags: Optional[str]) -> List[str]:
+    """Normalized tags as exact-match terms ("#travel"), kept apart from words."""
+    return ["#" + " ".join(t.split()).lower() for t in (tags or "").split(",") if t.strip()]
+
+
+def _terms(video: Row) -> Dict[str, float]:
+    weights: Dict[str, float] = {}
+    for field, weight in (("title", TITLE_WEIGHT), ("description", 1.0), ("tags", TAG_WEIGHT)):
+        for token in tokenize(video.get(field)):
+            weights[token] = weights.get(token, 0.0) + weight
+    for tag in tag_terms(video.get("tags")):
+        weights[tag] = 1.0
+    return weights
+
+
+class SearchIndex:
+    """
+    Inverted index over video titles, descriptions and tags with BM25 ranking.
+    Postings live in packed numpy arrays (term -> slice of doc ordinals and
+    weighted term frequencies), which are memory-mapped straight from disk
+    when the index is persisted; uploads go to small in-memory postings that
+    are folded into the packed arrays once they grow. A query scores every
+    matching posting in one vectorized pass, then yields results best first
+    so the caller can filter (tier access, creator) until the page is full.
+    """
+
+    def __init__(self, directory: Optional[str] = None, save_every: int = SAVE_EVERY):
+        self.directory = directory
+        self.save_every = save_every
+        self._lock = threading.RLock()
+        self._save_lock = threading.Lock()
+        self._ids: List[str] = []  # ordinal -> video id
+        self._ordinals: Dict[str, int] = {}
+        self._doc_len = np.zeros(1024, dtype=np.float32)
+        self._quality = np.zeros(1024, dtype=np.float32)  # ml_score, for the optional boost
+        self._alive = np.zeros(1024, dtype=bool)
+        self._live = 0
+        self._total_len = 0.0
+        # Packed postings
+        self._terms: Dict[str, int] = {}
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._docs = np.zeros(0, dtype=np.int32)
+        self._tfs = np.zeros(0, dtype=np.float32)
+        # Postings added since the last compaction
+        self._delta: Dict[str, Tuple[List[int], List[float]]] = {}
+        self._delta_size = 0
+        self._since_save = 0
+
+    # --- building ---
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Row], directory: Optional[str] = None) -> "SearchIndex":
+        index = cls(directory)
+        index.add_many(rows)
+        return index
+
+    @classmethod
+    def open(cls, directory: str, rows: Iterable[Row]) -> "SearchIndex":
+        """Load the newest saved index, then reconcile it with the current videos."""
+        index = cls(directory)
+        index._load()
+        if hasattr(rows, "columns"):
+            # Columnar catalog: read ids and scores as arrays and copy out only the videos new to the index
+            keys, columns = rows.columns({"ml_score": 0})
+            scores = zip(keys, columns["ml_score"].tolist())
+            fetch = rows.get
+        else:
+            rows = {row["id"]: row for row in rows}
+            scores = ((video_id, row.get("ml_score")) for video_id, row in rows.items())
+            fetch = rows.get
+        seen = set()
+        missing = []
+        for video_id, score in scores:
+            seen.add(video_id)
+            ordinal = index._ordinals.get(video_id)
+            if ordinal is None:
+                missing.append(fetch(video_id))
+            else:
+                index._quality[ordinal] = score or 0
+        with index._lock:
+            for video_id in [v for v in index._ordinals if v not in seen]:
+                index._drop(video_id)
+        index.add_many(missing)
+        return index
+
+    def add(self, video: Row) -> None:
+        self.add_many((video,))
+
+    def add_many(self, videos: Iterable[Row]) -> None:
+        added = 0
+        with self._lock:
+            for video in videos:
+                self._drop(video["id"])  # re-indexing replaces the old entry
+                ordinal = len(self._ids)
+                self._ids.append(video["id"])
+                self._ordinals[video["id"]] = ordinal
+                self._reserve(ordinal + 1)
+                terms = _terms(video)
+                length = sum(w for t, w in terms.items() if not t.startswith("#"))
+                self._doc_len[ordinal] = length
+                self._quality[ordinal] = video.get("ml_score") or 0
+                self._alive[ordinal] = True
+                self._live += 1
+                self._total_len += length
+                for term, weight in terms.items():
+                    docs, tfs = self._delta.setdefault(term, ([], []))
+                    docs.append(ordinal)
+                    tfs.append(weight)
+                self._delta_size += len(terms)
+                added += 1
+            if self._delta_size > max(COMPACT_MIN_POSTINGS, COMPACT_RATIO * len(self._docs)):
+                self._compact()
+            self._since_save += added
+            save = self.directory is not None and self._since_save >= self.save_every
+        if save:
+            self.save_in_background()
+
+    def remove(self, video_id: str) -> None:
+        with self._lock:
+            self._drop(video_id)
+
+    def _drop(self, video_id: str) -> None:
+        # Postings stay until the next compaction; queries mask dead ordinals out
+        ordinal = self._ordinals.pop(video_id, None)
+        if ordinal is not None and self._alive[ordinal]:
+            self._alive[ordinal] = False
+            self._live -= 1
+            self._total_len -= float(self._doc_len[ordinal])
+
+    def set_quality(self, video_id: str, ml_score: Optional[float]) -> None:
+        # Under the lock: written between _reserve's copy and swap, the score would be lost
+        with self._lock:
+            ordinal = self._ordinals.get(video_id)
+            if ordinal is not None:
+                self._quality[ordinal] = ml_score or 0
+
+    def _reserve(self, n: int) -> None:
+        # Grow by reallocating, never in place, so arrays a query holds stay valid
+        if n <= len(self._doc_len):
+            return
+        size = max(n, 2 * len(self._doc_len))
+        for name in ("_doc_len", "_quality", "_alive"):
+            old = getattr(self, name)
+            new = np.zeros(size, dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def _compact(self) -> None:
+        """Fold the in-memory postings (and drop dead ones) into fresh packed arrays."""
+        alive = self._alive
+        terms, docs_parts, tfs_parts, counts = {}, [], [], []
+        for term in set(self._terms) | set(self._delta):
+            docs, tfs = self._postings(term)
+            keep = alive[docs]
+            if not keep.all():
+                docs, tfs = docs[keep], tfs[keep]
+            if len(docs):
+                terms[term] = len(counts)
+                docs_parts.append(docs)
+                tfs_parts.append(tfs)
+                counts.append(len(docs))
+        offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        self._docs = np.concatenate(docs_parts).astype(np.int32, copy=False) if docs_parts else np.zeros(0, np.int32)
+        self._tfs = np.concatenate(tfs_parts).astype(np.float32, copy=False) if tfs_parts else np.zeros(0, np.float32)
+        self._offsets = offsets
+        self._terms = terms
+        self._delta = {}
+        self._delta_size = 0
+
+    def _postings(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        i = self._terms.get(term)
+        delta = self._delta.get(term)
+        if i is None and delta is None:
+            return np.zeros(0, np.int32), np.zeros(0, np.float32)
+        if i is not None:
+            start, end = self._offsets[i], self._offsets[i + 1]
+            docs, tfs = self._docs[start:end], self._tfs[start:end]
+            if delta is None:
+                return docs, tfs
+            return np.concatenate((docs, np.array(delta[0], np.int32))), \
+                np.concatenate((tfs, np.array(delta[1], np.float32)))
+        return np.array(delta[0], np.int32), np.array(delta[1], np.float32)
+
+    # --- querying ---
+
+    def search(self, query: str, tags: Iterable[str] = (), boost: float = 0.0) -> Iterator[Tuple[str, float]]:
+        """
+        Yield (video_id, score) best first. Every tag must match; with no query
+        words, tagged videos are ranked by ml_score. boost scales scores by
+        up to (1 + boost) for an ml_score of 100.
+        """
+        words = list(dict.fromkeys(tokenize(query)))
+        required = [t for tag in tags for t in tag_terms(tag)]
+        with self._lock:
+            n = len(self._ids)
+            if n == 0 or (not words and not required):
+                return
+            ids = self._ids
+            mask = self._alive[:n].copy()
+            for tag in required:
+                docs, _ = self._postings(tag)
+                hit = np.zeros(n, dtype=bool)
+                hit[docs] = True
+                mask &= hit
+            if words:
+                avgdl = self._total_len / max(1, self._live)
+                docs_parts, weight_parts = [], []
+                alive = self._alive
+                for word in words:
+                    docs, tfs = self._postings(word)
+                    # Dropped and re-indexed videos keep postings until compaction; don't count them
+                    live = alive[docs]
+                    if not live.all():
+                        docs, tfs = docs[live], tfs[live]
+                    if not len(docs):
+                        continue
+                    df = len(docs)
+                    idf = math.log(1 + (self._live - df + 0.5) / (df + 0.5))
+                    norm = K1 * (1 - B + B * self._doc_len[docs] / avgdl)
+                    docs_parts.append(docs)
+                    weight_parts.append(idf * tfs * (K1 + 1) / (tfs + norm))
+                if not docs_parts:
+                    return
+                scores = np.bincount(np.concatenate(docs_parts), weights=np.concatenate(weight_parts), minlength=n)
+                mask &= scores > 0
+                candidates = np.flatnonzero(mask)
+                scores = scores[candidates]
+                if boost:
+                    scores = scores * (1 + boost * self._quality[candidates] / 100)
+            else:
+                candidates = np.flatnonzero(mask)
+                scores = self._quality[candidates].astype(np.float64)
+        # Rank lazily: sort only as many as the caller consumes, widening as needed
+        shown = 0
+        k = 64
+        while shown < len(candidates):
+            k = min(k, len(candidates))
+            top = np.argpartition(-scores, k - 1)[:k] if k < len(candidates) else np.arange(len(candidates))
+            top = top[np.argsort(-scores[top], kind="stable")]
+            for i in top[shown:]:
+                yield ids[candidates[i]], float(scores[i])
+            shown = k
+            k *= 4
+
+    def __len__(self) -> int:
+        return self._live
+
+    # --- persistence ---
+
+    def save(self) -> Optional[str]:
+        """Compact and write the index as a new version directory; returns its path."""
+        if self.directory is None:
+            return None
+        with self._save_lock:
+            with self._lock:
+                self._compact()
+                n = len(self._ids)
+                arrays = {"offsets": self._offsets, "docs": self._docs, "tfs": self._tfs,
+                          "doc_len": self._doc_len[:n].copy(), "quality": self._quality[:n].copy(),
+                          "alive": self._alive[:n].copy()}
+                ids = list(self._ids)
+                terms = sorted(self._terms, key=self._terms.get)
+                self._since_save = 0
+            # Packed arrays are replaced, never modified, so they're written outside the lock
+            os.makedirs(self.directory, exist_ok=True)
+            version = max([_version(p) for p in self._versions()] + [0]) + 1
+            path = os.path.join(self.directory, f"index-{version:08d}")
+            tmp = f"{path}.{os.getpid()}.tmp"
+            shutil.rmtree(tmp, ignore_errors=True)
+            os.makedirs(tmp)
+            for name, array in arrays.items():
+                np.save(os.path.join(tmp, name + ".npy"), array)
+            with open(os.path.join(tmp, "ids.txt"), "w", encoding="utf-8") as f:
+                f.write("\n".join(ids))
+            with open(os.path.join(tmp, "terms.txt"), "w", encoding="utf-8") as f:
+                f.write("\n".join(terms))
+            try:
+                os.replace(tmp, path)
+            except OSError:
+                # Another worker sharing the directory saved this version first
+                shutil.rmtree(tmp, ignore_errors=True)
+                return None
+            for old in self._versions()[:-VERSIONS_KEPT]:
+                shutil.rmtree(old, ignore_errors=True)
+            return path
+
+    def save_in_background(self) -> None:
+        if not self._save_lock.locked():
+            threading.Thread(target=self.save, daemon=True, name="search-index-save").start()
+
+    def _versions(self) -> List[str]:
+        return sorted(p for p in glob.glob(os.path.join(self.directory, "index-*")) if not p.endswith(".tmp"))
+
+    def _load(self) -> None:
+        versions = self._versions() if os.path.isdir(self.directory) else []
+        if not versions:
+            return
+        path = versions[-1]
+        # Postings are memory-mapped: pages load on first touch, not at startup
+        self._offsets = np.load(os.path.join(path, "offsets.npy"), mmap_mode="r")
+        self._docs = np.load(os.path.join(path, "docs.npy"), mmap_mode="r")
+        self._tfs = np.load(os.path.join(path, "tfs.npy"), mmap_mode="r")
+        with open(os.path.join(path, "terms.txt"), encoding="utf-8") as f:
+            text = f.read()
+        self._terms = {term: i for i, term in enumerate(text.split("\n"))} if text else {}
+        with open(os.path.join(path, "ids.txt"), encoding="utf-8") as f:
+            text = f.read()
+        self._ids = text.split("\n") if text else []
+        n = len(self._ids)
+        self._reserve(n)
+        self._doc_len[:n] = np.load(os.path.join(path, "doc_len.npy"))
+        self._quality[:n] = np.load(os.path.join(path, "quality.npy"))
+        self._alive[:n] = np.load(os.path.join(path, "alive.npy"))
+        self._ordinals = {video_id: i for i, video_id in enumerate(self._ids) if self._alive[i]}
+        self._live = int(self._alive[:n].sum())
+        self._total_len = float(self._doc_len[:n][self._alive[:n]].sum())
+
+
+def _version(path: str) -> int:
+    return int(os.path.basename(path).split("-")[1])
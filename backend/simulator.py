@@ -0,0 +1,177 @@
+from typing import Any, Dict, Iterable, List, Mapping, Tuple
+
+import numpy as np
+
+from batch_scoring import ENGAGEMENT_COLUMNS, FLAG_COLUMNS, SPLIT_STEPS, columns_from_videos, score_and_split
+from payout import UPLIFT, WINDOW
+from store import Row
+
+MAX_SCENARIOS = 32
+MAX_MONTHS = 36
+PERCENTILES = (10, 25, 50, 75, 90)
+SPLIT_LEVELS = SPLIT_STEPS[1]
+
+
+def _cents(value: Any) -> int:
+    return round(float(value) * 100)
+
+
+def _scenario_columns(columns: Dict[str, np.ndarray], positions: Dict[Any, int],
+                      scenarios: List[Mapping[str, Any]]) -> Dict[str, np.ndarray]:
+    """
+    Stack the catalog's scorer columns once per row: row 0 is the catalog as it
+    is, row s + 1 has scenario s's flag changes applied.
+    """
+    rows = len(scenarios) + 1
+    stacked = {name: np.broadcast_to(columns[name], (rows, len(columns[name]))) for name in ENGAGEMENT_COLUMNS}
+    for name in FLAG_COLUMNS:
+        stacked[name] = np.tile(columns[name], (rows, 1))
+    for s, scenario in enumerate(scenarios, 1):
+        for name, value in (scenario.get("all_videos") or {}).items():
+            stacked[name][s, :] = value
+        for video_id, changes in (scenario.get("videos") or {}).items():
+            i = positions[video_id]
+            for name, value in changes.items():
+                stacked[name][s, i] = value
+    return stacked
+
+
+def _membership_revenue(tiers: List[Row], scenarios: List[Mapping[str, Any]]) -> np.ndarray:
+    """Monthly tier revenue in cents, baseline first, from tier price and subscriber changes."""
+    by_id = {t.get("id"): i for i, t in enumerate(tiers)}
+    prices = np.array([[_cents(t.get("price") or 0) for t in tiers]] * (len(scenarios) + 1), dtype=np.float64)
+    subscribers = np.array([[t.get("subscriberCount", 0) or 0 for t in tiers]] * (len(scenarios) + 1), dtype=np.float64)
+    for s, scenario in enumerate(scenarios, 1):
+        for tier_id, change in (scenario.get("tiers") or {}).items():
+            i = by_id[tier_id]
+            if change.get("price") is not None:
+                prices[s, i] = _cents(change["price"])
+            subscribers[s, i] += change.get("subscriber_delta", 0)
+    return (prices * np.maximum(subscribers, 0)).sum(axis=1)
+
+
+def smooth(earnings: np.ndarray, baseline: np.ndarray, window: int = WINDOW, uplift: float = UPLIFT) -> np.ndarray:
+    """
+    Vectorized payout smoothing over (scenarios, months) earnings: each month's
+    earnings are paid out, with the uplift, in equal parts over the next `window`
+    months, and every month before the first ran at the scenario's baseline.
+    """
+    padded = np.concatenate([np.repeat(baseline[:, None], window, axis=1), earnings], axis=1)
+    totals = np.concatenate([np.zeros((len(padded), 1)), np.cumsum(padded, axis=1)], axis=1)
+    # Payout for month m: the `window` months ending just before it
+    months = np.arange(earnings.shape[1]) + window
+    return (1 + uplift) * (totals[:, months] - totals[:, months - window]) / window
+
+
+def simulate(videos: Iterable[Row], tiers: Iterable[Row], purchases: Iterable[Row],
+             scenarios: List[Mapping[str, Any]], months: int = 6,
+             window: int = WINDOW, uplift: float = UPLIFT) -> Dict[str, Any]:
+    """
+    Project a creator's monthly earnings under a batch of what-if scenarios in one
+    vectorized pass over the catalog. Monthly gross revenue (tier subscriptions)
+    is attributed to videos by watch time share, evenly when nothing has been
+    watched, and each video's share is paid at its revenue split. One-time
+    purchase counts are lifetime totals with no monthly rate behind them, so
+    their sales are reported to date next to the projection rather than in it.
+    Returns the baseline followed by each scenario.
+    """
+    videos, tiers = list(videos), list(tiers)
+    scenarios = validate(scenarios, {v.get("id") for v in videos}, {t.get("id") for t in tiers})
+    if not isinstance(months, int) or isinstance(months, bool) or not 1 <= months <= MAX_MONTHS:
+        raise ValueError(f"months must be between 1 and {MAX_MONTHS}")
+
+    positions = {v.get("id"): i for i, v in enumerate(videos)}
+    scores, splits = score_and_split(_scenario_columns(columns_from_videos(videos), positions, scenarios))
+    watch_time = np.array([max(v.get("watch_time", 0) or 0, 0) for v in videos], dtype=np.float64)
+    weights = watch_time / watch_time.sum() if watch_time.sum() > 0 else np.full(len(videos), 1 / max(len(videos), 1))
+
+    one_time = sum(_cents(p.get("price") or 0) * (p.get("purchaseCount", 0) or 0) for p in purchases)
+    gross = _membership_revenue(tiers, scenarios)
+    video_earnings = gross[:, None] * weights * splits
+    earned = video_earnings.sum(axis=1) if videos else gross * SPLIT_LEVELS[0]
+    monthly = np.repeat(earned[:, None], months, axis=1)
+    smoothed = smooth(monthly, earned[:1].repeat(len(earned)), window, uplift)
+
+    results = []
+    for s, name in enumerate(["baseline"] + [sc.get("name") or f"scenario {i}" for i, sc in enumerate(scenarios, 1)]):
+        results.append({
+            "name": name,
+            "gross_revenue": round(gross[s] / 100, 2),
+            "creator_earnings": round(earned[s] / 100, 2),
+            "effective_split": round(earned[s] / gross[s], 4) if gross[s] else 0.0,
+            "change": round((earned[s] - earned[0]) / 100, 2),
+            "videos_changed": int((splits[s] != splits[0]).sum()),
+            "score": _distribution(scores[s], 1),
+            "split_distribution": _split_counts(splits[s]),
+            "video_earnings": _distribution(video_earnings[s] / 100, 100),
+            "payouts": {
+                "immediate": [round(e / 100, 2) for e in monthly[s].tolist()],
+                "smoothed": [round(p / 100, 2) for p in smoothed[s].tolist()],
+                "total_immediate": round(monthly[s].sum() / 100, 2),
+                "total_smoothed": round(smoothed[s].sum() / 100, 2),
+            },
+        })
+    return {"videos": len(videos), "months": months, "window": window, "uplift": uplift,
+            "one_time_sales_to_date": round(one_time / 100, 2), "scenarios": results}
+
+
+def _distribution(values: np.ndarray, scale: int) -> Dict[str, Any]:
+    if not len(values):
+        return {"mean": 0.0, **{f"p{p}": 0.0 for p in PERCENTILES}}
+    points = np.percentile(values, PERCENTILES)
+    return {"mean": round(float(values.mean()) * scale) / scale,
+            **{f"p{p}": round(float(v) * scale) / scale for p, v in zip(PERCENTILES, points)}}
+
+
+def _split_counts(splits: np.ndarray) -> Dict[str, int]:
+    counts = np.bincount(np.searchsorted(SPLIT_LEVELS, splits), minlength=len(SPLIT_LEVELS))
+    return {f"{level:.2f}": int(n) for level, n in zip(SPLIT_LEVELS.tolist(), counts.tolist())}
+
+
+def validate(scenarios: Any, video_ids: set, tier_ids: set) -> List[Mapping[str, Any]]:
+    """Check a scenario batch against the creator's catalog; raises ValueError naming the first problem."""
+    if not isinstance(scenarios, list) or not scenarios:
+        raise ValueError("scenarios must be a non-empty list")
+    if len(scenarios) > MAX_SCENARIOS:
+        raise ValueError(f"at most {MAX_SCENARIOS} scenarios per request")
+    for i, scenario in enumerate(scenarios):
+        where = f"scenarios[{i}]"
+        if not isinstance(scenario, dict):
+            raise ValueError(f"{where} must be an object")
+        for tier_id, change in _mapping(scenario, "tiers", where):
+            if tier_id not in tier_ids:
+                raise ValueError(f"{where}: unknown tier {tier_id}")
+            if not isinstance(change, dict):
+                raise ValueError(f"{where}.tiers.{tier_id} must be an object")
+            price, delta = change.get("price"), change.get("subscriber_delta", 0)
+            if price is not None and (not _number(price) or price < 0):
+                raise ValueError(f"{where}.tiers.{tier_id}.price must be a non-negative number")
+            if not isinstance(delta, int) or isinstance(delta, bool):
+                raise ValueError(f"{where}.tiers.{tier_id}.subscriber_delta must be an integer")
+        _check_flags(scenario.get("all_videos") or {}, f"{where}.all_videos")
+        for video_id, changes in _mapping(scenario, "videos", where):
+            if video_id not in video_ids:
+                raise ValueError(f"{where}: unknown video {video_id}")
+            _check_flags(changes, f"{where}.videos.{video_id}")
+    return scenarios
+
+
+def _mapping(scenario: Mapping[str, Any], field: str, where: str) -> Iterable[Tuple[str, Any]]:
+    value = scenario.get(field) or {}
+    if not isinstance(value, dict):
+        raise ValueError(f"{where}.{field} must be an object")
+    return value.items()
+
+
+def _check_flags(changes: Any, where: str) -> None:
+    if not isinstance(changes, dict):
+        raise ValueError(f"{where} must be an object")
+    for name, value in changes.items():
+        if name not in FLAG_COLUMNS:
+            raise ValueError(f"{where}: {name} is not a quality flag ({', '.join(FLAG_COLUMNS)})")
+        if not isinstance(value, bool):
+            raise ValueError(f"{where}.{name} must be true or false")
+
+
+def _number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
@@ -0,0 +1,503 @@
+import logging
+import mmap
+import os
+import re
+import struct
+import threading
+from array import array
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import orjson
+
+from store import Row, Table
+
+MAGIC = b"TFSNAP"
+FORMAT_VERSION = 2
+SNAPSHOT_FILE = "state.snap"
+INTERVAL = 300.0  # seconds between periodic saves; 0 saves on shutdown only
+_HEADER = struct.Struct("<6sHQ")  # magic, format version, directory length
+_ALIGN = 8
+_META = struct.Struct("<Q")  # length of a section's JSON metadata, ahead of its buffers
+_NUMBERED = re.compile(r"(\D+)(\d+)")  # keys next_id() hands out: prefix<n>
+
+logger = logging.getLogger(__name__)
+
+
+class Lazy:
+    """
+    Stand-in for an object that is built on first use. Methods looked up
+    through it are cached on the stand-in, so after the first call they cost
+    a plain attribute read.
+    """
+
+    def __init__(self, factory: Callable[[], Any]):
+        self._factory = factory
+        self._target: Any = None
+        self._lock = threading.Lock()
+
+    def _resolve(self) -> Any:
+        target = self._target
+        if target is None:
+            with self._lock:
+                if self._target is None:
+                    self._target = self._factory()
+                target = self._target
+        return target
+
+    def __getattr__(self, name: str) -> Any:
+        value = getattr(self._resolve(), name)
+        if callable(value):
+            setattr(self, name, value)
+        return value
+
+    def __iter__(self):
+        return iter(self._resolve())
+
+    def __len__(self) -> int:
+        return len(self._resolve())
+
+    def __contains__(self, item: Any) -> bool:
+        return item in self._resolve()
+
+
+def loaded(obj: Any) -> bool:
+    """False only for a Lazy that hasn't been built yet."""
+    return not isinstance(obj, Lazy) or obj._target is not None
+
+
+def force(obj: Any) -> Any:
+    """Build a Lazy now; anything else is returned as it is."""
+    return obj._resolve() if isinstance(obj, Lazy) else obj
+
+
+def pack_sections(meta: Dict[str, Any], buffers: List[Tuple[str, Any]]) -> bytes:
+    """One section: JSON metadata (with the buffer layout added) followed by the buffers, which must be bytes-like."""
+    layout, offset = [], 0
+    for name, data in buffers:
+        layout.append([name, offset, len(data)])
+        offset += len(data)
+    encoded = orjson.dumps({**meta, "buffers": layout})
+    return b"".join([_META.pack(len(encoded)), encoded] + [data for _, data in buffers])
+
+
+def unpack_sections(data: memoryview) -> Tuple[Dict[str, Any], Dict[str, memoryview]]:
+    """Inverse of pack_sections(); buffers are views into `data`, not copies."""
+    (length,) = _META.unpack_from(data)
+    meta = orjson.loads(data[_META.size:_META.size + length])
+    base = _META.size + length
+    return meta, {name: data[base + offset:base + offset + size] for name, offset, size in meta["buffers"]}
+
+
+def pack_groups(groups: Iterable[Tuple[Any, Iterable[int]]]) -> Tuple[List[list], bytes]:
+    # Every group's row numbers in one buffer, with [value, start, count] per group
+    meta, packed = [], array("I")
+    for value, rows in groups:
+        meta.append([value, len(packed), len(rows)])
+        packed.extend(rows)
+    return meta, packed.tobytes()
+
+
+def unpack_groups(meta: List[list], data: memoryview) -> Dict[Any, array]:
+    packed = array("I")
+    packed.frombytes(data)
+    return {value: packed[start:start + count] for value, start, count in meta}
+
+
+class _LazyDict(dict):
+    """
+    Dict whose entries start out undecoded: `frozen` maps each pending key to
+    what make(key, token) turns into its value on first lookup. Walking every
+    value decodes the rest. Decoding and writes share a lock, so a reader never
+    puts back a value a writer has replaced or removed.
+    """
+
+    def __init__(self, frozen: Dict[Any, Any], make: Callable[[Any, Any], Any]):
+        super().__init__()
+        self.frozen = frozen
+        self._make = make
+        self._lock = threading.RLock()
+
+    def _thaw(self, key: Any) -> Any:
+        with self._lock:
+            token = self.frozen.pop(key, _MISSING)
+            if token is _MISSING:
+                return dict.get(self, key, _MISSING)
+            value = self._make(key, token)
+            dict.__setitem__(self, key, value)
+            return value
+
+    def thaw_all(self) -> None:
+        with self._lock:
+            for key in list(self.frozen):
+                self._thaw(key)
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        value = dict.get(self, key, _MISSING)
+        if value is _MISSING and self.frozen:
+            value = self._thaw(key)
+        return default if value is _MISSING else value
+
+    def __getitem__(self, key: Any) -> Any:
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key: object) -> bool:
+        return dict.__contains__(self, key) or key in self.frozen
+
+    def __setitem__(self, key: Any, value: Any) -> None:
+        with self._lock:
+            self.frozen.pop(key, None)
+            dict.__setitem__(self, key, value)
+
+    def __delitem__(self, key: Any) -> None:
+        with self._lock:
+            if self.frozen.pop(key, _MISSING) is _MISSING:
+                dict.__delitem__(self, key)
+            else:
+                dict.pop(self, key, None)
+
+    def setdefault(self, key: Any, default: Any = None) -> Any:
+        with self._lock:
+            value = self.get(key, _MISSING)
+            if value is _MISSING:
+                value = default
+                dict.__setitem__(self, key, value)
+            return value
+
+    def pop(self, key: Any, *default: Any) -> Any:
+        with self._lock:
+            value = self.get(key, _MISSING)
+            if value is _MISSING:
+                if default:
+                    return default[0]
+                raise KeyError(key)
+            dict.__delitem__(self, key)
+            return value
+
+    def size(self, key: Any) -> int:
+        """len() of one value, without decoding it when it is still pending."""
+        token = self.frozen.get(key)
+        return len(token) if token is not None else len(dict.get(self, key, ()))
+
+    def __len__(self) -> int:
+        return dict.__len__(self) + len(self.frozen)
+
+    def __iter__(self) -> Iterator[Any]:
+        # Keys only, so nothing needs decoding
+        with self._lock:
+            return iter(list(dict.keys(self)) + list(self.frozen))
+
+    def keys(self):
+        self.thaw_all()
+        return dict.keys(self)
+
+    def values(self):
+        self.thaw_all()
+        return dict.values(self)
+
+    def items(self):
+        self.thaw_all()
+        return dict.items(self)
+
+
+_MISSING = object()
+
+
+class SnapshotTable(Table):
+    """
+    Table restored from a snapshot section without decoding it up front. Rows
+    stay orjson-encoded in the mapped file until first looked up; secondary
+    index and ordering groups are packed row numbers until first used, so
+    counting a group decodes nothing. Startup costs one key -> row number map.
+    """
+
+    def __init__(self, key: str = "id", indexes: Iterable[str] = (), rows: Iterable[Row] = (),
+                 ordered: Iterable[Tuple[str, str]] = ()):
+        super().__init__(key, indexes, (), ordered)
+        self._keys: List[Any] = []  # row number -> key in the section it was loaded from
+        self._positions: Dict[Any, int] = {}  # and back
+        self._source: Optional[Tuple[array, memoryview]] = None  # (offsets, encoded rows)
+        self._rows = _LazyDict({}, self._decode_row)
+        self._indexes = {field: _LazyDict({}, self._index_group) for field in self._indexes}
+        self._ordered = {spec: _LazyDict({}, lambda value, rows, spec=spec: self._ordering_group(spec, rows))
+                         for spec in self._ordered}
+        self._load(rows)
+
+    @classmethod
+    def load(cls, data: Optional[memoryview], key: str = "id", indexes: Iterable[str] = (),
+             ordered: Iterable[Tuple[str, str]] = (), seed: Iterable[Row] = ()) -> "SnapshotTable":
+        """Open a section written by encode(); without one, start from copies of the seed rows."""
+        if data is None:
+            return cls(key, indexes, [dict(row) for row in seed], ordered)
+        meta, buffers = unpack_sections(data)
+        table = cls(key, indexes, (), ordered)
+        offsets = array("Q")
+        offsets.frombytes(buffers["offsets"])
+        table._source = (offsets, buffers["rows"])
+        table._sequences = meta["sequences"]
+        keys = meta["keys"]
+        table._positions = dict(zip(keys, range(len(keys))))
+        table._rows.frozen = dict(table._positions)
+        table._keys = keys
+        # Indexes or orderings the section doesn't have (the layout changed) are built from the rows
+        for field, index in table._indexes.items():
+            saved = meta["indexes"].get(field)
+            if saved is not None:
+                index.frozen = unpack_groups(saved, buffers[f"index.{field}"])
+                continue
+            for pk, row in table._rows.items():
+                index.setdefault(row.get(field), {})[pk] = row
+        saved_orderings = {(group, sort): (n, groups) for n, (group, sort, groups) in enumerate(meta["ordered"])}
+        for spec in table._ordered:
+            if spec in saved_orderings:
+                n, groups = saved_orderings[spec]
+                table._ordered[spec].frozen = unpack_groups(groups, buffers[f"ordered.{n}"])
+                continue
+            for pk, row in table._rows.items():
+                table._order(spec, row, pk)
+        return table
+
+    def count(self, field: str, value: Any) -> int:
+        return self._indexes[field].size(value)
+
+    def _decode_row(self, pk: Any, i: int) -> Row:
+        offsets, data = self._source
+        return orjson.loads(data[offsets[i]:offsets[i + 1]])
+
+    def _index_group(self, value: Any, rows: array) -> Dict[Any, Row]:
+        # Only the keys: adding to or counting a big group decodes none of its rows
+        keys = self._keys
+        return _LazyDict({keys[i]: None for i in rows}, lambda pk, _: self._rows.get(pk))
+
+    def _ordering_group(self, spec: Tuple[str, str], rows: array) -> List[Tuple[Any, Any]]:
+        # Saved in (sort value, key) order already
+        entries = []
+        for i in rows:
+            pk = self._keys[i]
+            row = self._rows.get(pk)
+            if row is not None:
+                entries.append((row.get(spec[1]), pk))
+        return entries
+
+    def collect(self) -> Dict[str, Any]:
+        """
+        Copy what encode() needs while writers are held off: decoded rows and
+        groups by reference (rows are never mutated), still-encoded ones by
+        row number, so nothing is decoded here. Readers may still decode
+        entries meanwhile, which moves them without changing them.
+        """
+        def split(lazy: _LazyDict, members: Callable[[Any], List[Any]]) -> Tuple[Dict[Any, Any], Dict[Any, Any]]:
+            with lazy._lock:
+                return {key: members(value) for key, value in dict.items(lazy)}, dict(lazy.frozen)
+
+        with self._lock:
+            rows, frozen = split(self._rows, lambda row: row)
+            return {
+                "key": self.key,
+                "rows": rows,
+                "frozen": frozen,
+                "positions": self._positions,
+                "source": self._source,
+                "sequences": dict(self._sequences),
+                "indexes": {field: split(index, list) for field, index in self._indexes.items()},
+                "ordered": {spec: split(groups, lambda entries: [pk for _, pk in entries])
+                            for spec, groups in self._ordered.items()},
+            }
+
+    @staticmethod
+    def encode(state: Dict[str, Any]) -> bytes:
+        """
+        Write a collected table as a section: each row encoded on its own, so
+        rows can be decoded one at a time. Rows never decoded since the last
+        load are copied as their original bytes.
+        """
+        old_offsets, old_data = state["source"] or (array("Q"), b"")
+        keys, chunks, offsets = [], [], array("Q", [0])
+        renumber = np.full(max(len(old_offsets) - 1, 0), -1, dtype=np.int64)  # old row number -> new
+        numbers: Dict[Any, int] = {}  # decoded row key -> new row number
+        for pk, i in state["frozen"].items():
+            renumber[i] = len(keys)
+            keys.append(pk)
+            chunks.append(old_data[old_offsets[i]:old_offsets[i + 1]])
+            offsets.append(offsets[-1] + len(chunks[-1]))
+        positions = state["positions"]
+        for pk, row in state["rows"].items():
+            old = positions.get(pk)
+            if old is not None:
+                renumber[old] = len(keys)
+            numbers[pk] = len(keys)
+            keys.append(pk)
+            chunks.append(orjson.dumps(row))
+            offsets.append(offsets[-1] + len(chunks[-1]))
+
+        def number(pk: Any) -> int:
+            # A group decoded after the rows were collected can name a row still encoded there
+            n = numbers.get(pk)
+            return int(renumber[positions[pk]]) if n is None else n
+
+        def groups(decoded: Dict[Any, List[Any]], frozen: Dict[Any, array]) -> Iterator[Tuple[Any, Any]]:
+            for value, rows in frozen.items():
+                yield value, renumber[np.frombuffer(rows, dtype=np.uint32)].tolist()
+            for value, pks in decoded.items():
+                yield value, [number(pk) for pk in pks]
+
+        buffers = [("offsets", offsets.tobytes()), ("rows", b"".join(chunks))]
+        indexes, ordered = {}, []
+        for field, (decoded, frozen) in state["indexes"].items():
+            indexes[field], packed = pack_groups(groups(decoded, frozen))
+            buffers.append((f"index.{field}", packed))
+        for n, (spec, (decoded, frozen)) in enumerate(state["ordered"].items()):
+            saved, packed = pack_groups(groups(decoded, frozen))
+            ordered.append([*spec, saved])
+            buffers.append((f"ordered.{n}", packed))
+        meta = {"key": state["key"], "keys": keys, "sequences": _sequences(keys, state["sequences"]),
+                "indexes": indexes, "ordered": ordered}
+        return pack_sections(meta, buffers)
+
+
+def _sequences(keys: List[Any], sequences: Dict[str, int]) -> Dict[str, int]:
+    # Highest number behind every key prefix, so next_id() needn't scan the keys after a restart
+    found = dict(sequences)
+    for pk in keys:
+        match = _NUMBERED.fullmatch(pk) if isinstance(pk, str) else None
+        if match and match[1] not in sequences:
+            found[match[1]] = max(found.get(match[1], 0), int(match[2]))
+    return found
+
+
+class StateSnapshot:
+    """
+    Versioned binary snapshot of the in-process stores in one file: a header,
+    a directory of named sections, then each section's bytes. Startup only
+    memory-maps the file and reads the directory; a store decodes its section
+    the first time it is used. save() rewrites the file atomically, copying
+    the sections of stores nobody has touched straight from the old mapping.
+    """
+
+    def __init__(self, directory: str, interval: float = INTERVAL):
+        self.directory = directory
+        self.path = os.path.join(directory, SNAPSHOT_FILE)
+        self.interval = interval
+        self.guard: Optional[Any] = None  # lock held while collecting, for stores that must agree
+        os.makedirs(directory, exist_ok=True)
+        self._stores: Dict[str, Tuple[Lazy, Callable[[Any], Any], Callable[[Any], bytes]]] = {}
+        self._before_save: List[Callable[[], Any]] = []
+        self._sections: Dict[str, Tuple[int, int]] = {}
+        self._map: Optional[mmap.mmap] = None
+        self._save_lock = threading.Lock()
+        self._closed = threading.Event()
+        self._open()
+        self._thread: Optional[threading.Thread] = None
+        if interval > 0:
+            self._thread = threading.Thread(target=self._run, daemon=True, name="state-snapshot")
+            self._thread.start()
+
+    def _open(self) -> None:
+        try:
+            f = open(self.path, "rb")
+        except FileNotFoundError:
+            return
+        with f:
+            if os.fstat(f.fileno()).st_size < _HEADER.size:
+                return
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, directory_length = _HEADER.unpack_from(data)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            # Keep what can't be read rather than overwrite it on the next save
+            data.close()
+            aside = f"{self.path}.v{version if magic == MAGIC else 'unknown'}"
+            os.replace(self.path, aside)
+            logger.warning("Snapshot %s has format %s, expected %s; moved to %s", self.path, version, FORMAT_VERSION, aside)
+            return
+        self._map = data
+        directory = orjson.loads(data[_HEADER.size:_HEADER.size + directory_length])
+        self._sections = {name: (offset, length) for name, (offset, length) in directory.items()}
+
+    def section(self, name: str) -> Optional[memoryview]:
+        location = self._sections.get(name)
+        if location is None or self._map is None:
+            return None
+        offset, length = location
+        return memoryview(self._map)[offset:offset + length]
+
+    def has(self, name: str) -> bool:
+        return name in self._sections
+
+    def store(self, name: str, load: Callable[[Optional[memoryview]], Any], collect: Callable[[Any], Any],
+              encode: Callable[[Any], bytes] = bytes) -> Lazy:
+        """
+        Register a store and return it as a Lazy that runs load(section or None)
+        on first use. On save, collect(store) runs under the guard and
+        encode(collected) outside it.
+        """
+        lazy = Lazy(lambda: load(self.section(name)))
+        self._stores[name] = (lazy, collect, encode)
+        return lazy
+
+    def before_save(self, hook: Callable[[], Any]) -> None:
+        self._before_save.append(hook)
+
+    def save(self) -> Optional[str]:
+        """Write every store's current state; unloaded stores keep their saved section."""
+        with self._save_lock:
+            for hook in self._before_save:
+                hook()
+            collected: Dict[str, Any] = {}
+            guard = self.guard or threading.Lock()
+            with guard:
+                for name, (lazy, collect, _) in self._stores.items():
+                    if loaded(lazy):
+                        collected[name] = collect(lazy._target)
+            sections = []
+            for name, (lazy, _, encode) in self._stores.items():
+                if name in collected:
+                    sections.append((name, encode(collected[name])))
+                elif name in self._sections:
+                    sections.append((name, self.section(name)))
+            self._write(sections)
+        return self.path
+
+    def _write(self, sections: List[Tuple[str, Any]]) -> None:
+        # Offsets depend on the directory's own length, so size it with placeholder offsets first
+        directory: Dict[str, Tuple[int, int]] = {}
+        placeholder = orjson.dumps({name: (2 ** 63, len(data)) for name, data in sections})
+        offset = _aligned(_HEADER.size + len(placeholder))
+        for name, data in sections:
+            directory[name] = (offset, len(data))
+            offset = _aligned(offset + len(data))
+        encoded = orjson.dumps(directory).ljust(len(placeholder))
+        tmp = self.path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, len(encoded)))
+            f.write(encoded)
+            for name, data in sections:
+                f.seek(directory[name][0])
+                f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+    def _changed(self) -> bool:
+        # Nothing built since startup means nothing can have changed
+        return any(loaded(lazy) for lazy, _, _ in self._stores.values())
+
+    def _run(self) -> None:
+        while not self._closed.wait(self.interval):
+            if not self._changed():
+                continue
+            try:
+                self.save()
+            except Exception:
+                logger.exception("State snapshot failed")
+
+    def close(self) -> None:
+        self._closed.set()
+        if self._changed():
+            self.save()
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // _ALIGN) * _ALIGN
@@ -0,0 +1,222 @@
+import threading
+from bisect import bisect_left, bisect_right, insort
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+Row = Dict[str, Any]
+SCAN_BATCH = 256
+
+
+class _Top:
+    """Sorts after every key, for inclusive upper bounds on (value, key) pairs."""
+
+    def __lt__(self, other: Any) -> bool:
+        return False
+
+    def __gt__(self, other: Any) -> bool:
+        return True
+
+
+_TOP = _Top()
+
+
+class Table:
+    """
+    In-memory table with a primary-key hash index and secondary indexes.
+    Secondary indexes map a field value to the rows holding it, so lookups
+    like creator_id -> items or tier_id -> subscribers are O(1) + O(k).
+    Ordered indexes keep each group's (sort value, key) pairs sorted, so keyset
+    pages like "creator's videos by created_at after this cursor" seek in
+    O(log k) instead of sorting the group on every request.
+    Writes are serialized by a per-table lock and replace rows copy-on-write,
+    so a row dict is never changed once published: readers take no lock and
+    always see whole rows.
+    """
+
+    def __init__(self, key: str = "id", indexes: Iterable[str] = (), rows: Iterable[Row] = (),
+                 ordered: Iterable[Tuple[str, str]] = ()):
+        self.key = key
+        self._rows: Dict[Any, Row] = {}
+        self._indexes: Dict[str, Dict[Any, Dict[Any, Row]]] = {field: {} for field in indexes}
+        # (group field, sort field) -> group value -> sorted [(sort value, key)]
+        self._ordered: Dict[Tuple[str, str], Dict[Any, List[Tuple[Any, Any]]]] = {spec: {} for spec in ordered}
+        self._sequences: Dict[str, int] = {}
+        self._lock = threading.RLock()
+        self._load(rows)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __iter__(self) -> Iterator[Row]:
+        # Iterate over a copy so callers may mutate the table while looping
+        return iter(list(self._rows.values()))
+
+    def __contains__(self, pk: Any) -> bool:
+        return pk in self._rows
+
+    def get(self, pk: Any) -> Optional[Row]:
+        return self._rows.get(pk)
+
+    def find(self, field: str, value: Any) -> List[Row]:
+        return list(self._indexes[field].get(value, {}).values())
+
+    def count(self, field: str, value: Any) -> int:
+        return len(self._indexes[field].get(value, ()))
+
+    def insert(self, row: Row) -> Row:
+        pk = row[self.key]
+        with self._lock:
+            if pk in self._rows:
+                raise KeyError(f"Duplicate key: {pk}")
+            for field, index in self._indexes.items():
+                index.setdefault(row.get(field), {})[pk] = row
+            for spec in self._ordered:
+                self._order(spec, row, pk)
+            self._rows[pk] = row
+        return row
+
+    def insert_new(self, row: Row) -> bool:
+        """Insert unless the key exists; False if it did."""
+        with self._lock:
+            if row[self.key] in self._rows:
+                return False
+            self.insert(row)
+            return True
+
+    def next_id(self, prefix: str) -> str:
+        """Allocate the next key of the form prefix<n>; n only grows, so deleted keys are never reused."""
+        with self._lock:
+            last = self._sequences.get(prefix)
+            if last is None:
+                last = max((int(pk[len(prefix):]) for pk in self._rows
+                            if isinstance(pk, str) and pk.startswith(prefix) and pk[len(prefix):].isdigit()), default=0)
+            self._sequences[prefix] = last + 1
+        return f"{prefix}{last + 1}"
+
+    def update(self, pk: Any, changes: Row) -> Optional[Row]:
+        with self._lock:
+            row = self._rows.get(pk)
+            if row is None:
+                return None
+            new = {**row, **{k: v for k, v in changes.items() if k != self.key}}
+            for field, index in self._indexes.items():
+                if new.get(field) != row.get(field):
+                    self._unindex(field, row.get(field), pk)
+                index.setdefault(new.get(field), {})[pk] = new
+            for spec in self._ordered:
+                if any(new.get(f) != row.get(f) for f in spec):
+                    self._unorder(spec, row, pk)
+                    self._order(spec, new, pk)
+            self._rows[pk] = new
+        return new
+
+    def upsert(self, row: Row) -> Row:
+        with self._lock:
+            if row[self.key] in self._rows:
+                return self.update(row[self.key], row)
+            return self.insert(row)
+
+    def modify(self, pk: Any, changes: Callable[[Row], Row]) -> Optional[Row]:
+        """Atomic read-modify-write: changes(row) computes the fields to update from the current row."""
+        with self._lock:
+            row = self._rows.get(pk)
+            if row is None:
+                return None
+            return self.update(pk, changes(row))
+
+    def increment(self, pk: Any, field: str, by: int = 1) -> Optional[Row]:
+        with self._lock:
+            row = self._rows.get(pk)
+            if row is None:
+                return None
+            return self.update(pk, {field: (row.get(field, 0) or 0) + by})
+
+    def delete(self, pk: Any) -> Optional[Row]:
+        with self._lock:
+            row = self._rows.pop(pk, None)
+            if row is None:
+                return None
+            for field in self._indexes:
+                self._unindex(field, row.get(field), pk)
+            for spec in self._ordered:
+                self._unorder(spec, row, pk)
+        return row
+
+    def scan(self, group_field: str, group_value: Any, sort_field: str, after: Optional[Tuple[Any, Any]] = None,
+             descending: bool = False, low: Any = None, high: Any = None) -> Iterator[Row]:
+        """
+        Yield a group's rows ordered by (sort value, key), optionally bounded to
+        low <= sort value <= high and starting strictly after an (sort value, key) cursor.
+        Rows whose sort value is None are not part of the ordering.
+        """
+        entries = self._ordered[(group_field, sort_field)].get(group_value, [])
+        start = 0 if low is None else bisect_left(entries, (low,))
+        stop = len(entries) if high is None else bisect_right(entries, (high, _TOP))
+        if after is not None:
+            if descending:
+                stop = min(stop, bisect_left(entries, tuple(after)))
+            else:
+                start = max(start, bisect_right(entries, tuple(after)))
+        while start < stop:
+            # Copy a small batch at a time so concurrent writers can't break iteration
+            if descending:
+                batch = entries[max(start, stop - SCAN_BATCH):stop][::-1]
+                stop -= len(batch)
+            else:
+                batch = entries[start:min(stop, start + SCAN_BATCH)]
+                start += len(batch)
+            if not batch:
+                return
+            for _, pk in batch:
+                row = self._rows.get(pk)
+                if row is not None:
+                    yield row
+
+    def _load(self, rows: Iterable[Row]) -> None:
+        # Bulk build: fill the primary index first, then each secondary index and ordering in one pass, sorting once
+        key, table = self.key, self._rows
+        for row in rows:
+            pk = row[key]
+            if pk in table:
+                raise KeyError(f"Duplicate key: {pk}")
+            table[pk] = row
+        for field, index in self._indexes.items():
+            for pk, row in table.items():
+                value = row.get(field)
+                group = index.get(value)
+                if group is None:
+                    group = index[value] = {}
+                group[pk] = row
+        for (group_field, sort_field), groups in self._ordered.items():
+            for pk, row in table.items():
+                value = row.get(sort_field)
+                if value is not None:
+                    group = row.get(group_field)
+                    entries = groups.get(group)
+                    if entries is None:
+                        entries = groups[group] = []
+                    entries.append((value, pk))
+            for entries in groups.values():
+                entries.sort()
+
+    def _order(self, spec: Tuple[str, str], row: Row, pk: Any) -> None:
+        value = row.get(spec[1])
+        if value is not None:
+            insort(self._ordered[spec].setdefault(row.get(spec[0]), []), (value, pk))
+
+    def _unorder(self, spec: Tuple[str, str], row: Row, pk: Any) -> None:
+        value = row.get(spec[1])
+        entries = self._ordered[spec].get(row.get(spec[0]))
+        if value is None or not entries:
+            return
+        i = bisect_left(entries, (value, pk))
+        if i < len(entries) and entries[i] == (value, pk):
+            del entries[i]
+        if not entries:
+            del self._ordered[spec][row.get(spec[0])]
+
+    def _unindex(self, field: str, value: Any, pk: Any) -> None:
+        bucket = self._indexes[field].get(value)
+        if bucket is not None:
+            bucket.pop(pk, None)
+            if not bucket:
+                del self._indexes[field][value]
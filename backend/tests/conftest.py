@@ -0,0 +1,12 @@
+import os
+import sys
+import tempfile
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+# The backend builds its stores when the models modules are imported: keep them in-process and
+# point the on-disk parts somewhere disposable first
+for name in ("TIERFLOW_DATABASE_URL", "TIERFLOW_EVENT_LOG", "TIERFLOW_SNAPSHOT_DIR", "TIERFLOW_SEARCH_INDEX"):
+    os.environ.pop(name, None)
+os.environ["TIERFLOW_BLOB_DIR"] = tempfile.mkdtemp(prefix="tierflow-blobs-")
@@ -0,0 +1,68 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from access import AccessIndex
+from conftest import BACKEND
+from persistence import Database
+
+# One backend run: buy an item and subscribe, or (after a restart) ask what that unlocked
+RUN = """
+import json, sys
+from fastapi.testclient import TestClient
+import mainC
+
+items = [{"creator_id": "creator1", "minTier": gate} for gate in ("purchase1", "tier2")]
+with TestClient(mainC.app) as client:
+    if sys.argv[1] == "buy":
+        client.post("/membership/one-time-purchases/purchase1/purchase", data={"user_id": "buyer"})
+        client.post("/membership/subscribe/", data={"user_id": "buyer", "tier_id": "tier2"})
+    allowed = client.post("/membership/entitlements/check", json={"user_id": "buyer", "items": items}).json()
+print(json.dumps(allowed["allowed"]))
+"""
+
+
+@pytest.mark.parametrize("store", ["TIERFLOW_SNAPSHOT_DIR", "TIERFLOW_EVENT_LOG", "TIERFLOW_DATABASE_URL"])
+def test_access_survives_a_restart(tmp_path, store):
+    location = f"sqlite:///{tmp_path / 'tierflow.db'}" if store == "TIERFLOW_DATABASE_URL" else str(tmp_path)
+    env = {**os.environ, store: location, "TIERFLOW_SNAPSHOT_INTERVAL": "0"}
+
+    def run(phase):
+        output = subprocess.run([sys.executable, "-c", RUN, phase], cwd=BACKEND, env=env, check=True,
+                                capture_output=True, text=True).stdout
+        return json.loads(output.strip().splitlines()[-1])
+
+    assert run("buy") == [True, True]
+    assert run("check") == [True, True]
+
+
+def test_workers_see_each_others_writes(tmp_path):
+    # Two processes' worth of tables over one database, each with its own index
+    url = f"sqlite:///{tmp_path / 'tierflow.db'}"
+
+    def worker():
+        db = Database(url)
+        tables = {name: db.table(name, indexes=indexes) for name, indexes in (
+            ("tiers", ("creator_id",)), ("one_time_purchases", ("creator_id",)),
+            ("subscriptions", ("user_id", "tier_id")), ("purchases", ("user_id",)))}
+        index = AccessIndex.from_tables(tables["tiers"], tables["one_time_purchases"], tables["subscriptions"],
+                                        tables["purchases"], ttl=0)
+        return tables, index
+
+    writer, _ = worker()
+    _, reader = worker()
+    tier_gate = {"creator_id": "creator9", "minTier": "tier9"}
+    item_gate = {"creator_id": "creator9", "minTier": "item9"}
+    assert reader.visible("fan", [tier_gate, item_gate]) == [False, False]
+
+    writer["tiers"].insert({"id": "tier9", "creator_id": "creator9", "price": 5.0})
+    writer["one_time_purchases"].insert({"id": "item9", "creator_id": "creator9", "price": 3.0})
+    writer["subscriptions"].insert({"id": "sub9", "user_id": "fan", "tier_id": "tier9"})
+    writer["purchases"].insert({"id": "buy9", "user_id": "fan", "purchase_id": "item9"})
+    assert reader.visible("fan", [tier_gate, item_gate]) == [True, True]
+
+    writer["subscriptions"].delete("sub9")
+    assert reader.visible("fan", [tier_gate, item_gate]) == [False, True]
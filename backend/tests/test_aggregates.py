@@ -0,0 +1,45 @@
+from fastapi.testclient import TestClient
+
+from aggregates import CreatorAggregates
+from gateway import create_app
+
+
+def test_dashboard_follows_every_membership_write():
+    with TestClient(create_app()) as client:
+        def dashboard():
+            running = client.get("/membership/dashboard/agg-creator").json()
+            assert client.get("/membership/dashboard/agg-creator/verify").json()["consistent"]
+            return running
+
+        tier = client.post("/membership/tiers/", json={"name": "Fan", "price": 4.99, "creator_id": "agg-creator",
+                                                       "subscriberCount": 10}).json()
+        item = client.post("/membership/one-time-purchases/", json={"name": "Guide", "price": 0.1,
+                                                                    "creator_id": "agg-creator"}).json()
+        assert dashboard() == {"total_subscribers": 10, "total_tiers": 1, "revenue": 49.9,
+                               "one_time_revenue": 0.0, "total_revenue": 49.9}
+
+        for _ in range(3):
+            client.post(f"/membership/one-time-purchases/{item['id']}/purchase", data={"user_id": "agg-fan"})
+        client.post("/membership/subscribe/", data={"user_id": "agg-fan", "tier_id": tier["id"]})
+        # Cents, not floats: three 0.1 purchases are exactly 0.3
+        assert dashboard() == {"total_subscribers": 11, "total_tiers": 1, "revenue": 54.89,
+                               "one_time_revenue": 0.3, "total_revenue": 55.19}
+
+        client.put(f"/membership/tiers/{tier['id']}", json={"price": 10.0})
+        sub = client.get("/membership/subscriptions/agg-fan").json()[0]
+        client.post("/membership/unsubscribe/", data={"subscription_id": sub["id"]})
+        assert dashboard()["revenue"] == 100.0 and dashboard()["total_subscribers"] == 10
+
+        client.delete(f"/membership/tiers/{tier['id']}")
+        client.delete(f"/membership/one-time-purchases/{item['id']}")
+        assert dashboard() == {"total_subscribers": 0, "total_tiers": 0, "revenue": 0.0,
+                               "one_time_revenue": 0.0, "total_revenue": 0.0}
+
+
+def test_moving_a_tier_moves_its_totals():
+    stats = CreatorAggregates()
+    tier = {"id": "t1", "creator_id": "a", "price": 5.0, "subscriberCount": 2}
+    stats.tier_changed(None, tier)
+    stats.tier_changed(tier, {**tier, "creator_id": "b"})
+    assert stats.dashboard("a")["total_tiers"] == 0 and stats.dashboard("a")["revenue"] == 0
+    assert stats.dashboard("b") == CreatorAggregates.recompute("b", [{**tier, "creator_id": "b"}], [])
@@ -0,0 +1,53 @@
+from fastapi.testclient import TestClient
+
+from aml import AmlMonitor
+from gateway import create_app
+
+T0 = 1_700_000_000.0
+
+
+def rules(alerts):
+    return [(a["rule"], a.get("user_id") or a.get("creator_id")) for a in alerts]
+
+
+def test_velocity_fires_past_the_limit_once_per_window():
+    monitor = AmlMonitor()
+    raised = [monitor.observe("subscribe", "fast", "c1", 1.0, ts=T0 + i) for i in range(25)]
+    assert [i for i, alerts in enumerate(raised) if alerts] == [20]
+    assert rules(raised[20]) == [("velocity", "fast")] and raised[20][0]["value"] == 21
+    # The window has moved on: old events no longer count, and the rule may fire again
+    assert monitor.observe("subscribe", "fast", "c1", 1.0, ts=T0 + 200) == []
+    again = [monitor.observe("subscribe", "fast", "c1", 1.0, ts=T0 + 200 + i) for i in range(20)]
+    assert [i for i, alerts in enumerate(again) if alerts] == [19]
+
+
+def test_amount_burst_fires_above_the_spend_limit():
+    monitor = AmlMonitor()
+    assert monitor.observe("purchase", "big", "c1", 250.0, ts=T0) == []
+    assert monitor.observe("purchase", "big", "c1", 250.0, ts=T0 + 1) == []  # exactly at the limit
+    alerts = monitor.observe("purchase", "big", "c1", 0.01, ts=T0 + 2)
+    assert rules(alerts) == [("amount_burst", "big")] and alerts[0]["value"] == 500.01
+    assert monitor.observe("purchase", "other", "c1", 499.99, ts=T0 + 3) == []
+
+
+def test_fan_in_counts_new_accounts_only():
+    monitor = AmlMonitor()
+    for i in range(40):
+        assert monitor.observe("subscribe", f"new{i}", "target", 5.0, ts=T0 + i / 10) == []
+    # Established accounts paying the same creator don't count
+    for i in range(80):
+        for _ in range(3):
+            monitor.observe("purchase", f"old{i}", None, 1.0, ts=T0 + 5)
+        assert monitor.observe("subscribe", f"old{i}", "target", 5.0, ts=T0 + 6) == []
+    raised = [a for i in range(40, 120) for a in monitor.observe("subscribe", f"new{i}", "target", 5.0, ts=T0 + 7)]
+    assert rules(raised) == [("new_account_fan_in", "target")]
+    assert raised[0]["value"] > 50
+
+
+def test_alerts_surface_through_the_api():
+    with TestClient(create_app()) as client:
+        for _ in range(21):
+            client.post("/membership/subscribe/", data={"user_id": "aml-fan", "tier_id": "tier1"})
+        body = client.get("/membership/aml/alerts").json()
+    assert body["events_seen"] >= 21
+    assert ("velocity", "aml-fan") in rules(body["alerts"])
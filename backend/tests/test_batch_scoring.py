@@ -0,0 +1,52 @@
+import random
+
+import numpy as np
+import pytest
+
+from batch_scoring import (ENGAGEMENT_STEPS, FLAG_COLUMNS, columns_from_videos, rescore_table, revenue_split_batch,
+                           score_and_split)
+from catalog import VideoCatalog
+from models import calculate_ml_score, calculate_revenue_split
+from store import Table
+
+
+def random_videos(n, seed=7):
+    # Engagement values on and around every threshold, flags set, cleared or missing
+    rng = random.Random(seed)
+    edges = sorted({v + d for thresholds, _ in ENGAGEMENT_STEPS.values() for v in thresholds.tolist() for d in (-1, 0, 1)})
+    videos = []
+    for i in range(n):
+        video = {"id": f"video{i}"}
+        for name in ENGAGEMENT_STEPS:
+            if rng.random() < 0.9:
+                video[name] = rng.choice(edges + [0, rng.randrange(5000)])
+        for name in FLAG_COLUMNS:
+            if rng.random() < 0.7:
+                video[name] = rng.random() < 0.5
+        videos.append(video)
+    return videos
+
+
+def test_batch_matches_the_scalar_functions():
+    videos = random_videos(5000)
+    scores, splits = score_and_split(columns_from_videos(videos))
+    assert scores.tolist() == [calculate_ml_score(v) for v in videos]
+    assert splits.tolist() == [calculate_revenue_split(calculate_ml_score(v)) for v in videos]
+
+
+def test_split_ladder_matches_at_every_score():
+    scores = np.arange(0, 100.5, 0.5)
+    assert revenue_split_batch(scores).tolist() == [calculate_revenue_split(s) for s in scores.tolist()]
+
+
+@pytest.mark.parametrize("make", [lambda rows: Table(rows=rows), lambda rows: VideoCatalog(rows=rows)])
+def test_rescore_table_writes_the_scalar_results(make):
+    videos = random_videos(500, seed=3)
+    table = make([dict(v) for v in videos])
+    seen = {}
+    assert rescore_table(table, seen.__setitem__) == len(videos)
+    for video in videos:
+        row = table.get(video["id"])
+        assert row["ml_score"] == calculate_ml_score(video) == seen[video["id"]]
+        assert row["revenue_split"] == calculate_revenue_split(row["ml_score"])
+    assert rescore_table(table) == 0
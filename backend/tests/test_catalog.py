@@ -0,0 +1,33 @@
+import sys
+import threading
+
+from catalog import VideoCatalog
+
+
+def test_a_row_view_never_mixes_two_updates():
+    # The writer keeps ml_score and revenue_split equal; a view must never see one without the other
+    catalog = VideoCatalog(rows=[{"id": "video1", "ml_score": 0.0, "revenue_split": 0.0}])
+    done = threading.Event()
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)  # switch threads often enough to land between two columns
+
+    def write():
+        n = 0
+        while not done.is_set():
+            n += 1
+            catalog.update("video1", {"ml_score": float(n), "revenue_split": float(n)})
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    try:
+        torn = 0
+        for _ in range(20000):
+            row = catalog.get("video1")
+            if row["ml_score"] != row["revenue_split"]:
+                torn += 1
+            assert row.to_dict() == {"id": "video1", "ml_score": row["ml_score"], "revenue_split": row["ml_score"]}
+    finally:
+        done.set()
+        writer.join()
+        sys.setswitchinterval(interval)
+    assert torn == 0
@@ -0,0 +1,85 @@
+import logging
+
+from fastapi.testclient import TestClient
+
+import content_service
+from content_models import engagement_pipeline, videos_db
+from engagement import EngagementPipeline
+from gateway import create_app
+from models import calculate_ml_score, calculate_revenue_split
+from store import Table
+
+
+class CountingTable(Table):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.writes = 0
+
+    def modify(self, pk, changes):
+        self.writes += 1
+        return super().modify(pk, changes)
+
+
+def pipeline(videos, rescored=None):
+    return EngagementPipeline(videos, score=calculate_ml_score, split=calculate_revenue_split, on_rescore=rescored)
+
+
+def test_a_batch_is_one_write_per_video_and_rescores_on_crossings():
+    videos = CountingTable(rows=[{"id": "v1", "likes": 90, "watch_time": 10, "ml_score": 10.0},
+                                 {"id": "v2", "likes": 5, "watch_time": 10, "ml_score": 10.0}])
+    seen = []
+    engine = pipeline(videos, seen.extend)
+    batch = [{"video_id": "v1", "likes": 4}, {"video_id": "v1", "likes": 6, "watch_time": 30},
+             {"video_id": "v1", "watch_time": 61}, {"video_id": "v2", "likes": 2, "comments": -3},
+             {"video_id": "gone", "likes": 1}]
+    assert engine.apply(batch) == (2, 1)
+    assert videos.writes == 3  # one per video, including the unknown one
+
+    v1, v2 = videos.get("v1"), videos.get("v2")
+    # Counters add up and the last watch time wins; crossing 100 likes and 60s rescored v1
+    assert (v1["likes"], v1["watch_time"]) == (100, 61)
+    assert v1["ml_score"] == calculate_ml_score(v1) and v1["revenue_split"] == calculate_revenue_split(v1["ml_score"])
+    assert seen == [v1]
+    # No boundary crossed: v2 keeps its score, and counters never go negative
+    assert (v2["likes"], v2["comments"], v2["ml_score"]) == (7, 0, 10.0)
+    assert engine.snapshot() == {"received": 0, "batches": 1, "rows_updated": 2, "rescored": 1, "unknown_videos": 1,
+                                 "pending": 0}
+
+
+def test_a_failed_batch_is_logged_and_the_worker_carries_on(caplog):
+    videos = Table(rows=[{"id": "v1", "likes": 0}])
+    failing = [True]
+
+    def rescored(rows):
+        if failing.pop():
+            raise RuntimeError("search index unavailable")
+
+    engine = pipeline(videos, rescored)
+    with caplog.at_level(logging.ERROR, logger="engagement"):
+        engine.submit([{"video_id": "v1", "likes": 200}])
+        engine.flush()
+    assert [r.exc_info[0] for r in caplog.records if r.message == "Engagement batch failed"] == [RuntimeError]
+    failing.append(False)
+    engine.submit([{"video_id": "v1", "likes": 400}])
+    engine.flush()
+    assert videos.get("v1")["likes"] == 600
+
+
+def test_ingestion_validates_and_refreshes_cached_scores():
+    with TestClient(create_app()) as client:
+        video = content_service._new_video("clip.mp4", {"title": "Engaged", "minTier": "tier1", "creator_id": "eng"})
+        videos_db.insert({**video, "status": "ready", "ml_score": calculate_ml_score(video)})
+        etag = client.get(f"/content/ml-score/{video['id']}").headers["ETag"]
+
+        response = client.post("/content/engagement", json=[
+            {"video_id": video["id"], "likes": 600, "comments": 60, "watch_time": 130},
+            {"video_id": 5}, {"video_id": video["id"], "likes": "many"}, {"video_id": video["id"], "watch_time": -1}])
+        assert response.status_code == 202
+        assert response.json()["accepted"] == 1
+        assert [r["index"] for r in response.json()["rejected"]] == [1, 2, 3]
+        assert client.post("/content/engagement", content=b"{").status_code == 400
+        engagement_pipeline.flush()
+
+        fresh = client.get(f"/content/ml-score/{video['id']}", headers={"If-None-Match": etag})
+        assert fresh.status_code == 200
+        assert fresh.json()["ml_score"] == calculate_ml_score(videos_db.get(video["id"]).to_dict())
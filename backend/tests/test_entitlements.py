@@ -0,0 +1,34 @@
+import httpx
+from fastapi.testclient import TestClient
+
+import content_service
+import membership_service
+from gateway import create_app
+
+
+def test_split_services_see_subscription_changes_at_once():
+    # Membership and content as separate apps, each calling the other over HTTP
+    membership = create_app(["membership"], content_urls=["http://content"])
+    content = create_app(["content"], membership_url="http://membership")
+    content_service.entitlements._client = httpx.AsyncClient(transport=httpx.ASGITransport(app=membership),
+                                                              base_url="http://membership")
+    membership_service.invalidator._client = TestClient(content)
+    try:
+        with TestClient(membership) as m, TestClient(content) as c:
+            video = c.post("/content/", files={"file": ("clip.mp4", b"x" * 10)},
+                           data={"title": "Gated", "minTier": "tier2", "creator_id": "creator1"}).json()["id"]
+
+            def allowed():
+                return c.get(f"/content/{video}", params={"user_id": "split-fan"}).status_code == 200
+
+            assert not allowed()  # the denial is cached now
+            m.post("/membership/subscribe/", data={"user_id": "split-fan", "tier_id": "tier2"})
+            assert allowed()
+            sub = m.get("/membership/subscriptions/split-fan").json()[0]
+            m.post("/membership/unsubscribe/", data={"subscription_id": sub["id"]})
+            assert not allowed()
+            m.post("/membership/bulk", content=b'{"type": "subscribe", "user_id": "split-fan", "tier_id": "tier3"}\n')
+            assert allowed()
+    finally:
+        content_service.configure_entitlements(None)
+        membership_service.configure_invalidation(None)
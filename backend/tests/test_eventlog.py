@@ -0,0 +1,32 @@
+import json
+import os
+import subprocess
+import sys
+
+from conftest import BACKEND
+
+# One backend run with an event log: subscribe, shut down, then read what reached the file
+RUN = """
+import glob, json, os, time
+from fastapi.testclient import TestClient
+import mainC
+from membership_models import event_log
+
+# Longer than the run once the current wait ends, so only shutdown can write the batch out
+event_log.sync_interval = 3600
+time.sleep(0.2)
+with TestClient(mainC.app) as client:
+    client.post("/membership/subscribe/", data={"user_id": "logged-fan", "tier_id": "tier1"})
+with open(glob.glob(os.path.join(event_log.directory, "*.log"))[-1], "rb") as f:
+    events = [json.loads(line) for line in f]
+print(json.dumps({"closed": event_log._file.closed, "events": events}))
+"""
+
+
+def test_shutdown_flushes_the_event_log(tmp_path):
+    env = {**os.environ, "TIERFLOW_EVENT_LOG": str(tmp_path)}
+    output = subprocess.run([sys.executable, "-c", RUN], cwd=BACKEND, env=env, check=True,
+                            capture_output=True, text=True).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    assert result["closed"]
+    assert [(e["type"], e["subscription"]["user_id"]) for e in result["events"]] == [("subscribed", "logged-fan")]
@@ -0,0 +1,47 @@
+import json
+import os
+import subprocess
+import sys
+
+from conftest import BACKEND
+
+# Build one deployment in a fresh process and list which service stacks it imported
+RUN = """
+import json, sys, warnings
+# Routers' on_event hooks are deprecated and warn on import; fail on them
+warnings.filterwarnings("error", r"\\s*on_event is deprecated", DeprecationWarning)
+from fastapi.testclient import TestClient
+from gateway import create_app
+
+app = create_app(sys.argv[1].split(","), membership_url="http://membership", content_urls=[])
+with TestClient(app) as client:
+    simulate = client.post("/membership/revenue/creator1/simulate", json={"scenarios": [{}]}).status_code
+print(json.dumps({"modules": sorted(m for m in ("content_models", "membership_models", "ledger", "eventlog", "kyc", "aml")
+                                    if m in sys.modules), "simulate": simulate}))
+"""
+
+
+def deploy(services, **env):
+    output = subprocess.run([sys.executable, "-c", RUN, services],
+                            cwd=BACKEND, env={**os.environ, **env}, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def test_content_alone_builds_no_membership_stack():
+    assert deploy("content") == {"modules": ["content_models"], "simulate": 404}
+
+
+def test_membership_alone_refuses_simulations():
+    deployed = deploy("membership")
+    assert "content_models" not in deployed["modules"]
+    assert deployed["simulate"] == 501
+
+
+def test_both_services_simulate_over_the_catalog():
+    assert deploy("membership,content")["simulate"] == 200
+
+
+def test_shutdown_runs_through_the_lifespan(tmp_path):
+    # Content saves its search index once the app stops
+    deploy("membership,content", TIERFLOW_SEARCH_INDEX=str(tmp_path))
+    assert os.listdir(tmp_path) == ["index-00000001"]
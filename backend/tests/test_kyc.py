@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from gateway import create_app
+from kyc import KYC_SECRET, KycEngine, ProviderError, sign
+
+SECRET = "test-secret"
+
+
+class Provider:
+    # Accepts every check at once under a known reference and never calls back by itself
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.submitted = []
+
+    async def submit(self, creator_id, callback):
+        if self.failures:
+            self.failures -= 1
+            raise ProviderError("down")
+        self.submitted.append(creator_id)
+        return f"ref-{len(self.submitted)}"
+
+
+def engine(provider):
+    records = {}
+
+    def save(creator_id, status, details):
+        records[creator_id] = {**records.get(creator_id, {}), **details, "status": status}
+
+    return KycEngine(provider, load=records.get, save=save, secret=SECRET, backoff=0), records
+
+
+def verdict(status="verified", reference="ref-1", secret=SECRET, **changes):
+    payload = {"reference": reference, "creator_id": "creator1", "status": status}
+    return {**payload, "signature": sign(secret, payload), **changes}
+
+
+def test_only_signed_verdicts_for_the_submitted_check_apply():
+    async def run():
+        kyc, records = engine(Provider())
+        assert await kyc.submit("creator1") == "pending"
+        await kyc.join()
+        assert records["creator1"]["reference"] == "ref-1"
+
+        forged = [verdict(secret="guessed"), verdict(status="rejected", signature=verdict()["signature"]),
+                  verdict(signature="")]
+        for payload in forged:
+            with pytest.raises(PermissionError):
+                await kyc.handle_callback(payload)
+        with pytest.raises(ValueError):
+            await kyc.handle_callback(verdict(reference="ref-other"))
+        assert kyc.status("creator1") == "pending"
+
+        assert await kyc.handle_callback(verdict()) == "verified"
+        # A redelivery is a no-op, and a signed verdict can't be swapped for another status later
+        assert await kyc.handle_callback(verdict()) == "verified"
+        assert await kyc.handle_callback(verdict(status="rejected")) == "verified"
+        assert kyc.status("creator1") == "verified" and "verified_at" in records["creator1"]
+
+    asyncio.run(run())
+
+
+def test_provider_failures_are_retried_then_given_up():
+    async def run():
+        kyc, records = engine(Provider(failures=2))
+        await kyc.submit("creator1")
+        await kyc.join()
+        assert records["creator1"]["status"] == "pending" and records["creator1"]["attempts"] == 3
+
+        kyc, records = engine(Provider(failures=10))
+        await kyc.submit("creator1")
+        await kyc.join()
+        assert records["creator1"]["status"] == "not_started" and records["creator1"]["last_error"] == "down"
+
+    asyncio.run(run())
+
+
+def test_webhook_rejects_forged_callbacks():
+    with TestClient(create_app()) as client:
+        payload = {"reference": "anything", "creator_id": "forged-creator", "status": "verified"}
+        for secret in ("dev-kyc-secret", "", "secret"):
+            response = client.post("/membership/kyc/webhook", json={**payload, "signature": sign(secret, payload)})
+            assert response.status_code == 401
+        # Correctly signed, but for no check this creator submitted
+        response = client.post("/membership/kyc/webhook", json={**payload, "signature": sign(KYC_SECRET, payload)})
+        assert response.status_code == 400
+        assert client.get("/membership/kyc/status/forged-creator").json() == {"status": "not_started"}
+        assert client.post("/membership/payout/forged-creator").status_code == 403
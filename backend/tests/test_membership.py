@@ -0,0 +1,104 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import membership_service
+from conftest import BACKEND
+from membership_models import one_time_purchases_db, subscriptions_db
+from persistence import Database
+
+
+def race(n, call):
+    # Start n calls at once
+    start = threading.Barrier(n)
+
+    def run(i):
+        start.wait()
+        return call(i)
+
+    with ThreadPoolExecutor(n) as pool:
+        return list(pool.map(run, range(n)))
+
+
+def slowed(monkeypatch, owner, name):
+    # Widen any gap between a check and the write it guards
+    original = getattr(owner, name)
+
+    def slow(*args, **kwargs):
+        time.sleep(0.05)
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(owner, name, slow)
+
+
+def test_concurrent_retries_apply_once(monkeypatch):
+    slowed(monkeypatch, membership_service, "_subscribed")
+    slowed(monkeypatch, membership_service, "_purchased")
+    purchases = one_time_purchases_db.get("purchase1")["purchaseCount"]
+
+    results = race(4, lambda i: membership_service._add_subscription("retrying-fan", "tier1", "retry-sub"))
+    assert results == [{"success": True}] * 4
+    assert len(subscriptions_db.find("user_id", "retrying-fan")) == 1
+
+    results = race(4, lambda i: membership_service.purchase_item("purchase1", "retrying-fan", "retry-buy"))
+    assert all(r["success"] for r in results)
+    assert one_time_purchases_db.get("purchase1")["purchaseCount"] == purchases + 1
+
+
+def test_concurrent_unsubscribes_remove_once(monkeypatch):
+    membership_service._add_subscription("leaving-fan", "tier2")
+    sub = subscriptions_db.find("user_id", "leaving-fan")[0]
+    slowed(monkeypatch, subscriptions_db, "get")
+    count = membership_service.tiers_db.get("tier2")["subscriberCount"]
+
+    def leave(i):
+        try:
+            return membership_service.unsubscribe(sub["id"])
+        except membership_service.HTTPException as e:
+            return e.status_code
+
+    assert sorted(race(4, leave), key=str) == [404, 404, 404, {"success": True}]
+    assert membership_service.tiers_db.get("tier2")["subscriberCount"] == count - 1
+    assert membership_service.verify_dashboard("creator1")["consistent"]
+    assert membership_service.access_index.mask("leaving-fan", "creator1") == 0
+
+
+def test_moving_an_item_moves_its_gate():
+    access_index = membership_service.access_index
+    item = membership_service.create_one_time_purchase({"name": "Moved", "price": 5.0, "creator_id": "creator1"})
+    membership_service.purchase_item(item["id"], "buyer", None)
+    gate = {"creator_id": "creator1", "minTier": item["id"]}
+    assert membership_service.check_entitlements({"user_id": "buyer", "items": [gate]})["allowed"] == [True]
+    bit = access_index.required(item["id"])[1]
+
+    membership_service.update_one_time_purchase(item["id"], {"creator_id": "creator2"})
+    assert access_index.required(item["id"])[0] == "creator2"
+    assert membership_service.check_entitlements({"user_id": "buyer", "items": [gate]})["allowed"] == [False]
+    # The bit it held for creator1 is free again
+    other = membership_service.create_one_time_purchase({"name": "Next", "price": 1.0, "creator_id": "creator1"})
+    assert access_index.required(other["id"]) == ("creator1", bit)
+
+
+# One worker process over a shared database, retrying the same keyed subscribes as its peers
+WORKER = """
+import membership_service
+
+for i in range(20):
+    try:
+        membership_service._add_subscription("keyed-fan", "tier1", f"shared-key-{i}")
+    except membership_service.HTTPException as e:
+        assert e.status_code == 409, e.detail  # a peer is applying that key right now
+"""
+
+
+def test_retries_on_other_workers_apply_once(tmp_path):
+    env = {**os.environ, "TIERFLOW_DATABASE_URL": f"sqlite:///{tmp_path / 'tierflow.db'}"}
+    subprocess.run([sys.executable, "-c", "import membership_models"], cwd=BACKEND, env=env, check=True)  # create the tables
+    workers = [subprocess.Popen([sys.executable, "-c", WORKER], cwd=BACKEND, env=env) for _ in range(3)]
+    assert [worker.wait() for worker in workers] == [0, 0, 0]
+    db = Database(env["TIERFLOW_DATABASE_URL"])
+    subscriptions = db.table("subscriptions", indexes=("user_id", "tier_id"))
+    assert len(subscriptions.find("user_id", "keyed-fan")) == 20
@@ -0,0 +1,130 @@
+import re
+import time
+
+from fastapi import APIRouter, Body, FastAPI
+from fastapi.testclient import TestClient
+
+import metrics
+from gateway import create_app
+from metrics import InstrumentedTable, Metrics, MetricsMiddleware, ProfiledRoute, SlowRequestProfiler
+from store import Table
+
+
+def sample(text, name, **labels):
+    # Value of the one sample of `name` carrying at least these labels
+    wanted = [f'{k}="{v}"' for k, v in labels.items()]
+    values = [float(line.rsplit(" ", 1)[1]) for line in text.splitlines()
+              if line.startswith(name + "{") and all(label in line for label in wanted)]
+    assert len(values) == 1, (name, labels, values)
+    return values[0]
+
+
+def app_with(table, registry, profiler=None):
+    router = APIRouter(route_class=ProfiledRoute)
+
+    @router.get("/items/{pk}")
+    def get_item(pk: str):
+        return table.get(pk) or {}
+
+    @router.post("/items")
+    def add_items(rows: list = Body(...)):
+        for row in rows:
+            table.insert(row)
+        return {"count": len(table)}
+
+    @router.get("/slow")
+    def slow():
+        time.sleep(0.05)
+        return {}
+
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware, metrics=registry, profiler=profiler)
+    app.include_router(router)
+    return app
+
+
+def test_requests_are_labelled_by_route_template_with_their_storage_calls():
+    registry = Metrics()
+    table = InstrumentedTable(Table(), "items")
+    client = TestClient(app_with(table, registry))
+    body = [{"id": f"i{n}"} for n in range(3)]
+    assert client.post("/items", json=body).json() == {"count": 3}
+    for pk in ("i0", "i1", "nope"):
+        client.get(f"/items/{pk}")
+    client.get("/missing")
+    text = registry.render()
+
+    assert sample(text, "tierflow_http_requests_total", method="GET", route="/items/{pk}", status=200) == 3
+    assert sample(text, "tierflow_http_requests_total", route="unmatched", status=404) == 1
+    assert "/items/i0" not in text
+    assert sample(text, "tierflow_storage_calls_total", route="/items", table="items", op="insert") == 3
+    assert sample(text, "tierflow_storage_calls_total", route="/items", table="items", op="len") == 1
+    assert sample(text, "tierflow_storage_calls_total", route="/items/{pk}", table="items", op="get") == 3
+    # Four calls in the one POST: the 5-call bucket holds it, the 2-call bucket doesn't
+    calls = dict(method="POST", route="/items")
+    assert sample(text, "tierflow_http_request_storage_calls_bucket", le="2", **calls) == 0
+    assert sample(text, "tierflow_http_request_storage_calls_bucket", le="5", **calls) == 1
+    assert sample(text, "tierflow_http_request_storage_calls_sum", **calls) == 4
+    request_bytes = len(client.build_request("POST", "/items", json=body).content)
+    assert sample(text, "tierflow_http_request_size_bytes_sum", **calls) == request_bytes
+    assert sample(text, "tierflow_http_response_size_bytes_sum", **calls) == len(b'{"count":3}')
+    assert sample(text, "tierflow_http_request_duration_seconds_count", method="GET", route="/items/{pk}") == 3
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = Metrics()
+    for seconds in (0.0005, 0.003, 0.003, 20.0):
+        registry.started()
+        registry.finished("GET", "/r", 200, seconds, 0, 0, metrics.Counter())
+    text = registry.render()
+    route = dict(method="GET", route="/r")
+    buckets = [sample(text, "tierflow_http_request_duration_seconds_bucket", le=le, **route)
+               for le in ("0.001", "0.0025", "0.005", "10.0", "+Inf")]
+    assert buckets == [1, 1, 3, 3, 4]
+    assert sample(text, "tierflow_http_request_duration_seconds_count", **route) == 4
+    assert "tierflow_http_requests_in_flight 0" in text.splitlines()
+
+
+def test_calls_outside_a_request_count_as_background():
+    metrics.registry, saved = Metrics(), metrics.registry
+    try:
+        table = InstrumentedTable(Table(rows=[{"id": "a"}]), "items")
+        assert "a" in table and table.get("a")["id"] == "a"
+        text = metrics.registry.render()
+    finally:
+        metrics.registry = saved
+    assert sample(text, "tierflow_storage_calls_total", route="background", op="contains") == 1
+    assert sample(text, "tierflow_storage_calls_total", route="background", op="get") == 1
+
+
+def test_slow_requests_keep_folded_stacks(tmp_path):
+    profiler = SlowRequestProfiler(0.02, interval=0.002, directory=str(tmp_path))
+    metrics.profiler, saved = profiler, metrics.profiler
+    try:
+        client = TestClient(app_with(InstrumentedTable(Table(), "items"), Metrics(), profiler))
+        client.get("/slow")
+        client.get("/items/x")  # fast: not kept
+    finally:
+        metrics.profiler = saved
+    assert [r["route"] for r in profiler.recent] == ["/slow"]
+    record = profiler.recent[0]
+    assert record["duration_ms"] >= 50 and record["samples"] > 0
+    # Stacks start at the endpoint, not at the server machinery that called it
+    assert all(re.match(r"slow \(test_metrics\.py:\d+\)", line) for line in record["folded"].splitlines())
+    [written] = tmp_path.iterdir()
+    assert written.name.endswith("-GET-slow.folded")
+    assert written.read_text().strip() == record["folded"]
+
+
+def test_gateway_exposes_metrics_for_service_routes():
+    with TestClient(create_app()) as client:
+        client.get("/membership/tiers/metrics-creator")
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        text = response.text
+        route = "/membership/tiers/{creator_id}"
+        assert sample(text, "tierflow_http_requests_total", method="GET", route=route, status=200) >= 1
+        assert sample(text, "tierflow_storage_calls_total", route=route, table="tiers", op="find") >= 1
+        if metrics.profiler is None:
+            assert client.get("/metrics/slow-requests").status_code == 404
@@ -0,0 +1,71 @@
+import random
+
+import pytest
+from fastapi.testclient import TestClient
+
+from catalog import VideoCatalog
+from gateway import create_app
+from pagination import decode_cursor, encode_cursor, paginate
+from store import Table
+
+ORDERED = (("creator_id", "ml_score"),)
+
+
+def video(i, rng):
+    # Few distinct scores, so most of the order is decided by the id tie-break
+    return {"id": f"video{i}", "creator_id": "creator1", "ml_score": float(rng.choice([35, 50, 65, 80])),
+            "tags": rng.choice(["a", "b"])}
+
+
+@pytest.mark.parametrize("descending", [False, True])
+@pytest.mark.parametrize("make", [lambda: Table(indexes=("creator_id",), ordered=ORDERED),
+                                  lambda: VideoCatalog(indexes=("creator_id",), ordered=ORDERED)])
+def test_pages_have_no_gaps_or_duplicates_under_inserts(make, descending):
+    rng = random.Random(5)
+    table = make()
+    for i in range(100):
+        table.insert(video(i, rng))
+    before = {row["id"] for row in table}
+    seen, cursor, added = [], None, 100
+    while True:
+        after = decode_cursor(cursor) if cursor else None
+        rows = table.scan("creator_id", "creator1", "ml_score", after=after, descending=descending)
+        page, cursor = paginate(rows, 7, "ml_score", lambda v: v["tags"] == "a" or v["ml_score"] > 40)
+        seen.extend((row["ml_score"], row["id"]) for row in page)
+        if cursor is None:
+            break
+        for _ in range(5):  # land on both sides of the cursor
+            table.insert(video(added, rng))
+            added += 1
+    ids = [pk for _, pk in seen]
+    assert len(ids) == len(set(ids))
+    assert seen == sorted(seen, reverse=descending)
+    expected = {pk for pk in before if table.get(pk)["tags"] == "a" or table.get(pk)["ml_score"] > 40}
+    assert expected <= set(ids)
+
+
+def test_cursor_round_trip_and_rejects_garbage():
+    row = {"id": "video9", "created_at": "2025-01-01T00:00:00Z"}
+    assert decode_cursor(encode_cursor(row, "created_at")) == ("2025-01-01T00:00:00Z", "video9")
+    with pytest.raises(ValueError):
+        decode_cursor("not a cursor")
+
+
+def test_subscription_pages_through_the_api_while_subscribing():
+    with TestClient(create_app()) as client:
+        for _ in range(5):
+            client.post("/membership/subscribe/", data={"user_id": "pager", "tier_id": "tier1"})
+        seen, cursor = [], None
+        while True:
+            params = {"limit": 2, "cursor": cursor} if cursor else {"limit": 2}
+            response = client.get("/membership/subscriptions/pager", params=params)
+            seen.extend(sub["id"] for sub in response.json())
+            cursor = response.headers.get("X-Next-Cursor")
+            if cursor is None:
+                break
+            if len(seen) < 8:
+                client.post("/membership/subscribe/", data={"user_id": "pager", "tier_id": "tier2"})
+        everything = client.get("/membership/subscriptions/pager", params={"limit": 500}).json()
+        assert seen == [sub["id"] for sub in everything]
+        assert client.get("/membership/subscriptions/pager", params={"cursor": "%%%"}).status_code == 400
+        assert client.get("/content/creator/creator1", params={"cursor": "%%%"}).status_code == 400
@@ -0,0 +1,128 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from datetime import date
+
+import pytest
+
+from conftest import BACKEND
+from payout import PayoutEngine
+from persistence import Database
+
+DAY = date(2025, 1, 2)
+
+
+def test_a_day_settles_once_under_concurrent_calls():
+    engine = PayoutEngine()
+    engine.record("creator1", 10.0)
+    run = engine._run
+
+    def slow_run(items):
+        time.sleep(0.05)  # widen the window between the check and the update
+        engine.record("creator1", 1.0)  # earned while the day is being closed
+        return run(items)
+
+    engine._run = slow_run
+    results = []
+
+    def settle():
+        try:
+            results.append(engine.settle_day(DAY)["creators"])
+        except ValueError:
+            results.append("settled")
+
+    threads = [threading.Thread(target=settle) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(results, key=str) == [1, "settled", "settled", "settled"]
+    summary = engine.summary("creator1")
+    assert summary["days"] == [DAY.isoformat()]
+    assert summary["recent_daily_earnings"] == [10.0]
+    assert summary["pending_earnings"] == 1.0
+
+
+def test_workers_share_one_payout_ledger(tmp_path):
+    def worker():
+        db = Database(f"sqlite:///{tmp_path / 'tierflow.db'}")
+        return PayoutEngine(creators=db.table("payouts", key="creator_id"), days=db.table("payout_days"))
+
+    first, second = worker(), worker()
+    first.record("creator1", 10.0)
+    second.record("creator1", 5.0)
+    assert second.settle_day(DAY)["creators"] == 1
+    assert first.last_settled == DAY
+    with pytest.raises(ValueError):
+        first.settle_day(DAY)
+    assert first.summary("creator1")["recent_daily_earnings"] == [15.0]
+
+
+# One backend run with a state snapshot: earn and settle, or (after a restart) read the ledger back
+RUN = """
+import json, sys
+from datetime import date
+from fastapi.testclient import TestClient
+import mainC
+from membership_models import payout_engine
+
+with TestClient(mainC.app) as client:
+    if sys.argv[1] == "first":
+        client.post("/membership/subscribe/", data={"user_id": "payer", "tier_id": "tier1"})
+        client.post("/membership/payout/settle", params={"day": "2025-01-02"})
+        client.post("/membership/subscribe/", data={"user_id": "payer", "tier_id": "tier2"})
+    again = client.post("/membership/payout/settle", params={"day": "2025-01-02"}).status_code
+print(json.dumps({"again": again, "summary": payout_engine.summary("creator1")}))
+"""
+
+
+def test_payouts_survive_a_restart(tmp_path):
+    env = {**os.environ, "TIERFLOW_SNAPSHOT_DIR": str(tmp_path), "TIERFLOW_SNAPSHOT_INTERVAL": "0"}
+
+    def run(phase):
+        output = subprocess.run([sys.executable, "-c", RUN, phase], cwd=BACKEND, env=env, check=True,
+                                capture_output=True, text=True).stdout
+        return json.loads(output.strip().splitlines()[-1])
+
+    first, second = run("first"), run("second")
+    assert second == first
+    assert second["again"] == 409
+    assert second["summary"]["recent_daily_earnings"] == [4.99]
+    assert second["summary"]["pending_earnings"] == 9.99
+
+
+def test_payouts_follow_the_rolling_window_and_ema():
+    engine = PayoutEngine()
+    earnings = [30.0, 60.0, 90.0, 0.0, 120.0]
+    for offset, amount in enumerate(earnings):
+        engine.record("creator1", amount)
+        engine.settle_day(date(2025, 2, 1 + offset))
+    summary = engine.summary("creator1")
+    # Each day pays the previous WINDOW days' earnings, spread evenly, with the uplift
+    rolling = [1.06 * sum(earnings[max(0, d - 3):d]) / 3 for d in range(len(earnings))]
+    assert summary["smoothed_payouts"] == [round(r, 2) for r in rolling]
+    ema = earnings[0]
+    expected = [ema]
+    for amount in earnings[1:]:
+        ema = 0.3 * amount + 0.7 * ema
+        expected.append(ema)
+    assert summary["ema_payouts"] == [round(1.06 * e, 2) for e in expected]
+    assert summary["recent_daily_earnings"] == earnings[-3:]
+    assert summary["pending_earnings"] == 0
+    assert summary["days"][0] == "2025-02-01" and len(summary["days"]) == 5
+
+
+def test_process_pool_settles_like_one_process(monkeypatch):
+    monkeypatch.setattr("payout.CHUNK_SIZE", 7)
+    engines = [PayoutEngine(workers=1), PayoutEngine(workers=2)]
+    for engine in engines:
+        for day in range(3):
+            for i in range(40):
+                engine.record(f"creator{i}", (i * 7 + day * 13) % 50 + 0.25)
+            engine.settle_day(date(2025, 3, 1 + day))
+    serial, pooled = engines
+    assert [serial.summary(f"creator{i}") for i in range(40)] == [pooled.summary(f"creator{i}") for i in range(40)]
+    assert serial.settle_day(date(2025, 3, 9)) == pooled.settle_day(date(2025, 3, 9))
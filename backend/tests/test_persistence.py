@@ -0,0 +1,18 @@
+import sqlite3
+
+from persistence import Database
+
+
+def test_tables_live_beside_the_supabase_schema(tmp_path):
+    # The supabase migrations already own these names, with UUID ids and no record column
+    path = tmp_path / "tierflow.db"
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE tiers (id TEXT PRIMARY KEY, creator_id TEXT NOT NULL, name TEXT NOT NULL, price REAL)")
+    conn.commit()
+    conn.close()
+
+    db = Database(f"sqlite:///{path}")
+    tiers = db.table("tiers", indexes=("creator_id",), seed=[{"id": "tier1", "creator_id": "creator1", "price": 5.0}])
+    tiers.insert({"id": tiers.next_id("tier"), "creator_id": "creator1", "price": 9.0})
+    assert [t["id"] for t in tiers.find("creator_id", "creator1")] == ["tier1", "tier2"]
+    assert sqlite3.connect(path).execute("SELECT COUNT(*) FROM tiers").fetchone() == (0,)
@@ -0,0 +1,93 @@
+import json
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+from catalog import VideoCatalog
+from gateway import create_app
+from responses import FastJSONResponse, ResponseCache, dumps
+
+
+def test_hits_skip_the_query_until_the_scope_is_invalidated():
+    cache = ResponseCache()
+    rows = [{"id": 1}]
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return list(rows)
+
+    first = cache.respond("creator", "tiers", compute)
+    assert cache.respond("creator", "tiers", compute).headers["ETag"] == first.headers["ETag"]
+    cache.invalidate("other-creator")
+    cache.respond("creator", "tiers", compute)
+    assert len(calls) == 1
+
+    rows.append({"id": 2})
+    cache.invalidate("creator")
+    changed = cache.respond("creator", "tiers", compute)
+    assert len(calls) == 2
+    assert changed.headers["ETag"] != first.headers["ETag"]
+    assert changed.body == b'[{"id":1},{"id":2}]'
+
+
+def test_if_none_match_gets_a_bodiless_304():
+    cache = ResponseCache()
+    etag = cache.respond("creator", "tiers", lambda: []).headers["ETag"]
+    for header in (etag, f"W/{etag}", f'"stale", {etag}', "*"):
+        response = cache.respond("creator", "tiers", lambda: [], header)
+        assert response.status_code == 304 and response.body == b""
+        assert response.headers["ETag"] == etag
+    assert cache.respond("creator", "tiers", lambda: [], '"stale"').status_code == 200
+
+
+def test_expired_entries_are_rebuilt():
+    cache = ResponseCache(ttl=0)
+    calls = []
+    cache.respond("creator", "tiers", lambda: calls.append(1) or [])
+    cache.respond("creator", "tiers", lambda: calls.append(1) or [])
+    assert len(calls) == 2
+
+
+def test_writes_change_the_etag_of_cached_routes():
+    with TestClient(create_app()) as client:
+        url = "/membership/tiers/etag-creator"
+        etag = client.get(url).headers["ETag"]
+        assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+
+        client.post("/membership/tiers/", json={"name": "Gold", "price": 5.0, "creator_id": "etag-creator"})
+        fresh = client.get(url, headers={"If-None-Match": etag})
+        assert fresh.status_code == 200
+        assert fresh.headers["ETag"] != etag
+        assert [t["name"] for t in fresh.json()] == ["Gold"]
+
+        dashboard = client.get("/membership/dashboard/etag-creator")
+        client.post("/membership/subscribe/", data={"user_id": "etag-fan", "tier_id": fresh.json()[0]["id"]})
+        after = client.get("/membership/dashboard/etag-creator", headers={"If-None-Match": dashboard.headers["ETag"]})
+        assert after.status_code == 200 and after.json() != dashboard.json()
+
+
+def test_dumps_is_compact_and_handles_backend_types():
+    row = {"id": "video1", "score": np.float64(72.5), "splits": np.array([0.5, 0.75]), "count": np.int64(3),
+           1: "non-string key", "nested": {"ok": True, "none": None}}
+    body = dumps(row)
+    assert b" " not in body.replace(b"non-string key", b"")
+    assert json.loads(body) == {"id": "video1", "score": 72.5, "splits": [0.5, 0.75], "count": 3, "1": "non-string key",
+                                "nested": {"ok": True, "none": None}}
+
+
+def test_catalog_rows_serialize_as_plain_objects():
+    catalog = VideoCatalog(indexes=("creator_id",))
+    catalog.insert({"id": "video1", "creator_id": "c1", "title": "Clip", "ml_score": 55.0, "likes": 3})
+    row = catalog.get("video1")
+    assert json.loads(dumps([row])) == [{"id": "video1", "creator_id": "c1", "title": "Clip", "ml_score": 55.0, "likes": 3}]
+    assert json.loads(FastJSONResponse([row]).body) == json.loads(dumps([row]))
+
+
+def test_routes_answer_with_orjson_bodies():
+    with TestClient(create_app()) as client:
+        response = client.get("/membership/tiers/creator1")
+        assert response.headers["content-type"] == "application/json"
+        assert response.content == dumps(response.json())
+        listing = client.get("/content/creator/creator1", params={"limit": 1})
+        assert listing.status_code == 200 and listing.content == dumps(listing.json())
@@ -0,0 +1,60 @@
+import pytest
+
+from search import SearchIndex
+
+VIDEOS = [
+    {"id": "v1", "title": "Sourdough basics", "description": "bread bread bread", "tags": "baking, bread",
+     "ml_score": 40},
+    {"id": "v2", "title": "Bread", "description": "a quick loaf", "tags": "baking", "ml_score": 90},
+    {"id": "v3", "title": "Pasta night", "description": "fresh pasta and a little bread", "tags": "cooking",
+     "ml_score": 70},
+    {"id": "v4", "title": "Knife skills", "description": "chopping onions", "tags": "cooking, basics",
+     "ml_score": 60},
+]
+
+
+def ranked(index, query, tags=(), boost=0.0):
+    return [video_id for video_id, _ in index.search(query, tags, boost)]
+
+
+def test_bm25_ranks_by_term_weight_and_rarity():
+    index = SearchIndex.from_rows(VIDEOS)
+    # Title words count double and the short title/description wins; the passing mention comes last
+    assert ranked(index, "bread") == ["v1", "v2", "v3"]
+    # A rare word outweighs a common one
+    assert ranked(index, "bread onions")[0] == "v4"
+    assert ranked(index, "nothing matches") == []
+
+
+def test_tags_filter_and_rank_by_quality():
+    index = SearchIndex.from_rows(VIDEOS)
+    assert ranked(index, "", ["baking"]) == ["v2", "v1"]
+    assert ranked(index, "", ["Baking", "bread"]) == ["v1"]
+    assert ranked(index, "bread", ["cooking"]) == ["v3"]
+    # A tag is an exact term, not a word in the text
+    assert ranked(index, "", ["basics"]) == ["v4"]
+    assert ranked(index, "bread", boost=1.0)[0] == "v2"
+
+
+def test_reindexing_does_not_skew_scores():
+    fresh = SearchIndex.from_rows(VIDEOS)
+    churned = SearchIndex.from_rows(VIDEOS)
+    for _ in range(5):
+        churned.add(dict(VIDEOS[0]))  # dead postings of each old copy stay until compaction
+    churned.remove("v4")
+    churned.add(dict(VIDEOS[3]))
+    assert list(churned.search("bread onions")) == pytest.approx(list(fresh.search("bread onions")))
+
+
+def test_search_survives_save_and_open(tmp_path):
+    index = SearchIndex.from_rows(VIDEOS, directory=str(tmp_path))
+    index.remove("v3")
+    index.set_quality("v1", 95)
+    assert index.save()
+    rows = [dict(v, ml_score=95) if v["id"] == "v1" else v for v in VIDEOS if v["id"] != "v3"]
+    rows.append({"id": "v5", "title": "Bread pudding", "tags": "baking"})
+    reopened = SearchIndex.open(str(tmp_path), rows)
+    assert list(reopened.search("bread")) == pytest.approx(list(SearchIndex.from_rows(rows).search("bread")))
+    assert ranked(reopened, "", ["baking"]) == ["v1", "v2", "v5"]
+    assert ranked(reopened, "pasta") == []
+    assert len(reopened) == 4
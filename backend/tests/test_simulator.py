@@ -0,0 +1,45 @@
+import pytest
+
+from models import calculate_ml_score, calculate_revenue_split
+from simulator import simulate
+
+TIERS = [{"id": "tier1", "price": 5.0, "subscriberCount": 100}, {"id": "tier2", "price": 20.0, "subscriberCount": 10}]
+ITEMS = [{"id": "item1", "price": 19.99, "purchaseCount": 45}]
+VIDEOS = [
+    {"id": "v1", "watch_time": 150, "likes": 1200, "comments": 120, "shares": 60, "is_original": True,
+     "unique_perspective": True, "trending_topic": True, "searchable_content": True},
+    {"id": "v2", "watch_time": 90, "likes": 300, "comments": 20, "shares": 5, "is_original": True},
+    {"id": "v3", "watch_time": 10, "likes": 0, "comments": 0, "shares": 0, "is_original": False,
+     "no_ads": False, "searchable_content": False},
+]
+
+
+def test_baseline_matches_current_earnings():
+    result = simulate(VIDEOS, TIERS, ITEMS, [{}], months=3)
+    gross = 5.0 * 100 + 20.0 * 10
+    watched = sum(v["watch_time"] for v in VIDEOS)
+    earned = sum(gross * v["watch_time"] / watched * calculate_revenue_split(calculate_ml_score(v)) for v in VIDEOS)
+    baseline = result["scenarios"][0]
+    assert baseline["gross_revenue"] == gross
+    assert baseline["creator_earnings"] == pytest.approx(earned, abs=0.01)
+    assert baseline["payouts"]["immediate"] == [baseline["creator_earnings"]] * 3
+    # An empty scenario is the baseline again
+    assert result["scenarios"][1]["creator_earnings"] == baseline["creator_earnings"]
+
+
+def test_one_time_sales_stay_out_of_monthly_revenue():
+    with_items = simulate(VIDEOS, TIERS, ITEMS, [{}])
+    without = simulate(VIDEOS, TIERS, [], [{}])
+    assert with_items["scenarios"] == without["scenarios"]
+    assert with_items["one_time_sales_to_date"] == round(19.99 * 45, 2)
+
+
+def test_scenarios_change_price_and_flags():
+    result = simulate(VIDEOS, TIERS, [], [
+        {"name": "raise", "tiers": {"tier1": {"price": 6.0, "subscriber_delta": -10}}},
+        {"name": "trending", "videos": {"v2": {"trending_topic": True}}},
+    ])
+    baseline, raised, trending = result["scenarios"]
+    assert raised["gross_revenue"] == 6.0 * 90 + 20.0 * 10
+    assert trending["gross_revenue"] == baseline["gross_revenue"]
+    assert trending["videos_changed"] == 1 and trending["change"] > 0
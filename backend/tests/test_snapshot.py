@@ -0,0 +1,56 @@
+import json
+import os
+import subprocess
+import sys
+
+from conftest import BACKEND
+
+# One backend run against a state snapshot; the app's shutdown saves it
+RUN = """
+import json, sys
+from fastapi.testclient import TestClient
+import mainC
+
+items = [{"creator_id": "creator1", "minTier": tier} for tier in ("tier1", "tier2")]
+with TestClient(mainC.app) as client:
+    if sys.argv[1] == "first":
+        tier = client.post("/membership/tiers/", json={"name": "Gone", "price": 2.0, "creator_id": "creator1"}).json()
+        client.delete(f"/membership/tiers/{tier['id']}")
+        for user in ("u1", "u2"):
+            client.post("/membership/subscribe/", data={"user_id": user, "tier_id": "tier1"})
+        client.post("/membership/subscribe/", data={"user_id": "u3", "tier_id": "tier2"})
+        result = {"deleted": tier["id"]}
+    else:
+        client.post("/membership/subscribe/", data={"user_id": "u4", "tier_id": "tier2"})
+        subs = client.get("/membership/subscriptions/u1").json()
+        client.post("/membership/unsubscribe/", data={"subscription_id": subs[0]["id"]})
+        tier = client.post("/membership/tiers/", json={"name": "New", "price": 3.0, "creator_id": "creator1"}).json()
+        series = client.get("/membership/revenue/creator1/series", params={"resolution": "month"}).json()
+        result = {
+            "created": tier["id"],
+            "verify": client.get("/membership/dashboard/creator1/verify").json(),
+            "totals": series["totals"],
+            "access": {user: client.post("/membership/entitlements/check",
+                                         json={"user_id": user, "items": items}).json()["allowed"]
+                       for user in ("u1", "u2", "u3", "u4")},
+        }
+print(json.dumps(result))
+"""
+
+
+def run_backend(snapshot_dir, phase):
+    env = {**os.environ, "TIERFLOW_SNAPSHOT_DIR": str(snapshot_dir), "TIERFLOW_SNAPSHOT_INTERVAL": "0"}
+    output = subprocess.run([sys.executable, "-c", RUN, phase], cwd=BACKEND, env=env, check=True,
+                            capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def test_writes_after_warm_restart_are_counted_once(tmp_path):
+    first = run_backend(tmp_path, "first")
+    second = run_backend(tmp_path, "second")
+    assert second["verify"]["consistent"], second["verify"]
+    assert second["totals"]["subscriptions"] == 4
+    assert second["totals"]["cancellations"] == 1
+    assert second["access"] == {"u1": [False, False], "u2": [True, False], "u3": [True, True], "u4": [True, True]}
+    # Ids of rows deleted before the restart are not handed out again
+    assert second["created"] != first["deleted"]
@@ -0,0 +1,66 @@
+import random
+
+import pytest
+
+from store import Table
+
+
+def test_indexes_follow_every_write():
+    # Random writes, checked against a plain list scan after each one
+    rng = random.Random(1)
+    table = Table(indexes=("creator_id", "tier_id"), ordered=(("creator_id", "price"),))
+    for step in range(2000):
+        pk = f"row{rng.randrange(50)}"
+        op = rng.randrange(4)
+        row = {"id": pk, "creator_id": f"c{rng.randrange(5)}", "tier_id": rng.choice(["t1", "t2", None]),
+               "price": rng.choice([1.0, 2.5, 9.0, None])}
+        if op == 0:
+            table.insert_new(row)
+        elif op == 1:
+            table.update(pk, {k: v for k, v in row.items() if rng.random() < 0.5})
+        elif op == 2:
+            table.upsert(row)
+        else:
+            table.delete(pk)
+        rows = list(table)
+        for field in ("creator_id", "tier_id"):
+            for value in ("c0", "c3", "t1", None):
+                expected = sorted(r["id"] for r in rows if r.get(field) == value)
+                assert sorted(r["id"] for r in table.find(field, value)) == expected
+                assert table.count(field, value) == len(expected)
+        for creator in ("c0", "c4"):
+            expected = sorted((r["price"], r["id"]) for r in rows if r["creator_id"] == creator and r["price"] is not None)
+            assert [(r["price"], r["id"]) for r in table.scan("creator_id", creator, "price")] == expected
+
+
+def test_scan_bounds_cursor_and_direction():
+    table = Table(indexes=("creator_id",), ordered=(("creator_id", "at"),),
+                  rows=[{"id": f"v{i}", "creator_id": "c1", "at": i % 5} for i in range(10)])
+    keys = [(r["at"], r["id"]) for r in table.scan("creator_id", "c1", "at")]
+    assert keys == sorted(keys)
+    assert [r["id"] for r in table.scan("creator_id", "c1", "at", low=1, high=2)] == ["v1", "v6", "v2", "v7"]
+    assert [r["id"] for r in table.scan("creator_id", "c1", "at", after=(2, "v2"))][:2] == ["v7", "v3"]
+    assert [r["id"] for r in table.scan("creator_id", "c1", "at", after=(2, "v2"), descending=True)][:2] == ["v6", "v1"]
+    assert list(table.scan("creator_id", "nobody", "at")) == []
+
+
+def test_rows_are_replaced_not_mutated():
+    table = Table(indexes=("tier_id",))
+    first = table.insert({"id": "s1", "tier_id": "t1", "count": 1})
+    table.increment("s1", "count")
+    table.modify("s1", lambda row: {"tier_id": "t2", "count": row["count"] * 10})
+    assert first == {"id": "s1", "tier_id": "t1", "count": 1}
+    assert table.get("s1") == {"id": "s1", "tier_id": "t2", "count": 20}
+    assert table.find("tier_id", "t1") == [] and table.update("missing", {"x": 1}) is None
+
+
+def test_keys_are_unique_and_never_reused():
+    table = Table(rows=[{"id": "tier3"}, {"id": "tier7"}])
+    with pytest.raises(KeyError):
+        table.insert({"id": "tier3"})
+    assert not table.insert_new({"id": "tier7"})
+    assert table.next_id("tier") == "tier8"
+    table.delete("tier7")
+    assert table.next_id("tier") == "tier9"
+    with pytest.raises(KeyError):
+        Table(rows=[{"id": "a"}, {"id": "a"}])
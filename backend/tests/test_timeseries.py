@@ -0,0 +1,125 @@
+from datetime import datetime, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+
+from gateway import create_app
+from store import Table
+from timeseries import RevenueSeries, bucket_count, bucket_start, next_bucket
+
+KEEP_ALL = {"minute": None, "hour": None}
+
+
+def at(*args):
+    return datetime(*args, tzinfo=timezone.utc).timestamp()
+
+
+def series(**kwargs):
+    return RevenueSeries(Table(ordered=(("series", "bucket"),)), interval=3600, **kwargs)
+
+
+def revenue(result):
+    return {p["t"]: p["revenue"] for p in result["points"] if p["revenue"]}
+
+
+def test_buckets_split_on_utc_calendar_edges():
+    assert bucket_start("month", at(2024, 1, 31, 23, 59, 59)) == at(2024, 1, 1)
+    assert bucket_start("month", at(2024, 2, 1)) == at(2024, 2, 1)
+    assert bucket_start("day", at(2023, 12, 31, 23, 59, 59)) == at(2023, 12, 31)
+    assert bucket_start("hour", at(2024, 3, 1, 10, 59, 59)) == at(2024, 3, 1, 10)
+    assert bucket_start("minute", at(2024, 3, 1, 10, 0, 59, 999999)) == at(2024, 3, 1, 10)
+    # Leap-year February, and December rolls over into next year
+    assert next_bucket("month", at(2024, 2, 1)) - at(2024, 2, 1) == 29 * 86400
+    assert next_bucket("month", at(2023, 2, 1)) - at(2023, 2, 1) == 28 * 86400
+    assert next_bucket("month", at(2023, 12, 1)) == at(2024, 1, 1)
+    assert bucket_count("month", at(2023, 11, 30), at(2024, 2, 1)) == 4
+    assert bucket_count("day", at(2024, 2, 28, 23), at(2024, 3, 1)) == 3
+    assert bucket_count("hour", at(2024, 1, 1, 0, 30), at(2024, 1, 1, 0, 59)) == 1
+
+
+def test_events_either_side_of_midnight_land_in_their_own_buckets():
+    revenues = series(retention=KEEP_ALL)
+    revenues.record("c1", revenue=1.0, subscriptions=1, at=at(2023, 12, 31, 23, 59, 59))
+    revenues.record("c1", revenue=2.0, subscriptions=1, at=at(2024, 1, 1))
+    revenues.record("c1", revenue=4.0, cancellations=1, at=at(2024, 1, 31, 23, 59, 59))
+    revenues.record("c1", revenue=8.0, purchases=1, at=at(2024, 2, 1))
+    start, end = at(2023, 12, 31, 23, 59), at(2024, 2, 1, 0, 0, 30)
+
+    assert revenue(revenues.query("c1", start, end, "month")) == {
+        "2023-12-01T00:00:00Z": 1.0, "2024-01-01T00:00:00Z": 6.0, "2024-02-01T00:00:00Z": 8.0}
+    assert revenue(revenues.query("c1", start, end, "day")) == {
+        "2023-12-31T00:00:00Z": 1.0, "2024-01-01T00:00:00Z": 2.0, "2024-01-31T00:00:00Z": 4.0,
+        "2024-02-01T00:00:00Z": 8.0}
+    edge = revenues.query("c1", at(2023, 12, 31, 23, 59), at(2024, 1, 1, 0, 0, 59), "minute")
+    assert [(p["t"], p["revenue"]) for p in edge["points"]] == [("2023-12-31T23:59:00Z", 1.0), ("2024-01-01T00:00:00Z", 2.0)]
+    assert (edge["start"], edge["end"]) == ("2023-12-31T23:59:00Z", "2024-01-01T00:01:00Z")
+
+
+def test_query_gap_fills_and_totals_add_up():
+    revenues = series(retention=KEEP_ALL)
+    for day, amount in ((1, 5.0), (1, 0.1), (4, 2.5)):
+        revenues.record("c1", revenue=amount, subscriptions=1, at=at(2024, 2, day, 12))
+    revenues.record("c1", cancellations=1, at=at(2024, 2, 5, 12))
+    revenues.record("c2", revenue=100.0, at=at(2024, 2, 2, 12))  # another creator's series
+    result = revenues.query("c1", at(2024, 2, 1), at(2024, 2, 5, 23, 59), "day")
+
+    assert [p["t"][:10] for p in result["points"]] == [f"2024-02-0{d}" for d in range(1, 6)]
+    assert [p["revenue"] for p in result["points"]] == [5.1, 0, 0, 2.5, 0]
+    assert [p["net_subscribers"] for p in result["points"]] == [2, 0, 0, 1, -1]
+    for field, total in result["totals"].items():
+        assert total == pytest.approx(sum(p[field] for p in result["points"]))
+    assert result["totals"]["revenue"] == 7.6
+
+
+def test_resolution_is_the_finest_that_fits_and_is_still_kept():
+    revenues = series()
+    now = datetime.now(timezone.utc).timestamp()
+    assert revenues.resolution_for(now - 3600, now) == "minute"
+    assert revenues.resolution_for(now - 3600, now, max_points=30) == "hour"
+    # Minute rollups are only kept for two days, hourly ones for ninety
+    assert revenues.resolution_for(now - 3 * 86400, now, max_points=10_000) == "hour"
+    assert revenues.resolution_for(now - 365 * 86400, now) == "day"
+    assert revenues.resolution_for(now - 3 * 365 * 86400, now) == "month"
+    with pytest.raises(ValueError):
+        revenues.resolution_for(now - 3 * 365 * 86400, now, max_points=12)
+
+
+def test_old_events_skip_rollups_past_their_retention():
+    revenues = series()
+    old = datetime.now(timezone.utc).timestamp() - 5 * 86400
+    revenues.record("c1", revenue=3.0, at=old)
+    assert revenues.query("c1", old, old + 60, "day")["totals"]["revenue"] == 3.0
+    assert revenues.query("c1", old, old + 60, "minute")["totals"]["revenue"] == 0
+
+
+def test_invalid_ranges_and_resolutions_are_rejected():
+    revenues = series()
+    with pytest.raises(ValueError):
+        revenues.query("c1", at(2024, 2, 2), at(2024, 2, 1))
+    with pytest.raises(ValueError):
+        revenues.query("c1", at(2024, 2, 1), at(2024, 2, 2), "week")
+    with pytest.raises(ValueError):
+        revenues.query("c1", at(2024, 1, 1), at(2024, 2, 1), "minute", max_points=100)
+
+
+def test_backfill_replays_subscriptions_on_file():
+    tiers = Table(rows=[{"id": "t1", "creator_id": "c1", "price": 4.99}])
+    subscriptions = [{"tier_id": "t1", "subscribed_at": "2024-01-31T23:59:59Z"},
+                     {"tier_id": "t1", "subscribed_at": "2024-02-01T00:00:00+00:00"},
+                     {"tier_id": "missing", "subscribed_at": "2024-02-01T00:00:00Z"},
+                     {"tier_id": "t1", "subscribed_at": "garbage"}]
+    revenues = RevenueSeries.from_tables(Table(ordered=(("series", "bucket"),)), subscriptions, tiers,
+                                         retention=KEEP_ALL)
+    result = revenues.query("c1", at(2024, 1, 15), at(2024, 2, 15), "month")
+    assert [(p["t"][:7], p["revenue"], p["subscriptions"]) for p in result["points"]] == [
+        ("2024-01", 4.99, 1), ("2024-02", 4.99, 1)]
+
+
+def test_series_route_validates_its_parameters():
+    with TestClient(create_app()) as client:
+        url = "/membership/revenue/series-creator/series"
+        params = {"start": "2024-01-01T00:00:00Z", "end": "2024-03-01T00:00:00Z"}
+        ok = client.get(url, params={**params, "resolution": "month"})
+        assert ok.status_code == 200 and len(ok.json()["points"]) == 3
+        assert client.get(url, params={**params, "resolution": "week"}).status_code == 400
+        assert client.get(url, params={"start": params["end"], "end": params["start"]}).status_code == 400
@@ -0,0 +1,153 @@
+import asyncio
+import hashlib
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from conftest import BACKEND
+from uploads import BlobStore, OffsetConflict, fcntl
+
+CONTENT = bytes(range(256)) * 4
+
+# One backend run: a direct upload and a resumable one, both processed before exiting
+RUN = """
+import json
+from fastapi.testclient import TestClient
+import mainC
+from content_models import videos_db
+from uploads import processing_queue
+
+client = TestClient(mainC.app)
+content = bytes(range(256)) * 4
+direct = client.post("/content/", files={"file": ("clip.mp4", content)},
+                     data={"title": "Clip", "minTier": "tier1", "creator_id": "creator1"}).json()
+session = client.post("/content/uploads", json={"title": "Clip", "minTier": "tier1", "size": len(content)}).json()
+session = client.put(f"/content/uploads/{session['upload_id']}", content=content, headers={"Upload-Offset": "0"}).json()
+resumable = client.post(f"/content/uploads/{session['upload_id']}/complete").json()
+processing_queue.join()
+print(json.dumps({"offset": session["offset"],
+                  "videos": [videos_db.get(v["id"]).to_dict() for v in (direct, resumable)]}))
+"""
+
+
+def run_backend(blob_dir):
+    env = {**os.environ, "TIERFLOW_BLOB_DIR": str(blob_dir)}
+    output = subprocess.run([sys.executable, "-c", RUN], cwd=BACKEND, env=env, check=True,
+                            capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def test_uploads_after_restart_get_fresh_blobs(tmp_path):
+    # In-memory video ids start again at video1, but the blob directory survives the restart
+    first, second = run_backend(tmp_path), run_backend(tmp_path)
+    assert [v["id"] for v in first["videos"]] == [v["id"] for v in second["videos"]]
+    assert second["offset"] == len(CONTENT)
+    for video in first["videos"] + second["videos"]:
+        assert video["status"] == "ready"
+        assert video["size_bytes"] == len(CONTENT)
+        assert video["sha256"] == hashlib.sha256(CONTENT).hexdigest()
+    assert len({v["blob_id"] for v in first["videos"] + second["videos"]}) == 4
+
+
+# Two backend runs sharing the blob directory and a state snapshot: start an upload, then finish it
+RESUME = """
+import json, sys
+from fastapi.testclient import TestClient
+import mainC
+from content_models import videos_db
+from uploads import processing_queue
+
+content = bytes(range(256)) * 4
+with TestClient(mainC.app) as client:
+    if sys.argv[1] == "start":
+        session = client.post("/content/uploads", json={"title": "Clip", "minTier": "tier1", "size": len(content)}).json()
+        client.put(f"/content/uploads/{session['upload_id']}", content=content[:100], headers={"Upload-Offset": "0"})
+        result = {"upload_id": session["upload_id"]}
+    else:
+        url = f"/content/uploads/{sys.argv[2]}"
+        offset = client.get(url).json()["offset"]
+        stale = client.put(url, content=content[:100], headers={"Upload-Offset": "0"}).status_code
+        client.put(url, content=content[offset:], headers={"Upload-Offset": str(offset)})
+        video = client.post(f"{url}/complete").json()
+        processing_queue.join()
+        result = {"offset": offset, "stale": stale, "video": videos_db.get(video["id"]).to_dict()}
+print(json.dumps(result))
+"""
+
+
+def test_uploads_resume_after_restart(tmp_path):
+    env = {**os.environ, "TIERFLOW_BLOB_DIR": str(tmp_path / "blobs"), "TIERFLOW_SNAPSHOT_DIR": str(tmp_path / "state"),
+           "TIERFLOW_SNAPSHOT_INTERVAL": "0"}
+
+    def run(*args):
+        output = subprocess.run([sys.executable, "-c", RESUME, *args], cwd=BACKEND, env=env, check=True,
+                                capture_output=True, text=True).stdout
+        return json.loads(output.strip().splitlines()[-1])
+
+    resumed = run("finish", run("start")["upload_id"])
+    assert resumed["offset"] == 100
+    assert resumed["stale"] == 409
+    assert resumed["video"]["status"] == "ready"
+    assert resumed["video"]["sha256"] == hashlib.sha256(CONTENT).hexdigest()
+
+
+def test_one_of_two_appends_at_an_offset_wins(tmp_path):
+    blobs = BlobStore(str(tmp_path))
+
+    async def slowly(data):
+        for i in range(len(data)):
+            await asyncio.sleep(0.01)
+            yield data[i:i + 1]
+
+    async def put(data):
+        try:
+            return await blobs.append("blob", slowly(data), offset=0)
+        except OffsetConflict:
+            return "conflict"
+
+    async def both():
+        return await asyncio.gather(put(b"aaaa"), put(b"bbbb"))
+
+    assert sorted(asyncio.run(both()), key=str) == [4, "conflict"]
+    with open(blobs.path("blob"), "rb") as f:
+        assert f.read() in (b"aaaa", b"bbbb")
+
+
+@pytest.mark.skipif(fcntl is None, reason="flock is POSIX-only")
+def test_appends_are_exclusive_across_processes(tmp_path):
+    blobs = BlobStore(str(tmp_path))
+
+    async def one():
+        yield b"x"
+
+    with open(blobs.path("blob"), "ab") as other:
+        fcntl.flock(other.fileno(), fcntl.LOCK_EX)  # as another worker mid-append would
+        with pytest.raises(OffsetConflict):
+            asyncio.run(blobs.append("blob", one(), offset=0))
+    assert asyncio.run(blobs.append("blob", one(), offset=0)) == 1
+
+
+def test_processing_scores_engagement_that_lands_meanwhile(monkeypatch):
+    import content_service
+    from content_models import videos_db
+    from models import calculate_ml_score
+
+    video = content_service._new_video("clip.mp4", {"title": "Clip", "minTier": "tier1"})
+    videos_db.insert(video)
+    with open(content_service.blob_store.path(video["blob_id"]), "wb") as f:
+        f.write(CONTENT)
+    digest = content_service.blob_store.digest
+
+    def engaged_meanwhile(blob_id):
+        # An engagement batch applied while the blob is being hashed
+        videos_db.update(video["id"], {"likes": 5000, "comments": 500, "watch_time": 300})
+        return digest(blob_id)
+
+    monkeypatch.setattr(content_service.blob_store, "digest", engaged_meanwhile)
+    content_service.process_video(video["id"])
+    row = videos_db.get(video["id"])
+    assert row["likes"] == 5000
+    assert row["ml_score"] == calculate_ml_score(row)
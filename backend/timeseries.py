@@ -0,0 +1,226 @@
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from store import Row
+
+logger = logging.getLogger(__name__)
+
+FIELDS = ("revenue_cents", "subscriptions", "cancellations", "purchases")
+RESOLUTIONS = ("minute", "hour", "day", "month")  # finest first
+STEPS = {"minute": 60, "hour": 3600, "day": 86400}  # months are calendar months (UTC)
+RETENTION = {"minute": 2 * 86400, "hour": 90 * 86400, "day": None, "month": None}  # seconds kept, None = forever
+MAX_POINTS = 400
+FLUSH_INTERVAL = 1.0  # seconds events may be coalesced before they reach the rollups table
+PRUNE_INTERVAL = 600.0  # seconds between retention sweeps of one series
+
+_months: Dict[int, int] = {}  # day bucket -> month bucket
+
+
+def to_epoch(value: Any) -> Optional[float]:
+    """Epoch seconds for a datetime or ISO-8601 string; naive values are UTC."""
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    if not isinstance(value, datetime):
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def _iso(bucket: int) -> str:
+    return datetime.fromtimestamp(bucket, timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+def bucket_start(resolution: str, at: float) -> int:
+    step = STEPS.get(resolution)
+    if step:
+        return int(at // step * step)
+    day = int(at // 86400 * 86400)
+    month = _months.get(day)
+    if month is None:
+        d = datetime.fromtimestamp(day, timezone.utc)
+        month = _months[day] = int(datetime(d.year, d.month, 1, tzinfo=timezone.utc).timestamp())
+    return month
+
+
+def next_bucket(resolution: str, bucket: int) -> int:
+    step = STEPS.get(resolution)
+    if step:
+        return bucket + step
+    d = datetime.fromtimestamp(bucket, timezone.utc)
+    year, month = divmod(d.year * 12 + d.month, 12)  # d.month is 1-based, so this is already next month
+    return int(datetime(year, month + 1, 1, tzinfo=timezone.utc).timestamp())
+
+
+def bucket_count(resolution: str, start: float, end: float) -> int:
+    step = STEPS.get(resolution)
+    if step:
+        return (bucket_start(resolution, end) - bucket_start(resolution, start)) // step + 1
+    first = datetime.fromtimestamp(start, timezone.utc)
+    last = datetime.fromtimestamp(end, timezone.utc)
+    return (last.year - first.year) * 12 + last.month - first.month + 1
+
+
+def _cents(amount: Any) -> int:
+    return int(round((amount or 0) * 100))
+
+
+class RevenueSeries:
+    """
+    Per-creator revenue and subscriber time series with minute, hour, day and
+    month rollups. Each event adds into its bucket at every resolution, so the
+    rollups are maintained incrementally and a range query reads at most
+    max_points pre-aggregated rows at the finest resolution that fits, never
+    raw events. Events are coalesced in memory and added to the rollups table
+    in the background (and before each query), so a burst costs one row write
+    per bucket; with a shared database every worker adds into the same rows.
+    """
+
+    def __init__(self, rollups, interval: float = FLUSH_INTERVAL, retention: Optional[Dict[str, Optional[int]]] = None):
+        self.rollups = rollups  # table ordered by ("series", "bucket")
+        self.interval = interval
+        self.retention = dict(RETENTION, **(retention or {}))
+        self._pending: Dict[str, Dict[Tuple[str, int], List[int]]] = {}  # creator_id -> (resolution, bucket) -> deltas
+        self._pruned: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_tables(cls, rollups, subscriptions, tiers, **kwargs) -> "RevenueSeries":
+        """Backfill from the subscriptions still on file; purchases keep no per-sale rows to replay."""
+        series = cls(rollups, **kwargs)
+        for sub in subscriptions:
+            tier = tiers.get(sub.get("tier_id"))
+            at = to_epoch(sub.get("subscribed_at"))
+            if tier is not None and at is not None:
+                series.record(tier.get("creator_id"), revenue=tier.get("price"), subscriptions=1, at=at)
+        series.flush()
+        return series
+
+    def record(self, creator_id: str, revenue: float = 0.0, subscriptions: int = 0, cancellations: int = 0,
+               purchases: int = 0, at: Optional[float] = None) -> None:
+        now = time.time()
+        at = now if at is None else at
+        delta = (_cents(revenue), subscriptions, cancellations, purchases)
+        with self._lock:
+            pending = self._pending.setdefault(creator_id, {})
+            for resolution in RESOLUTIONS:
+                keep = self.retention[resolution]
+                if keep is not None and at < now - keep:
+                    continue  # older than this resolution keeps
+                key = (resolution, bucket_start(resolution, at))
+                acc = pending.get(key)
+                if acc is None:
+                    pending[key] = list(delta)
+                else:
+                    for i, d in enumerate(delta):
+                        acc[i] += d
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True, name="revenue-series-flush")
+                self._thread.start()
+
+    def flush(self, creator_id: Optional[str] = None) -> None:
+        """Add coalesced events (all, or one creator's) into the rollups table."""
+        with self._flush_lock:
+            with self._lock:
+                if creator_id is None:
+                    batches, self._pending = self._pending, {}
+                else:
+                    pending = self._pending.pop(creator_id, None)
+                    batches = {creator_id: pending} if pending else {}
+            for creator, buckets in batches.items():
+                for (resolution, bucket), delta in buckets.items():
+                    self._add(creator, resolution, bucket, delta)
+                self._prune(creator)
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Revenue series flush failed")
+
+    def _add(self, creator_id: str, resolution: str, bucket: int, delta: List[int]) -> None:
+        pk = f"{creator_id}|{resolution}|{bucket}"
+
+        def add(row: Row) -> Row:
+            return {field: (row.get(field) or 0) + d for field, d in zip(FIELDS, delta)}
+
+        if self.rollups.modify(pk, add) is None:
+            row = {"id": pk, "series": f"{creator_id}|{resolution}", "bucket": bucket, **dict(zip(FIELDS, delta))}
+            if not self.rollups.insert_new(row):
+                self.rollups.modify(pk, add)  # another worker created the bucket first
+
+    def _prune(self, creator_id: str) -> None:
+        now = time.time()
+        for resolution, keep in self.retention.items():
+            series = f"{creator_id}|{resolution}"
+            if keep is None or now - self._pruned.get(series, 0) < PRUNE_INTERVAL:
+                continue
+            self._pruned[series] = now
+            expired = list(self.rollups.scan("series", series, "bucket", high=bucket_start(resolution, now - keep) - 1))
+            for row in expired:
+                self.rollups.delete(row["id"])
+
+    def resolution_for(self, start: float, end: float, max_points: int = MAX_POINTS) -> str:
+        """Finest resolution that still holds data back to start and fits the range in max_points buckets."""
+        now = time.time()
+        for resolution in RESOLUTIONS:
+            keep = self.retention[resolution]
+            if keep is not None and start < now - keep:
+                continue
+            if bucket_count(resolution, start, end) <= max_points:
+                return resolution
+        raise ValueError(f"Range needs more than {max_points} monthly points")
+
+    def query(self, creator_id: str, start: float, end: float, resolution: Optional[str] = None,
+              max_points: int = MAX_POINTS) -> Dict[str, Any]:
+        """Gap-filled buckets covering [start, end]; raises ValueError for an invalid range or resolution."""
+        if end < start:
+            raise ValueError("end must not be before start")
+        if resolution is None:
+            resolution = self.resolution_for(start, end, max_points)
+        elif resolution not in RESOLUTIONS:
+            raise ValueError(f"resolution must be one of {', '.join(RESOLUTIONS)}")
+        elif bucket_count(resolution, start, end) > max_points:
+            raise ValueError(f"Range needs more than {max_points} {resolution} points")
+        self.flush(creator_id)
+        first, last = bucket_start(resolution, start), bucket_start(resolution, end)
+        rows = {row["bucket"]: row for row in
+                self.rollups.scan("series", f"{creator_id}|{resolution}", "bucket", low=first, high=last)}
+        points = []
+        totals = [0] * len(FIELDS)
+        bucket = first
+        while bucket <= last:
+            row = rows.get(bucket)
+            values = [row.get(field) or 0 for field in FIELDS] if row else [0] * len(FIELDS)
+            points.append({"t": _iso(bucket), **_values(values)})
+            totals = [t + v for t, v in zip(totals, values)]
+            bucket = next_bucket(resolution, bucket)
+        return {
+            "creator_id": creator_id,
+            "resolution": resolution,
+            "start": _iso(first),
+            "end": _iso(bucket),
+            "points": points,
+            "totals": _values(totals),
+        }
+
+
+def _values(values: List[int]) -> Dict[str, Any]:
+    revenue_cents, subscriptions, cancellations, purchases = values
+    return {
+        "revenue": round(revenue_cents / 100, 2),
+        "subscriptions": subscriptions,
+        "cancellations": cancellations,
+        "net_subscribers": subscriptions - cancellations,
+        "purchases": purchases,
+    }
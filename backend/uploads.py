@@ -0,0 +1,202 @@
+import hashlib
+import json
+import logging
+import os
+import queue
+import threading
+import uuid
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends are only exclusive within one process
+    fcntl = None
+
+CHUNK_SIZE = 1024 * 1024  # bytes buffered before each disk write
+
+logger = logging.getLogger(__name__)
+
+
+class OffsetConflict(Exception):
+    """An append at an offset the blob isn't at, or while another append to it is running."""
+
+
+class BlobStore:
+    """
+    Local blob store; each blob is a single file written append-only.
+    An append given an offset is a compare-and-append: it holds an exclusive
+    lock on the blob (flock, so other worker processes are kept out too) and
+    only writes if the blob is exactly that long.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self._busy: set = set()  # blobs this process is appending to at an offset
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def new_id(self) -> str:
+        # Random rather than the video id: in-memory video ids restart at video1 each run,
+        # and appending to a previous run's blob would corrupt the upload
+        return uuid.uuid4().hex
+
+    def path(self, blob_id: str) -> str:
+        # Blob ids are generated server-side, but never let one escape the root
+        return os.path.join(self.root, os.path.basename(blob_id))
+
+    def size(self, blob_id: str) -> int:
+        try:
+            return os.path.getsize(self.path(blob_id))
+        except FileNotFoundError:
+            return 0
+
+    async def append(self, blob_id: str, chunks: AsyncIterator[bytes], limit: Optional[int] = None,
+                     offset: Optional[int] = None) -> int:
+        """
+        Append a stream to a blob, holding at most CHUNK_SIZE bytes in memory.
+        Disk writes run in the threadpool so the event loop keeps serving requests.
+        With an offset, raises OffsetConflict unless the blob is that long and
+        no other append is running on it. Returns the number of bytes written.
+        """
+        if offset is not None:
+            with self._lock:
+                if blob_id in self._busy:
+                    raise OffsetConflict("Another upload to this blob is in progress")
+                self._busy.add(blob_id)
+        try:
+            return await self._append(blob_id, chunks, limit, offset)
+        finally:
+            if offset is not None:
+                with self._lock:
+                    self._busy.discard(blob_id)
+
+    async def _append(self, blob_id: str, chunks: AsyncIterator[bytes], limit: Optional[int],
+                      offset: Optional[int]) -> int:
+        handle = await run_in_threadpool(open, self.path(blob_id), "ab")
+        written = 0
+        buffer = bytearray()
+        try:
+            if offset is not None:
+                await run_in_threadpool(_claim, handle, offset)
+            async for chunk in chunks:
+                written += len(chunk)
+                if limit is not None and written > limit:
+                    raise ValueError("Upload exceeds declared size")
+                buffer += chunk
+                if len(buffer) >= CHUNK_SIZE:
+                    await run_in_threadpool(handle.write, bytes(buffer))
+                    buffer.clear()
+            if buffer:
+                await run_in_threadpool(handle.write, bytes(buffer))
+        finally:
+            await run_in_threadpool(handle.close)  # releases the flock too
+        return written
+
+    def digest(self, blob_id: str) -> str:
+        sha = hashlib.sha256()
+        with open(self.path(blob_id), "rb") as f:
+            for block in iter(lambda: f.read(CHUNK_SIZE), b""):
+                sha.update(block)
+        return sha.hexdigest()
+
+
+def _claim(handle, offset: int) -> None:
+    if fcntl is not None:
+        try:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise OffsetConflict("Another upload to this blob is in progress") from None
+    size = os.fstat(handle.fileno()).st_size
+    if size != offset:
+        raise OffsetConflict(f"Expected Upload-Offset {size}")
+
+
+async def iter_upload_file(file) -> AsyncIterator[bytes]:
+    """Yield an UploadFile in CHUNK_SIZE pieces."""
+    while True:
+        chunk = await file.read(CHUNK_SIZE)
+        if not chunk:
+            return
+        yield chunk
+
+
+class UploadSessions:
+    """
+    Resumable upload sessions: clients PUT bytes at the current offset until complete.
+    Each session is a small JSON file beside the blobs, so an upload resumes
+    after a restart or on another worker sharing the directory; the offset is
+    always the blob's size on disk.
+    """
+
+    def __init__(self, blobs: BlobStore):
+        self.blobs = blobs
+
+    def _path(self, upload_id: str) -> str:
+        return self.blobs.path(upload_id + ".session")
+
+    def create(self, video_id: str, blob_id: str, total_size: Optional[int]) -> Dict[str, Any]:
+        session = {"upload_id": uuid.uuid4().hex, "video_id": video_id, "blob_id": blob_id, "total_size": total_size}
+        path = self._path(session["upload_id"])
+        with open(path + ".tmp", "w") as f:
+            json.dump(session, f)
+        os.replace(path + ".tmp", path)
+        return {**session, "offset": 0}
+
+    def get(self, upload_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._path(upload_id)) as f:
+                session = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        return {**session, "offset": self.blobs.size(session["blob_id"])}
+
+    def close(self, upload_id: str) -> Optional[Dict[str, Any]]:
+        """Remove the session; only one caller gets it back."""
+        session = self.get(upload_id)
+        try:
+            os.unlink(self._path(upload_id))
+        except FileNotFoundError:
+            return None
+        return session
+
+
+class ProcessingQueue:
+    """Background workers for post-upload processing; threads start on first submit."""
+
+    def __init__(self, workers: int = 2):
+        self.workers = workers
+        self._jobs: "queue.Queue" = queue.Queue()
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def submit(self, fn: Callable[..., Any], *args: Any) -> None:
+        if not self._threads:
+            self._start()
+        self._jobs.put((fn, args))
+
+    def join(self) -> None:
+        self._jobs.join()
+
+    def _start(self) -> None:
+        with self._lock:
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._run, daemon=True, name=f"upload-worker-{len(self._threads)}")
+                thread.start()
+                self._threads.append(thread)
+
+    def _run(self) -> None:
+        while True:
+            fn, args = self._jobs.get()
+            try:
+                fn(*args)
+            except Exception:
+                logger.exception("Upload processing failed")
+            finally:
+                self._jobs.task_done()
+
+
+blob_store = BlobStore(os.environ.get("TIERFLOW_BLOB_DIR", "blobs"))
+upload_sessions = UploadSessions(blob_store)
+processing_queue = ProcessingQueue()
@@ -183,6 +183,23 @@ export const api = {
     return res.json();
   },
 
+  getRevenueSeries: async (creatorId: string, params: { start?: string; end?: string; resolution?: string } = {}) => {
+    const query = new URLSearchParams(Object.entries(params).filter(([, v]) => v) as [string, string][]);
+    const res = await fetchWithRetry(`${MEMBERSHIP_API_URL}/membership/revenue/${creatorId}/series?${query}`, {
+      headers: getHeaders(false),
+    });
+    return res.json();
+  },
+
+  simulateRevenue: async (creatorId: string, scenarios: any[], months = 6) => {
+    const res = await fetchWithRetry(`${MEMBERSHIP_API_URL}/membership/revenue/${creatorId}/simulate`, {
+      method: "POST",
+      headers: getHeaders(),
+      body: JSON.stringify({ scenarios, months }),
+    });
+    return res.json();
+  },
+
   triggerPayout: async (creatorId: string) => {
     const res = await fetchWithRetry(`${MEMBERSHIP_API_URL}/membership/payout/${creatorId}`, {
       method: "POST",